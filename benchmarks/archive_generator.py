@@ -0,0 +1,158 @@
+"""Детерминированный генератор синтетического архива для бенчмарков.
+
+Строит дерево папок заданной глубины и ветвистости и заполняет его
+документами с русскими названиями, тегами и местами хранения. При одних
+и тех же параметрах и seed получается одинаковое содержимое.
+
+Запуск из корня репозитория (сохранить архив для ручных замеров):
+    python benchmarks/archive_generator.py --documents 100000 --output /tmp/archive.db
+"""
+import argparse
+import contextlib
+import io
+import math
+import random
+import sys
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from database import DatabaseManager  # noqa: E402
+
+FOLDER_NAMES = [
+    "Бухгалтерия", "Кадры", "Договоры", "Протоколы", "Приказы", "Переписка",
+    "Отчеты", "Сметы", "Акты", "Проекты", "Архив", "Снабжение", "Юридический",
+    "Производство", "Склад", "Качество",
+]
+TITLE_WORDS = [
+    "договор", "поставки", "акт", "сверки", "счет", "накладная", "приказ",
+    "отпуск", "протокол", "совещания", "служебная", "записка", "отчет",
+    "квартал", "смета", "ремонт", "доверенность", "соглашение", "аренда",
+    "оборудования", "заявка", "командировка", "инвентаризация", "претензия",
+]
+DESCRIPTION_WORDS = TITLE_WORDS + [
+    "утвержден", "согласован", "подписан", "копия", "оригинал", "на", "по",
+    "для", "отдела", "филиала", "головного", "офиса", "года",
+]
+TAGS = [
+    "срочно", "финансы", "кадры", "юристы", "подписано", "на согласовании",
+    "входящие", "исходящие", "оригинал", "копия", "2022", "2023", "2024",
+]
+STATUSES = ["Активный", "Архивный", "На согласовании", "Отменен"]
+AUTHORS = ["admin", "ivanov", "petrova", "sidorov", "kuznetsova", "smirnov"]
+
+
+@dataclass
+class ArchiveSpec:
+    """Параметры синтетического архива"""
+    documents: int = 10000
+    depth: int = 3
+    fanout: int = 8
+    cabinets: int = 20
+    shelves: int = 6
+    boxes: int = 30
+    seed: int = 42
+
+    @property
+    def folders(self) -> int:
+        return sum(self.fanout ** level for level in range(1, self.depth + 1))
+
+
+def folder_paths(spec: ArchiveSpec) -> List[tuple]:
+    """Папки дерева в порядке обхода в ширину: (имя, путь, путь родителя)"""
+    rng = random.Random(spec.seed)
+    result = []
+    level = [None]
+    for _ in range(spec.depth):
+        next_level = []
+        for parent in level:
+            names = rng.sample(FOLDER_NAMES, min(spec.fanout, len(FOLDER_NAMES)))
+            for i in range(spec.fanout):
+                name = names[i] if i < len(names) else f"{names[i % len(names)]} {i}"
+                path = f"{parent or ''}/{name}"
+                result.append((name, path, parent))
+                next_level.append(path)
+        level = next_level
+    return result
+
+
+def generate_documents(spec: ArchiveSpec, paths: List[str]) -> Iterator[Dict]:
+    """Документы, равномерно распределенные по папкам"""
+    rng = random.Random(spec.seed + 1)
+    per_folder = math.ceil(spec.documents / len(paths))
+    for i in range(spec.documents):
+        words = rng.sample(TITLE_WORDS, 3)
+        yield {
+            "title": f"{words[0].capitalize()} {words[1]} {words[2]} №{i + 1}",
+            "description": " ".join(rng.choices(DESCRIPTION_WORDS, k=8)),
+            "file_path": f"document_files/doc_{i + 1}.pdf",
+            "folder_path": paths[i // per_folder],
+            "status": rng.choice(STATUSES),
+            "author": rng.choice(AUTHORS),
+            "cabinet": f"Шкаф {rng.randint(1, spec.cabinets)}",
+            "shelf": str(rng.randint(1, spec.shelves)),
+            "box": str(rng.randint(1, spec.boxes)),
+            "tags": rng.sample(TAGS, rng.randint(0, 3)),
+            "file_size": rng.randint(10_000, 5_000_000),
+        }
+
+
+def generate_archive(db: DatabaseManager, spec: ArchiveSpec, chunk_size: int = 10000) -> Dict:
+    """Заполнение базы синтетическим архивом; возвращает сводку"""
+    folders = folder_paths(spec)
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), db.batch():
+        for name, path, parent in folders:
+            db.add_folder(name, path, parent)
+        chunk = []
+        for doc in generate_documents(spec, [path for _, path, _ in folders]):
+            chunk.append(doc)
+            if len(chunk) >= chunk_size:
+                db.add_documents(chunk)
+                chunk = []
+        if chunk:
+            db.add_documents(chunk)
+    return {
+        **asdict(spec),
+        "folders": len(folders),
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def spec_for_size(documents: int, seed: int = 42) -> ArchiveSpec:
+    """Типовая форма дерева для заданного числа документов"""
+    if documents <= 10000:
+        return ArchiveSpec(documents=documents, depth=3, fanout=6, seed=seed)
+    if documents <= 100000:
+        return ArchiveSpec(documents=documents, depth=3, fanout=10, seed=seed)
+    return ArchiveSpec(documents=documents, depth=4, fanout=10, seed=seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--depth", type=int, default=None)
+    parser.add_argument("--fanout", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", required=True, help="путь к создаваемой базе")
+    args = parser.parse_args()
+
+    if Path(args.output).exists():
+        parser.error(f"{args.output} уже существует")
+    spec = spec_for_size(args.documents, args.seed)
+    if args.depth is not None:
+        spec.depth = args.depth
+    if args.fanout is not None:
+        spec.fanout = args.fanout
+    with contextlib.redirect_stdout(io.StringIO()):
+        db = DatabaseManager(args.output)
+    summary = generate_archive(db, spec)
+    print(f"Создано: {summary['documents']} документов в {summary['folders']} папках "
+          f"за {summary['seconds']:.1f} с -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
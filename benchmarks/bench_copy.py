@@ -0,0 +1,89 @@
+"""Сравнение копирования файлов при загрузке: shutil.copy2 + отдельный хеш
+против file_copy.copy_file в разных режимах.
+
+Случаи "...-nohash" показывают цену хеша: копирование ядром само по
+себе не читает данные в процесс, хеш добавляет одно чтение исходного файла.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_copy.py --size-mb 1024 --repeat 3 --dir /mnt/archive
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from file_copy import copy_file, hash_file  # noqa: E402
+
+
+def make_source(path: Path, size: int):
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        written = 0
+        while written < size:
+            chunk = block[:min(len(block), size - written)]
+            f.write(chunk)
+            written += len(chunk)
+
+
+def run_copy2(source: Path, target: Path):
+    shutil.copy2(source, target)
+    return hash_file(target)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dir", default=None, help="каталог для тестовых файлов (по умолчанию временный)")
+    parser.add_argument("--json", dest="json_path", help="сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_copy_", dir=args.dir))
+    try:
+        source = workdir / "source.bin"
+        size = args.size_mb * 1024 * 1024
+        make_source(source, size)
+        expected = hash_file(source)
+
+        cases = {"copy2+hash": run_copy2}
+        for mode in ("auto", "kernel", "copy", "hardlink"):
+            cases[mode] = lambda s, t, mode=mode: copy_file(s, t, mode=mode).sha256
+        for mode in ("kernel", "copy"):
+            cases[f"{mode}-nohash"] = lambda s, t, mode=mode: copy_file(s, t, mode=mode, compute_hash=False).sha256
+
+        results = []
+        for name, func in cases.items():
+            timings = []
+            for i in range(args.repeat):
+                target = workdir / f"target_{i}.bin"
+                if target.exists():
+                    target.unlink()
+                started = time.perf_counter()
+                digest = func(source, target)
+                timings.append(time.perf_counter() - started)
+                assert digest in (expected, None), f"{name}: неверный хеш"
+                target.unlink()
+            median = statistics.median(timings)
+            results.append({
+                "case": name,
+                "median_s": median,
+                "throughput_mb_s": args.size_mb / median if median else None,
+            })
+            print(f"{name:14s} {median * 1000:10.1f} ms  {args.size_mb / median:8.1f} MB/s")
+
+        if args.json_path:
+            with open(args.json_path, "w", encoding="utf-8") as f:
+                json.dump({"size_mb": args.size_mb, "repeat": args.repeat, "results": results}, f, indent=2)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Бенчмарк основных запросов DatabaseManager на синтетическом архиве.
+
+Для каждого размера архива генерирует базу (archive_generator) и замеряет
+get_folders, get_subfolders, get_documents, search_documents,
+rename_folder, delete_folder и счетчики; печатает p50/p95 и при --json
+сохраняет результаты для сравнения между версиями.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_database.py --sizes 10000 100000 --json results.json
+    python benchmarks/bench_database.py --sizes 1000000 --cache-dir /tmp/bench_archives
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from archive_generator import TITLE_WORDS, generate_archive, spec_for_size  # noqa: E402
+from database import DatabaseManager  # noqa: E402
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Перцентиль с линейной интерполяцией"""
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def run_case(func: Callable[[int], None], repeat: int, warmup: int = 1) -> Dict:
+    for i in range(warmup):
+        func(i)
+    timings = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        func(i)
+        timings.append(time.perf_counter() - started)
+    return {
+        "repeat": repeat,
+        "p50_ms": percentile(timings, 0.5) * 1000,
+        "p95_ms": percentile(timings, 0.95) * 1000,
+        "mean_ms": statistics.fmean(timings) * 1000,
+        "max_ms": max(timings) * 1000,
+    }
+
+
+def open_archive(size: int, seed: int, workdir: Path, cache_dir: Path = None):
+    """База заданного размера: из кэша или только что сгенерированная"""
+    spec = spec_for_size(size, seed)
+    name = f"archive_{size}_{spec.depth}x{spec.fanout}_{seed}.db"
+    directory = cache_dir or workdir
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / name
+    created = not path.exists()
+    with contextlib.redirect_stdout(io.StringIO()):
+        db = DatabaseManager(str(path))
+    if created:
+        summary = generate_archive(db, spec)
+        print(f"  сгенерировано за {summary['seconds']:.1f} с ({summary['folders']} папок)")
+    return db
+
+
+def bench_size(db: DatabaseManager, repeat: int, seed: int) -> Dict[str, Dict]:
+    rng = random.Random(seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        folders = db.get_folders()
+    paths = sorted(folders)
+    leaves = [path for path in paths if not folders[path]["subfolders"]]
+    top = [path for path in paths if folders[path]["parent_path"] is None]
+    sample = [rng.choice(leaves) for _ in range(repeat + 1)]
+    words = [rng.choice(TITLE_WORDS) for _ in range(repeat + 1)]
+
+    def rename(i):
+        path = sample[i]
+        parent, _, name = path.rpartition("/")
+        renamed = f"{parent}/{name} (пер)"
+        assert db.rename_folder(path, f"{name} (пер)", renamed)
+        assert db.rename_folder(renamed, name, path)
+
+    def delete(i):
+        path = f"/Пустая папка {i}"
+        db.add_folder(f"Пустая папка {i}", path)
+        assert db.delete_folder(path)
+
+    cases = {
+        "get_folders": lambda i: db.get_folders(),
+        "get_subfolders_root": lambda i: db.get_subfolders("/"),
+        "get_subfolders": lambda i: db.get_subfolders(rng.choice(top)),
+        "get_documents": lambda i: db.get_documents(sample[i]),
+        "search_documents": lambda i: db.search_documents(words[i]),
+        "search_documents_folder": lambda i: db.search_documents(words[i], sample[i]),
+        "search_documents_miss": lambda i: db.search_documents("нет такого слова"),
+        "rename_folder": rename,
+        "rename_folder_top": lambda i: (
+            db.rename_folder(top[0], "Верх", "/Верх"),
+            db.rename_folder("/Верх", top[0][1:], top[0]),
+        ),
+        "delete_folder": delete,
+        "delete_folder_nonempty": lambda i: db.delete_folder(sample[i]),
+        "get_documents_count": lambda i: db.get_documents_count(),
+        "get_folders_count": lambda i: db.get_folders_count(),
+        "get_folder_tree_stats": lambda i: db.get_folder_tree_stats(),
+    }
+    results = {}
+    for name, func in cases.items():
+        # Отладочный вывод DatabaseManager не должен попадать в отчет
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[name] = run_case(func, repeat)
+        print(f"  {name:26s} p50 {results[name]['p50_ms']:9.2f} мс   p95 {results[name]['p95_ms']:9.2f} мс")
+    return results
+
+
+def compare(report: Dict, baseline_path: str):
+    """Сравнение p50 с сохраненным ранее отчетом"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"Сравнение с {baseline_path} (p50, текущий / базовый)")
+    for size, cases in report["sizes"].items():
+        for name, result in cases.items():
+            base = baseline.get("sizes", {}).get(size, {}).get(name)
+            if not base:
+                continue
+            ratio = result["p50_ms"] / base["p50_ms"] if base["p50_ms"] else float("inf")
+            print(f"  {size:>8s} {name:26s} {ratio:6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000],
+                        help="размеры архива в документах (например 10000 100000 1000000)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cache-dir", type=Path, default=None,
+                        help="каталог для сгенерированных баз (повторные запуски их переиспользуют)")
+    parser.add_argument("--json", dest="json_path", help="сохранить результаты в JSON")
+    parser.add_argument("--compare", help="JSON предыдущего запуска для сравнения")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_db_"))
+    report = {
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "sizes": {},
+    }
+    try:
+        for size in args.sizes:
+            print(f"Архив на {size} документов")
+            db = open_archive(size, args.seed, workdir, args.cache_dir)
+            report["sizes"][str(size)] = bench_size(db, args.repeat, args.seed)
+        if args.json_path:
+            with open(args.json_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+        if args.compare:
+            compare(report, args.compare)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
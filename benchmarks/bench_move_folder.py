@@ -0,0 +1,94 @@
+"""Перенос поддерева папок с документами через DatabaseManager.move_folder.
+
+Строит поддерево (по умолчанию 10 000 документов) рядом с посторонними
+данными и замеряет перенос туда и обратно.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_move_folder.py --documents 10000 --repeat 5
+"""
+import argparse
+import contextlib
+import io
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from database import DatabaseManager  # noqa: E402
+
+
+def build_archive(db: DatabaseManager, documents: int, folders: int, noise: int):
+    with db.batch():
+        db.add_folder("Источник", "/Источник")
+        db.add_folder("Назначение", "/Назначение")
+        subfolders = ["/Источник"]
+        for i in range(folders):
+            path = f"/Источник/Раздел {i}"
+            db.add_folder(f"Раздел {i}", path, "/Источник")
+            subfolders.append(path)
+        db.add_documents(
+            {
+                "title": f"Документ {i}",
+                "folder_path": subfolders[i % len(subfolders)],
+                "status": "Активный",
+                "author": "admin",
+                "tags": ["отчет"],
+            }
+            for i in range(documents)
+        )
+        # Соседние данные, которые перенос затрагивать не должен
+        db.add_folder("Источник-2", "/Источник-2")
+        db.add_documents(
+            {"title": f"Прочее {i}", "folder_path": "/Источник-2", "status": "Активный", "author": "admin"}
+            for i in range(noise)
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--folders", type=int, default=100)
+    parser.add_argument("--noise", type=int, default=100000, help="документов вне переносимого поддерева")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", dest="json_path", help="сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_move_"))
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = DatabaseManager(str(workdir / "archive.db"))
+        build_archive(db, args.documents, args.folders, args.noise)
+
+        timings = []
+        src, dst = "/Источник", "/Назначение/Источник"
+        for _ in range(args.repeat):
+            for from_path, to_parent in ((src, "/Назначение"), (dst, None)):
+                started = time.perf_counter()
+                assert db.move_folder(from_path, to_parent), f"перенос {from_path} не выполнен"
+                timings.append(time.perf_counter() - started)
+
+        assert len(db.get_documents("/Источник-2")) == args.noise
+        result = {
+            "documents": args.documents,
+            "folders": args.folders,
+            "noise": args.noise,
+            "moves": len(timings),
+            "median_ms": statistics.median(timings) * 1000,
+            "max_ms": max(timings) * 1000,
+        }
+        print(f"move_folder: {args.documents} документов, {args.folders} папок: "
+              f"медиана {result['median_ms']:.1f} мс, максимум {result['max_ms']:.1f} мс")
+        if args.json_path:
+            with open(args.json_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""Пропускная способность DocumentProcessor на синтетических файлах.
+
+Генерирует PDF с разным числом страниц (с картинками и без), изображения
+разных разрешений и текстовые файлы, затем обрабатывает их так же, как
+process_document (PDF открывается один раз), в режимах serial, thread и
+process. Для каждого режима печатает файлы/с, МБ/с, p50/p95 по этапам
+(open, preview, text, metadata) и пиковый RSS. Каждый режим выполняется
+в отдельном дочернем процессе, чтобы пиковый RSS не накапливался.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_processor.py --copies 5 --workers 4 --json processor.json
+
+Ориентир (--copies 3 --workers 2; 39 файлов, 91.6 МБ; 1 vCPU, ext4,
+PyMuPDF 1.28.2, Pillow 12.3.0):
+    serial   24.5 файл/с  57.6 МБ/с  RSS 70 МБ   preview p50/p95 15.6/122.0 мс
+    thread   14.6 файл/с  34.4 МБ/с  RSS 121 МБ  preview p50/p95 36.3/311.8 мс
+    process  12.8 файл/с  30.1 МБ/с  RSS 43+107 МБ  preview p50/p95 44.7/552.1 мс
+На одном ядре параллельные режимы только добавляют накладные расходы;
+сравнивать их имеет смысл при --workers не больше числа ядер.
+"""
+import argparse
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import fitz  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from document_processor import DocumentProcessor  # noqa: E402
+
+MODES = ("serial", "thread", "process")
+STAGES = ("open", "preview", "text", "metadata")
+WORDS = [
+    "архив", "документ", "договор", "поставка", "протокол", "решение", "отдел",
+    "приказ", "согласование", "подпись", "печать", "реестр", "опись", "дело",
+]
+
+
+def make_image_bytes(rng: random.Random, width: int, height: int, fmt: str) -> bytes:
+    """Детерминированное изображение: градиент с шумом"""
+    noise = Image.frombytes("L", (width, height), rng.randbytes(width * height))
+    gradient = Image.linear_gradient("L").resize((width, height))
+    img = Image.merge("RGB", (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    buf = io.BytesIO()
+    img.save(buf, fmt)
+    return buf.getvalue()
+
+
+def make_pdf(path: Path, rng: random.Random, pages: int, images: int):
+    doc = fitz.open()
+    image = make_image_bytes(rng, 800, 600, "PNG") if images else None
+    for _ in range(pages):
+        page = doc.new_page()
+        lines = [" ".join(rng.choices(WORDS, k=10)) for _ in range(40)]
+        page.insert_text((50, 60), "\n".join(lines), fontsize=9,
+                         encoding=fitz.TEXT_ENCODING_CYRILLIC)
+        for i in range(images):
+            top = 420 + i * 10
+            page.insert_image(fitz.Rect(50, top, 300, top + 180), stream=image)
+    doc.save(path)
+    doc.close()
+
+
+def generate_files(directory: Path, args) -> List[Path]:
+    rng = random.Random(args.seed)
+    files = []
+    for copy in range(args.copies):
+        for pages in args.pdf_pages:
+            for images in (0, args.pdf_images):
+                path = directory / f"doc_{pages}p_{images}img_{copy}.pdf"
+                make_pdf(path, rng, pages, images)
+                files.append(path)
+        for resolution in args.image_sizes:
+            width, height = (int(v) for v in resolution.split("x"))
+            for ext, fmt in ((".jpg", "JPEG"), (".png", "PNG")):
+                path = directory / f"img_{resolution}_{copy}{ext}"
+                path.write_bytes(make_image_bytes(rng, width, height, fmt))
+                files.append(path)
+        path = directory / f"text_{copy}.txt"
+        words = rng.choices(WORDS, k=args.text_kb * 1024 // 8)
+        path.write_text(" ".join(words), encoding="utf-8")
+        files.append(path)
+    return files
+
+
+def process_file(path: str, preview_dir: str) -> Dict[str, float]:
+    """Обработка одного файла по этапам, как в process_document"""
+    processor = DocumentProcessor()
+    processor.preview_folder = Path(preview_dir)
+    path = Path(path)
+    timings = {}
+
+    started = time.perf_counter()
+    with processor._open_pdf(path) as pdf_doc:
+        timings["open"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        asyncio.run(processor.generate_preview(path, pdf_doc=pdf_doc))
+        timings["preview"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        asyncio.run(processor.extract_text(path, pdf_doc=pdf_doc))
+        timings["text"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    asyncio.run(processor.get_metadata(path))
+    timings["metadata"] = time.perf_counter() - started
+    return timings
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def run_mode(mode: str, files: List[Path], workers: int, preview_dir: Path) -> Dict:
+    if preview_dir.exists():
+        shutil.rmtree(preview_dir)
+    preview_dir.mkdir()
+    paths = [str(path) for path in files]
+
+    started = time.perf_counter()
+    if mode == "serial":
+        results = [process_file(path, str(preview_dir)) for path in paths]
+    else:
+        executor_class = ThreadPoolExecutor if mode == "thread" else ProcessPoolExecutor
+        with executor_class(max_workers=workers) as executor:
+            results = list(executor.map(process_file, paths, [str(preview_dir)] * len(paths)))
+    elapsed = time.perf_counter() - started
+
+    total_bytes = sum(path.stat().st_size for path in files)
+    stages = {}
+    for stage in STAGES:
+        values = [result[stage] for result in results]
+        stages[stage] = {
+            "p50_ms": percentile(values, 0.5) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "mean_ms": statistics.fmean(values) * 1000,
+        }
+    by_type = {}
+    for path, result in zip(files, results):
+        by_type.setdefault(path.suffix.lower(), []).append(sum(result.values()))
+
+    # ru_maxrss в Linux - в килобайтах; у дочерних процессов - максимум по ним
+    peak_self = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    peak_children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return {
+        "mode": mode,
+        "workers": 1 if mode == "serial" else workers,
+        "files": len(files),
+        "seconds": elapsed,
+        "files_per_s": len(files) / elapsed,
+        "mb_per_s": total_bytes / 1024 / 1024 / elapsed,
+        "stages": stages,
+        "file_p50_ms": {ext: percentile(values, 0.5) * 1000 for ext, values in by_type.items()},
+        "peak_rss_mb": peak_self,
+        "peak_rss_children_mb": peak_children,
+    }
+
+
+def _mode_worker(queue, mode, files, workers, preview_dir):
+    queue.put(run_mode(mode, files, workers, preview_dir))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--copies", type=int, default=3, help="повторов каждого вида файла")
+    parser.add_argument("--pdf-pages", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--pdf-images", type=int, default=2, help="картинок на страницу в PDF с изображениями")
+    parser.add_argument("--image-sizes", nargs="+", default=["640x480", "1920x1080", "4000x3000"])
+    parser.add_argument("--text-kb", type=int, default=512)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", dest="json_path", help="сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    json_path = Path(args.json_path).resolve() if args.json_path else None
+    original_cwd = os.getcwd()
+    workdir = Path(tempfile.mkdtemp(prefix="bench_processor_"))
+    # DocumentProcessor создает каталог previews в текущем каталоге
+    os.chdir(workdir)
+    try:
+        source_dir = workdir / "files"
+        source_dir.mkdir()
+        started = time.perf_counter()
+        files = generate_files(source_dir, args)
+        total_mb = sum(path.stat().st_size for path in files) / 1024 / 1024
+        print(f"Сгенерировано {len(files)} файлов ({total_mb:.1f} МБ) за {time.perf_counter() - started:.1f} с")
+
+        results = []
+        context = multiprocessing.get_context()
+        for mode in args.modes:
+            queue = context.Queue()
+            process = context.Process(target=_mode_worker,
+                                      args=(queue, mode, files, args.workers, workdir / f"previews_{mode}"))
+            process.start()
+            result = queue.get()
+            process.join()
+            results.append(result)
+            stages = "  ".join(
+                f"{stage} {result['stages'][stage]['p50_ms']:.1f}/{result['stages'][stage]['p95_ms']:.1f}"
+                for stage in STAGES
+            )
+            print(f"{mode:8s} x{result['workers']:<3d} {result['files_per_s']:8.1f} файл/с "
+                  f"{result['mb_per_s']:8.1f} МБ/с  RSS {result['peak_rss_mb']:.0f} МБ "
+                  f"(дочерние {result['peak_rss_children_mb']:.0f} МБ)  p50/p95 мс: {stages}")
+
+        if json_path:
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump({"files": len(files), "total_mb": total_mb, "results": results}, f, indent=2)
+    finally:
+        os.chdir(original_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
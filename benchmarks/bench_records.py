@@ -0,0 +1,128 @@
+"""Память и скорость выборки документов: словарь на строку против DocumentRecord.
+
+Заполняет папку документами и сравнивает выборку get_documents с прежним
+построением словаря на каждую строку. Память - пик tracemalloc при
+удержании всего результата.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_records.py --documents 100000 --repeat 5
+"""
+import argparse
+import contextlib
+import io
+import json
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from database import DOCUMENT_LIST_COLUMNS, DatabaseManager  # noqa: E402
+
+
+def fetch_dicts(db: DatabaseManager, folder_id: int):
+    """Прежняя реализация get_documents: словарь и список тегов на каждую строку"""
+    conn = sqlite3.connect(db.db_path)
+    try:
+        cursor = conn.execute(
+            f"SELECT {DOCUMENT_LIST_COLUMNS} FROM documents "
+            "WHERE folder_id IS ? AND deleted_at IS NULL ORDER BY created_date DESC",
+            (folder_id,)
+        )
+        return [
+            {
+                "id": row[0],
+                "title": row[1],
+                "description": row[2],
+                "file_path": row[3],
+                "status": row[4],
+                "date_added": row[5],
+                "author": row[6],
+                "tags": row[7].split(',') if row[7] else [],
+                "cabinet": row[8],
+                "shelf": row[9],
+                "box": row[10],
+            }
+            for row in cursor.fetchall()
+        ]
+    finally:
+        conn.close()
+
+
+def measure(func, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+        del result
+    tracemalloc.start()
+    result = func()
+    # Обращение к полям, которые читает карточка документа
+    for doc in result:
+        doc["title"], doc.get("status"), doc.get("date_added")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak, len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", dest="json_path", help="сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_records_"))
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = DatabaseManager(str(workdir / "archive.db"))
+        db.add_folder("Отчеты", "/Отчеты")
+        db.add_documents(
+            {
+                "title": f"Документ {i}",
+                "description": "Квартальный отчет отдела",
+                "file_path": f"document_files/doc_{i}.pdf",
+                "folder_path": "/Отчеты",
+                "status": "Активный",
+                "author": "admin",
+                "cabinet": f"Шкаф {i % 10}",
+                "shelf": str(i % 5),
+                "box": str(i % 40),
+                "tags": ["отчет", f"отдел-{i % 7}"],
+            }
+            for i in range(args.documents)
+        )
+        folder_id = db.get_folder_id("/Отчеты")
+
+        cases = {
+            "dict": lambda: fetch_dicts(db, folder_id),
+            "record": lambda: db.get_documents(folder_id),
+        }
+        results = []
+        for name, func in cases.items():
+            median, peak, rows = measure(func, args.repeat)
+            assert rows == args.documents, f"{name}: получено {rows} строк"
+            results.append({
+                "case": name,
+                "median_ms": median * 1000,
+                "rows_per_s": rows / median if median else None,
+                "peak_mb": peak / 1024 / 1024,
+            })
+            print(f"{name:8s} {median * 1000:9.1f} ms  {rows / median:12.0f} строк/с  "
+                  f"пик памяти {peak / 1024 / 1024:8.1f} МБ")
+
+        if args.json_path:
+            with open(args.json_path, "w", encoding="utf-8") as f:
+                json.dump({"documents": args.documents, "repeat": args.repeat, "results": results}, f, indent=2)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""Бенчмарк интерфейса ArchiveApp без окна: заглушка страницы Flet.
+
+Строит основной интерфейс на сгенерированном архиве и выполняет типичные
+действия пользователя - выбор папки, обновление списка, ввод поиска,
+открытие превью, обновление дерева папок. Для каждого действия
+замеряются время (p50/p95), число созданных элементов управления и
+вызовов update() у элементов и страницы.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_ui.py --sizes 10000 100000 --repeat 20 --json ui.json
+
+Ориентир (--repeat 20; 1 vCPU, flet 0.24.1), p50/p95 в мс:
+                                 10 000 док.      100 000 док.
+    create_main_ui               16.0             48.0
+    select_folder                26.7 / 34.7      89.9 / 129.5
+    update_documents_list        19.7 / 24.8      60.2 / 65.6
+    search_documents              2.1 / 2.3        2.2 / 2.6
+    search_typing                10.4 / 21.4      10.5 / 21.9
+    show_document_preview         0.7 / 58.9       0.7 / 59.1
+    update_folder_tree           10.0 / 12.1      31.0 / 42.0
+    update_folder_tree_expanded  12.0 / 12.4      35.4 / 46.7
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import flet as ft  # noqa: E402
+
+from archive_generator import TITLE_WORDS, generate_archive, spec_for_size  # noqa: E402
+
+
+class Counters:
+    """Счетчики созданных элементов и вызовов update()"""
+
+    def __init__(self):
+        self.controls = 0
+        self.control_updates = 0
+        self.page_updates = 0
+        self.by_type = Counter()
+
+    def snapshot(self):
+        return self.controls, self.control_updates, self.page_updates
+
+
+counters = Counters()
+
+
+def instrument_flet():
+    """Подсчет создания элементов и update() без отрисовки"""
+    original_init = ft.Control.__init__
+
+    def counting_init(self, *args, **kwargs):
+        counters.controls += 1
+        counters.by_type[type(self).__name__] += 1
+        original_init(self, *args, **kwargs)
+
+    def counting_update(self):
+        # Элементы не добавлены на настоящую страницу, поэтому только считаем
+        counters.control_updates += 1
+
+    ft.Control.__init__ = counting_init
+    ft.Control.update = counting_update
+
+
+class StubPage:
+    """Минимальная замена ft.Page для методов ArchiveApp"""
+
+    def __init__(self):
+        self.controls = []
+        self.overlay = []
+        self.title = ""
+        self.snack_bar = None
+
+    def add(self, *controls):
+        self.controls.extend(controls)
+        counters.page_updates += 1
+
+    def update(self, *controls):
+        counters.page_updates += 1
+
+    def show_snack_bar(self, snack_bar):
+        self.snack_bar = snack_bar
+        counters.page_updates += 1
+
+    def open(self, control):
+        self.overlay.append(control)
+        counters.page_updates += 1
+
+
+def load_app_module():
+    # Загрузка по пути: имя test совпадает с пакетом стандартной библиотеки
+    spec = importlib.util.spec_from_file_location("archive_app", ROOT / "src" / "test.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_preview_files(app, rng: random.Random, count: int) -> List[Dict]:
+    """Настоящие файлы у части документов, чтобы превью строились полностью"""
+    import fitz
+    from PIL import Image
+
+    files_dir = Path("document_files")
+    files_dir.mkdir(exist_ok=True)
+    folders = [path for path in app.folders if not app.folders[path]["subfolders"]]
+    documents = []
+    for path in rng.sample(folders, min(len(folders), count)):
+        docs = app.db.get_documents(path)
+        if docs:
+            documents.append(docs[0])
+    prepared = []
+    for i, doc in enumerate(documents):
+        kind = ("txt", "pdf", "png")[i % 3]
+        file_path = files_dir / f"preview_{doc['id']}.{kind}"
+        if kind == "txt":
+            file_path.write_text(" ".join(rng.choices(TITLE_WORDS, k=2000)), encoding="utf-8")
+        elif kind == "pdf":
+            pdf = fitz.open()
+            for _ in range(3):
+                pdf.new_page().insert_text((50, 60), "Архив", encoding=fitz.TEXT_ENCODING_CYRILLIC)
+            pdf.save(file_path)
+            pdf.close()
+        else:
+            Image.new("RGB", (1600, 1200), (200, 180, 160)).save(file_path)
+        app.db.update_document(doc["id"], file_path=str(file_path))
+        prepared.append(app.db.get_document(doc["id"]))
+    return prepared
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def run_interaction(func: Callable[[int], None], repeat: int) -> Dict:
+    timings, controls, control_updates, page_updates = [], [], [], []
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(0)  # прогрев
+    for i in range(repeat):
+        before = counters.snapshot()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func(i)
+        timings.append(time.perf_counter() - started)
+        after = counters.snapshot()
+        controls.append(after[0] - before[0])
+        control_updates.append(after[1] - before[1])
+        page_updates.append(after[2] - before[2])
+    return {
+        "repeat": repeat,
+        "p50_ms": percentile(timings, 0.5) * 1000,
+        "p95_ms": percentile(timings, 0.95) * 1000,
+        "controls_created": sum(controls) / repeat,
+        "control_updates": sum(control_updates) / repeat,
+        "page_updates": sum(page_updates) / repeat,
+    }
+
+
+def bench_size(module, size: int, repeat: int, seed: int) -> Dict:
+    rng = random.Random(seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = module.ArchiveApp()
+        generate_archive(app.db, spec_for_size(size, seed))
+        app.page = StubPage()
+        app.current_user = module.User(username="admin", role="admin", password="admin")
+        before = counters.snapshot()
+        started = time.perf_counter()
+        app.create_main_ui()
+        build = {
+            "ms": (time.perf_counter() - started) * 1000,
+            "controls_created": counters.snapshot()[0] - before[0],
+        }
+        previews = make_preview_files(app, rng, 30)
+
+    folders = sorted(app.folders)
+    leaves = [path for path in folders if not app.folders[path]["subfolders"]]
+    sample = [rng.choice(leaves) for _ in range(repeat + 1)]
+    top = [path for path in folders if not app.folders[path]["parent_path"]]
+    words = [rng.choice(TITLE_WORDS) for _ in range(repeat + 1)]
+
+    def type_search(i):
+        # Ввод по буквам: поиск запускается с третьего символа, как в on_search_change
+        word = words[i]
+        for length in range(3, len(word) + 1):
+            app.search_documents(word[:length])
+
+    def expand_top(i):
+        path = top[i % len(top)]
+        app.folder_tree.expanded_paths = {path}
+        app.update_folder_tree()
+
+    interactions = {
+        "select_folder": lambda i: app.select_folder(sample[i]),
+        "update_documents_list": lambda i: app.update_documents_list(),
+        "search_documents": lambda i: app.search_documents(words[i]),
+        "search_typing": type_search,
+        "show_document_preview": lambda i: app.show_document_preview(previews[i % len(previews)]),
+        "update_folder_tree": lambda i: app.update_folder_tree(),
+        "update_folder_tree_expanded": expand_top,
+    }
+    results = {"create_main_ui": build}
+    print(f"  create_main_ui {build['ms']:9.1f} мс, элементов {build['controls_created']}")
+    for name, func in interactions.items():
+        app.current_folder = sample[0]
+        results[name] = run_interaction(func, repeat)
+        r = results[name]
+        print(f"  {name:28s} p50 {r['p50_ms']:9.1f} мс  p95 {r['p95_ms']:9.1f} мс  "
+              f"элементов {r['controls_created']:8.0f}  update() {r['control_updates']:5.0f} "
+              f"+ страница {r['page_updates']:4.0f}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", dest="json_path", help="сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    json_path = Path(args.json_path).resolve() if args.json_path else None
+    instrument_flet()
+    module = load_app_module()
+    original_cwd = os.getcwd()
+    report = {"flet": getattr(ft, "__version__", None), "repeat": args.repeat, "sizes": {}}
+    try:
+        for size in args.sizes:
+            # ArchiveApp создает archive.db, previews и document_files в текущем каталоге
+            workdir = Path(tempfile.mkdtemp(prefix="bench_ui_"))
+            os.chdir(workdir)
+            try:
+                print(f"Архив на {size} документов")
+                report["sizes"][str(size)] = bench_size(module, size, args.repeat, args.seed)
+            finally:
+                os.chdir(original_cwd)
+                shutil.rmtree(workdir, ignore_errors=True)
+        report["controls_by_type"] = dict(counters.by_type.most_common(20))
+        if json_path:
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+    finally:
+        os.chdir(original_cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import asyncio
+import functools
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from database import DatabaseManager
+
+# Методы DatabaseManager, которые только читают данные
+READ_PREFIXES = ("get_", "has_", "search_", "check_")
+READ_METHODS = {"stats"}
+# Результат этих методов нельзя передать в другой поток
+UNSUPPORTED = {
+    "iter_documents": "генератор держит соединение потока: используйте get_documents_page "
+                      "или run_read с функцией, которая обходит iter_documents",
+    "batch": "пакет привязан к потоку: используйте run_write с функцией, которая "
+             "выполняет изменения внутри db.batch()",
+}
+
+
+class AsyncDatabaseManager:
+    """Асинхронная обертка над DatabaseManager для обработчиков интерфейса.
+
+    Все изменения выполняются по очереди в одном потоке-писателе, чтения -
+    в пуле потоков-читателей. База работает в режиме WAL (его включает
+    DatabaseManager), поэтому читатели не ждут завершения записи. Методы DatabaseManager доступны под теми же
+    именами и возвращают awaitable:
+
+        success = await adb.add_document(...)
+        documents = await adb.get_documents(folder)
+    """
+
+    def __init__(self, db: Optional[DatabaseManager] = None, readers: int = 4):
+        self.db = db if db is not None else DatabaseManager()
+        self._writes = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="db-writer", daemon=True)
+        self._writer.start()
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="db-reader")
+
+    def _write_loop(self):
+        while True:
+            item = self._writes.get()
+            if item is None:
+                break
+            future, func, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def run_write(self, func: Callable, *args, **kwargs) -> "asyncio.Future":
+        """Выполнение функции в потоке-писателе (например, нескольких
+        изменений внутри db.batch())"""
+        future = Future()
+        self._writes.put((future, func, args, kwargs))
+        return asyncio.wrap_future(future)
+
+    def run_read(self, func: Callable, *args, **kwargs) -> "asyncio.Future":
+        """Выполнение функции в пуле читателей"""
+        future = self._readers.submit(func, *args, **kwargs)
+        return asyncio.wrap_future(future)
+
+    def __getattr__(self, name: str):
+        if name in UNSUPPORTED:
+            raise AttributeError(f"AsyncDatabaseManager.{name} не поддерживается: {UNSUPPORTED[name]}")
+        if name.startswith("_"):
+            raise AttributeError(name)
+        method = getattr(self.db, name)
+        if not callable(method):
+            return method
+        read = name.startswith(READ_PREFIXES) or name in READ_METHODS
+        run = self.run_read if read else self.run_write
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            return run(method, *args, **kwargs)
+
+        return wrapper
+
+    def close(self):
+        """Завершение потоков после выполнения уже поставленных запросов"""
+        self._writes.put(None)
+        self._writer.join()
+        self._readers.shutdown(wait=True)
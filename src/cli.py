@@ -0,0 +1,433 @@
+"""Командная строка для пакетной работы с архивом без интерфейса.
+
+Команды:
+    import DIR      - импорт каталога (структура подкаталогов -> папки архива)
+    export FILE     - выгрузка в CSV, JSON Lines или XLSX
+    reindex         - перестроение индекса тегов и сводной статистики
+    previews        - генерация превью документов
+    verify          - сверка БД с document_files: наличие, размер и хеш
+                      файлов, бесхозные файлы (--repair - исправление)
+    move SRC DST    - перенос папки со всем содержимым
+
+Импорт можно повторить после сбоя: файлы, уже записанные в ту же папку
+архива (то же название, размер и хеш), пропускаются. Если пакет не удалось
+записать в БД, скопированные для него файлы удаляются.
+
+Документы читаются потоково (iter_documents), файлы обрабатываются
+параллельно в --jobs потоках или процессах; в работе одновременно не
+больше нескольких заданий на поток, поэтому память не растет с размером
+архива.
+
+Примеры:
+    python src/cli.py import /mnt/scan/2024 --folder /Сканы/2024 --jobs 8
+    python src/cli.py previews --folder /Договоры --jobs 4
+    python src/cli.py verify --jobs 8 --state verify.state --report problems.jsonl
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from database import DatabaseManager
+from exporter import FORMATS, DocumentExporter
+from file_copy import MODES as COPY_MODES, copy_file, hash_file
+
+# Заданий в работе на один поток: больше - только лишняя память
+WINDOW_PER_JOB = 4
+
+
+def bounded_map(executor: Executor, func: Callable, items: Iterable, jobs: int) -> Iterator:
+    """executor.map без чтения всего items заранее; результаты по порядку"""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= jobs * WINDOW_PER_JOB:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class Progress:
+    """Вывод хода выполнения не чаще раза в секунду"""
+
+    def __init__(self, label: str, total: Optional[int] = None):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.started = time.perf_counter()
+        self._shown = 0.0
+
+    def step(self, count: int = 1):
+        self.done += count
+        now = time.perf_counter()
+        if now - self._shown >= 1.0:
+            self._shown = now
+            total = f"/{self.total}" if self.total is not None else ""
+            print(f"\r{self.label}: {self.done}{total}", end="", file=sys.stderr, flush=True)
+
+    def finish(self):
+        elapsed = time.perf_counter() - self.started
+        print(f"\r{self.label}: {self.done} за {elapsed:.1f} с", file=sys.stderr)
+
+
+def open_database(path: str) -> DatabaseManager:
+    # Отладочный вывод проверки структуры не нужен в пакетном режиме
+    with contextlib.redirect_stdout(io.StringIO()):
+        return DatabaseManager(path)
+
+
+def ensure_folder(db: DatabaseManager, path: str) -> Optional[str]:
+    """Создание папки и недостающих родителей; None для корня"""
+    path = "/" + path.strip("/")
+    if path == "/":
+        return None
+    parent = None
+    for name in path.strip("/").split("/"):
+        current = f"{parent or ''}/{name}"
+        if db.get_folder_id(current) is None:
+            db.add_folder(name, current, parent)
+        parent = current
+    return path
+
+
+# --- import ---
+
+def _copy_job(job: Dict) -> Dict:
+    try:
+        # Документ с таким содержимым уже импортирован предыдущим запуском
+        if job["known_hashes"] and hash_file(job["source"]) in job["known_hashes"]:
+            return dict(job, skipped=True, error=None)
+        result = copy_file(job["source"], job["target"], mode=job["copy_mode"])
+        return dict(job, content_hash=result.sha256, file_size=result.size, skipped=False, error=None)
+    except OSError as e:
+        return dict(job, skipped=False, error=str(e))
+
+
+def _import_jobs(args, db: DatabaseManager, files_dir: Path) -> Iterator[Dict]:
+    """Файлы каталога с целевыми путями; папки создаются по мере обхода"""
+    source_root = Path(args.directory)
+    reserved = set()
+    for dirpath, dirnames, filenames in os.walk(source_root):
+        dirnames.sort()
+        relative = Path(dirpath).relative_to(source_root)
+        relative = "" if relative == Path(".") else relative.as_posix()
+        folder = "/".join(filter(None, [args.folder.strip("/"), relative]))
+        folder_path = ensure_folder(db, folder)
+        for filename in sorted(filenames):
+            if filename.startswith("."):
+                continue
+            source = Path(dirpath) / filename
+            try:
+                size = source.stat().st_size
+            except OSError:
+                size = None  # ошибку сообщит копирование
+            # Имена в document_files занимаются заранее: задания идут параллельно
+            target = files_dir / filename
+            counter = 1
+            while str(target) in reserved or target.exists():
+                target = files_dir / f"{Path(filename).stem}_{counter}{Path(filename).suffix}"
+                counter += 1
+            reserved.add(str(target))
+            yield {
+                "source": str(source),
+                "known_hashes": (db.get_document_hashes(folder_path, Path(filename).stem, size)
+                                 if size is not None else set()),
+                "target": str(target),
+                "folder_path": folder_path or "/",
+                "title": Path(filename).stem,
+                "copy_mode": args.copy_mode,
+            }
+
+
+def cmd_import(args, db: DatabaseManager) -> int:
+    files_dir = Path(args.files_dir)
+    files_dir.mkdir(exist_ok=True)
+    progress = Progress("Импорт")
+    batch, failed, skipped = [], 0, 0
+    submitted = []  # цели заданий, отданных в пул
+    committed = set()  # цели, записанные в БД
+
+    def import_jobs():
+        for job in _import_jobs(args, db, files_dir):
+            submitted.append(job["target"])
+            yield job
+
+    def flush() -> bool:
+        # add_documents пишет пакет одной транзакцией: все или ничего
+        if batch and db.add_documents(batch) != len(batch):
+            return False
+        committed.update(doc["file_path"] for doc in batch)
+        batch.clear()
+        return True
+
+    ok = True
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        results = bounded_map(executor, _copy_job, import_jobs(), args.jobs)
+        for job in results:
+            progress.step()
+            if job["error"]:
+                failed += 1
+                print(f"\nОшибка при копировании {job['source']}: {job['error']}", file=sys.stderr)
+                continue
+            if job["skipped"]:
+                skipped += 1
+                continue
+            batch.append({
+                "title": job["title"],
+                "description": "",
+                "file_path": job["target"],
+                "folder_path": job["folder_path"],
+                "status": args.status,
+                "author": args.author,
+                "tags": args.tags,
+                "content_hash": job["content_hash"],
+                "file_size": job["file_size"],
+            })
+            if len(batch) >= args.batch_size and not (ok := flush()):
+                break
+        ok = ok and flush()
+        # Новые задания не ставятся; уже начатые копирования пул дождется
+        results.close()
+    progress.finish()
+    if not ok:
+        # Без строк в БД скопированные файлы стали бы бесхозными
+        removed = 0
+        for target in submitted:
+            if target in committed:
+                continue
+            try:
+                os.unlink(target)
+                removed += 1
+            except FileNotFoundError:
+                pass  # копирование не успело начаться или файл пропущен
+            except OSError as e:
+                print(f"Ошибка при удалении {target}: {e}", file=sys.stderr)
+        print(f"Ошибка при записи документов в БД: импорт прерван, удалено скопированных файлов: {removed}. "
+              f"Повторный запуск пропустит уже импортированные файлы", file=sys.stderr)
+        return 1
+    if skipped:
+        print(f"Пропущено уже импортированных файлов: {skipped}")
+    if failed:
+        print(f"Не скопировано файлов: {failed}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+# --- export ---
+
+def cmd_export(args, db: DatabaseManager) -> int:
+    exporter = DocumentExporter(db)
+    progress = Progress("Выгрузка")
+
+    def on_progress(done, total):
+        progress.total = total
+        progress.step(done - progress.done)
+
+    try:
+        count = exporter.export(args.target, fmt=args.format, folder=args.folder,
+                                recursive=not args.no_recursive, compress=args.gzip or None,
+                                on_progress=on_progress)
+    except sqlite3.Error as e:
+        # Частичный файл выгрузки уже удален
+        progress.finish()
+        print(f"Ошибка при выгрузке документов: {e}", file=sys.stderr)
+        return 1
+    progress.finish()
+    print(f"Выгружено документов: {count} -> {args.target}")
+    return 0
+
+
+# --- reindex ---
+
+def cmd_reindex(args, db: DatabaseManager) -> int:
+    ok = True
+    for label, func in (("Индекс тегов", db.rebuild_tag_index), ("Сводная статистика", db.rebuild_stats)):
+        started = time.perf_counter()
+        done = func()
+        ok = ok and done
+        print(f"{label}: {'перестроено' if done else 'ошибка'} за {time.perf_counter() - started:.1f} с")
+    return 0 if ok else 1
+
+
+# --- previews ---
+
+def _preview_job(job) -> Optional[str]:
+    """Превью одного файла в процессе пула; ошибка или None"""
+    file_path, preview_dir, force = job
+    # PyMuPDF и Pillow загружаются только в процессах пула
+    from document_processor import ERROR_PREVIEW, render_preview
+
+    if not Path(file_path).exists():
+        return f"нет файла {file_path}"
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        preview = render_preview(file_path, preview_dir, force)
+    if preview == str(ERROR_PREVIEW):
+        return out.getvalue().strip() or f"не удалось создать превью {file_path}"
+    return None
+
+
+def cmd_previews(args, db: DatabaseManager) -> int:
+    Path(args.preview_dir).mkdir(exist_ok=True)
+    jobs = (
+        (doc["file_path"], args.preview_dir, args.force)
+        for doc in db.iter_documents(args.folder)
+        if doc["file_path"]
+    )
+    progress = Progress("Превью")
+    failed = 0
+    # Отрисовка PDF и изображений нагружает процессор: пул процессов
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        try:
+            for error in bounded_map(executor, _preview_job, jobs, args.jobs):
+                progress.step()
+                if error:
+                    failed += 1
+                    print(f"\n{error}", file=sys.stderr)
+        except sqlite3.Error as e:
+            progress.finish()
+            print(f"Ошибка при обходе документов: {e}", file=sys.stderr)
+            return 1
+    progress.finish()
+    return 1 if failed else 0
+
+
+# --- verify ---
+
+def cmd_verify(args, db: DatabaseManager) -> int:
+    from integrity import IntegrityScanner
+
+    progress = Progress("Проверка")
+    report = open(args.report, "a", encoding="utf-8") if args.report else None
+
+    def on_problem(problem):
+        print(f"\n{problem}", file=sys.stderr)
+        if report is not None:
+            report.write(json.dumps(asdict(problem), ensure_ascii=False) + "\n")
+
+    scanner = IntegrityScanner(
+        db, files_dir=args.files_dir, jobs=args.jobs, check_hash=not args.no_hash,
+        repair=args.repair, quarantine_dir=args.quarantine_dir, state_path=args.state,
+        grace_seconds=args.grace * 60, on_problem=on_problem, on_progress=progress.step,
+    )
+    error = None
+    try:
+        counts = scanner.scan(args.folder)
+    except (sqlite3.Error, RuntimeError) as e:
+        # RepairRefused, BatchRollback при --repair, сбой чтения БД; ход сохранен в --state
+        error = e
+    finally:
+        if report is not None:
+            report.close()
+    progress.finish()
+    if error is not None:
+        counts = scanner.counts
+        print(f"Ошибка при проверке: {error}", file=sys.stderr)
+        if not counts:
+            return 2
+    problems = sum(counts[kind] for kind in ("missing", "size", "hash", "orphan"))
+    print(f"Документов: {counts['documents']}, файлов: {counts['files']}, "
+          f"пропущено свежих файлов: {counts['skipped']}")
+    print(f"Нет файла: {counts['missing']}, размер: {counts['size']}, хеш: {counts['hash']}, "
+          f"бесхозных файлов: {counts['orphan']}")
+    if args.repair:
+        print(f"Исправлено: {counts['repaired']}, дописаны хеш и размер: {counts['filled']}")
+    print(f"Найдено проблем: {problems}")
+    if error is not None:
+        print("Проверка прервана" + (f", продолжить можно с --state {args.state}" if args.state else ""),
+              file=sys.stderr)
+        return 2
+    return 1 if problems else 0
+
+
+# --- move ---
+
+def cmd_move(args, db: DatabaseManager) -> int:
+    if not db.move_folder(args.source, args.destination):
+        print(f"Не удалось перенести {args.source} в {args.destination}", file=sys.stderr)
+        return 1
+    print(f"Папка {args.source} перенесена в {args.destination}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="archive.db", help="путь к базе архива")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 4,
+                        help="число параллельных потоков или процессов")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("import", parents=[common], help="импорт каталога")
+    p.add_argument("directory")
+    p.add_argument("--folder", default="/", help="папка архива, в которую идет импорт")
+    p.add_argument("--files-dir", default="document_files")
+    p.add_argument("--copy-mode", choices=COPY_MODES, default="auto")
+    p.add_argument("--status", default="Активный")
+    p.add_argument("--author", default="admin")
+    p.add_argument("--tags", nargs="*", default=[])
+    p.add_argument("--batch-size", type=int, default=500, help="документов на транзакцию")
+    p.set_defaults(func=cmd_import)
+
+    p = commands.add_parser("export", parents=[common], help="выгрузка документов")
+    p.add_argument("target")
+    p.add_argument("--format", choices=FORMATS, default=None, help="по умолчанию - по расширению")
+    p.add_argument("--folder", default=None)
+    p.add_argument("--no-recursive", action="store_true", help="без вложенных папок")
+    p.add_argument("--gzip", action="store_true")
+    p.set_defaults(func=cmd_export)
+
+    p = commands.add_parser("reindex", parents=[common], help="перестроение индекса тегов и статистики")
+    p.set_defaults(func=cmd_reindex)
+
+    p = commands.add_parser("previews", parents=[common], help="генерация превью")
+    p.add_argument("--folder", default=None)
+    p.add_argument("--preview-dir", default="previews")
+    p.add_argument("--force", action="store_true", help="пересоздать существующие превью")
+    p.set_defaults(func=cmd_previews)
+
+    p = commands.add_parser("verify", parents=[common], help="сверка БД с файлами документов")
+    p.add_argument("--folder", default=None, help="только документы папки (без поиска бесхозных файлов)")
+    p.add_argument("--files-dir", default=None,
+                   help="по умолчанию - document_files рядом с базой (--db)")
+    p.add_argument("--no-hash", action="store_true", help="проверять только наличие и размер")
+    p.add_argument("--repair", action="store_true",
+                   help="документы без файла - в корзину, бесхозные файлы - в карантин")
+    p.add_argument("--quarantine-dir", default=None,
+                   help="по умолчанию - orphaned_files рядом с базой (--db)")
+    p.add_argument("--state", default=None, help="файл состояния для продолжения прерванной проверки")
+    p.add_argument("--report", default=None, help="дописывать найденное в файл JSON Lines")
+    p.add_argument("--grace", type=float, default=60,
+                   help="минут: более свежие файлы без ссылки не считаются бесхозными")
+    p.set_defaults(func=cmd_verify)
+
+    p = commands.add_parser("move", parents=[common], help="перенос папки")
+    p.add_argument("source", help="путь или id папки")
+    p.add_argument("destination", help="путь или id новой родительской папки, / - корень")
+    p.set_defaults(func=cmd_move)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.jobs < 1:
+        print("--jobs должен быть не меньше 1", file=sys.stderr)
+        return 2
+    for name in ("source", "destination", "folder"):
+        # Папку можно задать числом (id)
+        value = getattr(args, name, None)
+        if isinstance(value, str) and value.isdigit() and args.command != "import":
+            setattr(args, name, int(value))
+    db = open_database(args.db)
+    return args.func(args, db)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,201 @@
 import sqlite3
+import json
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 import os
-from typing import Optional, List, Dict
+import queue
+from typing import Optional, List, Dict, Iterable, Iterator, Set, Union
 from pathlib import Path
 import logging
 
+from records import DocumentRecord, document_factory
+from instrumentation import DatabaseInstrumentation, instrument_methods
+
 logger = logging.getLogger(__name__)
 
+# Колонки документа в списках (get_documents и выборки по тегам и расположению)
+DOCUMENT_LIST_COLUMNS = """
+    id, title, description, file_path, status, created_date AS date_added,
+    author, tags, cabinet, shelf, box
+"""
+
+# Папка задается id или путем; None и "/" означают корневую папку
+FolderRef = Union[int, str, None]
+
+DOCUMENTS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        description TEXT,
+        file_path TEXT,
+        folder_id INTEGER,
+        status TEXT NOT NULL,
+        created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        author TEXT NOT NULL,
+        tags TEXT,
+        cabinet TEXT,
+        shelf TEXT,
+        box TEXT,
+        content_hash TEXT,
+        file_size INTEGER,
+        deleted_at TIMESTAMP,
+        FOREIGN KEY (folder_id) REFERENCES folders(id)
+    )
+"""
+
+
+class BatchRollback(sqlite3.Error):
+    """Пакет batch() отменен: одно из изменений в нем завершилось ошибкой"""
+
+
 class DatabaseManager:
-    def __init__(self, db_path: str = "archive.db"):
+    def __init__(self, db_path: str = "archive.db",
+                 instrumentation: Optional[DatabaseInstrumentation] = None,
+                 pool_size: int = 0):
         self.db_path = db_path
+        self.instrumentation = instrumentation  # статистика вызовов и запросов, см. stats()
+        self._local = threading.local()  # соединение активного batch() для каждого потока
+        # Пул открытых соединений для серверов с частыми короткими запросами;
+        # при pool_size=0 соединение открывается на каждый вызов
+        self.pool_size = pool_size
+        self._pool = queue.LifoQueue(maxsize=pool_size) if pool_size else None
+        self._enable_wal()
+        self._migrate_folder_ids()
         self._create_tables()
         self.check_database_structure()
         self.verify_document_table()
 
+    def _enable_wal(self):
+        """Перевод базы в режим WAL (сохраняется в файле базы).
+
+        В WAL читатели не блокируют писателей: долгий обход iter_documents
+        (экспорт, генерация превью) не мешает изменениям из других соединений.
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+            finally:
+                conn.close()
+            if mode.lower() != "wal":
+                # Например, база в памяти или ФС без разделяемой памяти
+                print(f"Режим WAL недоступен, используется {mode}")
+        except sqlite3.Error as e:
+            print(f"Ошибка при включении WAL: {e}")
+
+    @contextmanager
+    def _connect(self):
+        """Соединение с БД: фиксация при успехе, откат при ошибке.
+
+        Внутри batch() возвращается общее соединение пакета, а фиксация
+        откладывается до выхода из пакета. Ошибка внутри пакета делает его
+        отменяемым целиком: последующие вызовы в пакете не выполняются, а
+        при выходе из пакета транзакция откатывается.
+        """
+        conn = getattr(self._local, "batch_conn", None)
+        if conn is not None:
+            if self._local.batch_error is not None:
+                raise BatchRollback(f"пакет отменен после ошибки: {self._local.batch_error}")
+            try:
+                yield conn
+            except Exception as e:
+                self._local.batch_error = e
+                raise
+            return
+        conn = self._acquire_connection()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._release_connection(conn)
+
+    def _open_connection(self) -> sqlite3.Connection:
+        """Новое соединение с включенной проверкой внешних ключей"""
+        # Соединение из пула используется разными потоками, но не одновременно
+        options = {"check_same_thread": False} if self._pool is not None else {}
+        if self.instrumentation is not None:
+            conn = self.instrumentation.connect(self.db_path, **options)
+        else:
+            conn = sqlite3.connect(self.db_path, **options)
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def _acquire_connection(self) -> sqlite3.Connection:
+        """Соединение из пула или новое"""
+        if self._pool is not None:
+            try:
+                return self._pool.get_nowait()
+            except queue.Empty:
+                pass
+        return self._open_connection()
+
+    def _release_connection(self, conn: sqlite3.Connection):
+        """Возврат соединения в пул; лишние и прерванные соединения закрываются"""
+        if self._pool is not None and not conn.in_transaction:
+            try:
+                self._pool.put_nowait(conn)
+                return
+            except queue.Full:
+                pass
+        conn.close()
+
+    def close(self):
+        """Закрытие соединений пула"""
+        while self._pool is not None:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def stats(self) -> Dict:
+        """Снимок статистики вызовов методов и запросов (для панели администратора)"""
+        if self.instrumentation is None:
+            return {"enabled": False}
+        return self.instrumentation.snapshot()
+
+    def reset_stats(self):
+        """Обнуление накопленной статистики"""
+        if self.instrumentation is not None:
+            self.instrumentation.reset()
+
+    @contextmanager
+    def batch(self):
+        """Группировка изменений в одну транзакцию
+
+        with db.batch():
+            db.update_document(1, status="Завершен")
+            db.move_documents([2, 3], "/Архив")
+
+        Методы внутри пакета по-прежнему возвращают False/0 при ошибке, но
+        после первой ошибки пакет не фиксируется: при выходе все его
+        изменения откатываются и поднимается BatchRollback.
+        """
+        if getattr(self._local, "batch_conn", None) is not None:
+            # Вложенный пакет становится частью внешнего
+            yield self
+            return
+        conn = self._acquire_connection()
+        self._local.batch_conn = conn
+        self._local.batch_error = None
+        self._local.pending_removals = []
+        try:
+            with conn:
+                yield self
+                if self._local.batch_error is not None:
+                    raise BatchRollback(f"пакет отменен: {self._local.batch_error}")
+        finally:
+            self._local.batch_conn = None
+            self._local.batch_error = None
+            self._release_connection(conn)
+            pending, self._local.pending_removals = self._local.pending_removals, None
+        # Файлы удаляются только после успешной фиксации пакета
+        self._remove_files(pending)
+
     def _create_tables(self):
         """Создание таблиц базы данных"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             # Таблица пользователей
@@ -37,32 +216,83 @@ class DatabaseManager:
                     name TEXT NOT NULL,
                     path TEXT UNIQUE NOT NULL,
                     parent_path TEXT,
+                    parent_id INTEGER REFERENCES folders(id),
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """)
 
-            # Таблица документов
+            # Таблица документов (folder_id IS NULL - документ в корневой папке)
+            cursor.execute(DOCUMENTS_TABLE_SQL.format(name="documents"))
+
+            # Очередь заданий на загрузку документов
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS documents (
+                CREATE TABLE IF NOT EXISTS ingest_jobs (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    description TEXT,
-                    file_path TEXT,
-                    folder_path TEXT NOT NULL,
-                    status TEXT NOT NULL,
-                    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    author TEXT NOT NULL,
-                    tags TEXT,
-                    cabinet TEXT,
-                    shelf TEXT,
-                    box TEXT,
-                    FOREIGN KEY (folder_path) REFERENCES folders(path)
+                    source_path TEXT NOT NULL,
+                    target_path TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL DEFAULT 5,
+                    next_attempt_at REAL NOT NULL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_expires_at REAL,
+                    last_error TEXT,
+                    document_id INTEGER,
+                    content_hash TEXT,
+                    file_size INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """)
 
+            # Колонки, появившиеся после создания существующих баз
+            self._add_missing_columns(cursor, "documents", {
+                "content_hash": "TEXT",
+                "file_size": "INTEGER",
+                "deleted_at": "TIMESTAMP",
+            })
+            self._add_missing_columns(cursor, "ingest_jobs", {
+                "content_hash": "TEXT",
+                "file_size": "INTEGER",
+            })
+
+            # Нормализованные теги документов
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS document_tags (
+                    tag TEXT NOT NULL,
+                    document_id INTEGER NOT NULL,
+                    PRIMARY KEY (tag, document_id),
+                    FOREIGN KEY (document_id) REFERENCES documents(id) ON DELETE CASCADE
+                ) WITHOUT ROWID
+            """)
+
             # Создание индексов
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_folders_path ON folders(path)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_folder ON documents(folder_path)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_folders_parent ON folders(parent_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_folder ON documents(folder_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ingest_jobs_state ON ingest_jobs(state, next_attempt_at)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_document_tags_document ON document_tags(document_id)")
+            cursor.execute("DROP INDEX IF EXISTS idx_documents_location")
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_documents_location_live
+                ON documents(cabinet, shelf, box) WHERE deleted_at IS NULL
+            """)
+            # Удаленные документы не попадают в индекс живых документов папки
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_documents_folder_live
+                ON documents(folder_id, created_date) WHERE deleted_at IS NULL
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_documents_deleted
+                ON documents(deleted_at) WHERE deleted_at IS NOT NULL
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_file_path ON documents(file_path)")
+
+            # Заполняем таблицу тегов для баз, созданных до ее появления
+            cursor.execute("SELECT 1 FROM document_tags LIMIT 1")
+            if not cursor.fetchone():
+                self._rebuild_tags(cursor)
 
             # Добавление админа по умолчанию, если его нет
             cursor.execute("SELECT id FROM users WHERE username = 'admin'")
@@ -72,11 +302,249 @@ class DatabaseManager:
                     VALUES (?, ?, ?)
                 """, ("admin", "admin", "admin"))
 
-            conn.commit()
+            # Сводная статистика, поддерживаемая триггерами
+            self._create_stats(cursor)
+
+    def _create_stats(self, cursor):
+        """Создание таблицы счетчиков archive_stats и триггеров для нее"""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS archive_stats (
+                scope TEXT NOT NULL,
+                key TEXT NOT NULL,
+                doc_count INTEGER NOT NULL DEFAULT 0,
+                bytes INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (scope, key)
+            ) WITHOUT ROWID
+        """)
+
+        def document_delta(row: str, sign: str) -> str:
+            # Строка документа учитывается в общем счетчике и в разрезах
+            # по папке, статусу и автору; удаленные (в корзине) не учитываются
+            live = f"({row}.deleted_at IS NULL)"
+            size = f"{sign}COALESCE({row}.file_size, 0) * {live}"
+            values = ", ".join(
+                f"('{scope}', {key}, {sign}{live}, {size})"
+                for scope, key in (
+                    ("table", "'documents'"),
+                    ("folder", f"COALESCE({row}.folder_id, 0)"),
+                    ("status", f"{row}.status"),
+                    ("author", f"{row}.author"),
+                )
+            )
+            return f"""
+                INSERT INTO archive_stats (scope, key, doc_count, bytes) VALUES {values}
+                ON CONFLICT (scope, key) DO UPDATE SET
+                    doc_count = doc_count + excluded.doc_count,
+                    bytes = bytes + excluded.bytes;
+            """
+
+        def table_delta(table: str, sign: str) -> str:
+            return f"""
+                INSERT INTO archive_stats (scope, key, doc_count) VALUES ('table', '{table}', {sign}1)
+                ON CONFLICT (scope, key) DO UPDATE SET doc_count = doc_count + excluded.doc_count;
+            """
+
+        triggers = {
+            "trg_stats_documents_insert": f"AFTER INSERT ON documents BEGIN {document_delta('NEW', '+')} END",
+            "trg_stats_documents_delete": f"AFTER DELETE ON documents BEGIN {document_delta('OLD', '-')} END",
+            "trg_stats_documents_update": (
+                "AFTER UPDATE OF folder_id, status, author, file_size, deleted_at ON documents "
+                f"BEGIN {document_delta('OLD', '-')} {document_delta('NEW', '+')} END"
+            ),
+        }
+        for table in ("folders", "users"):
+            triggers[f"trg_stats_{table}_insert"] = f"AFTER INSERT ON {table} BEGIN {table_delta(table, '+')} END"
+            triggers[f"trg_stats_{table}_delete"] = f"AFTER DELETE ON {table} BEGIN {table_delta(table, '-')} END"
+        for name, body in triggers.items():
+            # Пересоздаем, чтобы базы со старой версией триггеров получили актуальную
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"CREATE TRIGGER {name} {body}")
+
+        # Первичное заполнение для баз, созданных до появления статистики
+        cursor.execute("SELECT 1 FROM archive_stats WHERE scope = 'table' AND key = 'documents'")
+        if not cursor.fetchone():
+            self._rebuild_stats(cursor)
+
+    def _rebuild_stats(self, cursor):
+        """Пересчет archive_stats по содержимому таблиц"""
+        cursor.execute("DELETE FROM archive_stats")
+        cursor.execute("""
+            INSERT INTO archive_stats (scope, key, doc_count, bytes)
+            SELECT 'table', 'documents', COUNT(*), COALESCE(SUM(file_size), 0)
+            FROM documents WHERE deleted_at IS NULL
+            UNION ALL
+            SELECT 'table', 'folders', COUNT(*), 0 FROM folders
+            UNION ALL
+            SELECT 'table', 'users', COUNT(*), 0 FROM users
+        """)
+        for scope, column in (("folder", "COALESCE(folder_id, 0)"), ("status", "status"), ("author", "author")):
+            cursor.execute(f"""
+                INSERT INTO archive_stats (scope, key, doc_count, bytes)
+                SELECT '{scope}', {column}, COUNT(*), COALESCE(SUM(file_size), 0)
+                FROM documents
+                WHERE deleted_at IS NULL
+                GROUP BY {column}
+            """)
+
+    def rebuild_stats(self) -> bool:
+        """Полный пересчет сводной статистики"""
+        try:
+            with self._connect() as conn:
+                self._rebuild_stats(conn.cursor())
+                return True
+        except sqlite3.Error as e:
+            print(f"Ошибка при пересчете статистики: {e}")
+            return False
+
+    def _migrate_folder_ids(self):
+        """Перевод documents.folder_path (TEXT) на documents.folder_id (INTEGER)"""
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("PRAGMA table_info(documents)")
+            if "folder_path" not in {row[1] for row in cursor.fetchall()}:
+                return  # новая база или миграция уже выполнена
+
+            # Пересоздание таблицы требует отключенных внешних ключей
+            cursor.execute("PRAGMA foreign_keys = OFF")
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                self._add_missing_columns(cursor, "folders", {"parent_id": "INTEGER REFERENCES folders(id)"})
+                self._add_missing_columns(cursor, "documents", {
+                    "content_hash": "TEXT",
+                    "file_size": "INTEGER",
+                    "deleted_at": "TIMESTAMP",
+                })
+
+                # Папки, на которые ссылаются документы, но которых нет в folders
+                cursor.execute("""
+                    SELECT DISTINCT folder_path FROM documents
+                    WHERE folder_path != '/' AND folder_path NOT IN (SELECT path FROM folders)
+                """)
+                for (missing,) in cursor.fetchall():
+                    parts = [part for part in missing.split("/") if part]
+                    for depth in range(1, len(parts) + 1):
+                        path = "/" + "/".join(parts[:depth])
+                        parent = "/" + "/".join(parts[:depth - 1]) if depth > 1 else None
+                        cursor.execute(
+                            "INSERT OR IGNORE INTO folders (name, path, parent_path) VALUES (?, ?, ?)",
+                            (parts[depth - 1], path, parent)
+                        )
+
+                cursor.execute("""
+                    UPDATE folders
+                    SET parent_id = (SELECT p.id FROM folders p WHERE p.path = folders.parent_path)
+                """)
+
+                cursor.execute(DOCUMENTS_TABLE_SQL.format(name="documents_new"))
+                cursor.execute("""
+                    INSERT INTO documents_new
+                    (id, title, description, file_path, folder_id, status, created_date,
+                     author, tags, cabinet, shelf, box, content_hash, file_size, deleted_at)
+                    SELECT d.id, d.title, d.description, d.file_path, f.id, d.status, d.created_date,
+                           d.author, d.tags, d.cabinet, d.shelf, d.box, d.content_hash,
+                           d.file_size, d.deleted_at
+                    FROM documents d
+                    LEFT JOIN folders f ON f.path = d.folder_path
+                """)
+                cursor.execute("DROP TABLE documents")
+                cursor.execute("ALTER TABLE documents_new RENAME TO documents")
+
+                # Счетчики по папкам были привязаны к путям - пересчитываем
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'archive_stats'")
+                if cursor.fetchone():
+                    cursor.execute("DELETE FROM archive_stats")
+                cursor.execute("COMMIT")
+            except sqlite3.Error:
+                cursor.execute("ROLLBACK")
+                raise
+            print("Документы переведены на целочисленные идентификаторы папок")
+        finally:
+            conn.close()
+
+    def _resolve_folder(self, cursor, folder: FolderRef) -> Optional[int]:
+        """id папки по id или пути; None для корневой папки.
+
+        KeyError, если папки с таким путем нет.
+        """
+        if folder is None or folder == "/":
+            return None
+        if isinstance(folder, int):
+            return folder
+        cursor.execute("SELECT id FROM folders WHERE path = ?", (folder,))
+        row = cursor.fetchone()
+        if row is None:
+            raise KeyError(folder)
+        return row[0]
+
+    def get_folder_id(self, path: str) -> Optional[int]:
+        """id папки по пути (None для корневой или несуществующей папки)"""
+        try:
+            with self._connect() as conn:
+                return self._resolve_folder(conn.cursor(), path)
+        except (sqlite3.Error, KeyError):
+            return None
+
+    def get_folder_path(self, folder_id: int) -> Optional[str]:
+        """Путь папки по id"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT path FROM folders WHERE id = ?", (folder_id,))
+                row = cursor.fetchone()
+                return row[0] if row else None
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении пути папки: {e}")
+            return None
+
+    def _add_missing_columns(self, cursor, table: str, columns: Dict[str, str]):
+        """Добавление отсутствующих колонок в существующую таблицу"""
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row[1] for row in cursor.fetchall()}
+        for name, column_type in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+
+    @staticmethod
+    def _normalize_tags(tags: Optional[Iterable[str]]) -> List[str]:
+        """Очистка списка тегов от пробелов, пустых значений и повторов"""
+        if not tags:
+            return []
+        if isinstance(tags, str):
+            tags = tags.split(',')
+        return list(dict.fromkeys(tag.strip() for tag in tags if tag and tag.strip()))
+
+    def _write_tags(self, cursor, doc_ids: Iterable[int], tags: List[str]):
+        """Замена тегов у документов в таблице document_tags"""
+        doc_ids = list(doc_ids)
+        cursor.executemany("DELETE FROM document_tags WHERE document_id = ?",
+                           ((doc_id,) for doc_id in doc_ids))
+        cursor.executemany("INSERT OR IGNORE INTO document_tags (tag, document_id) VALUES (?, ?)",
+                           ((tag, doc_id) for doc_id in doc_ids for tag in tags))
+
+    def _rebuild_tags(self, cursor):
+        """Перестроение document_tags по колонке documents.tags"""
+        cursor.execute("DELETE FROM document_tags")
+        cursor.execute("SELECT id, tags FROM documents WHERE tags IS NOT NULL AND tags != ''")
+        rows = cursor.fetchall()
+        cursor.executemany(
+            "INSERT OR IGNORE INTO document_tags (tag, document_id) VALUES (?, ?)",
+            ((tag, doc_id) for doc_id, tags in rows for tag in self._normalize_tags(tags))
+        )
+
+    def rebuild_tag_index(self) -> bool:
+        """Полное перестроение индекса тегов"""
+        try:
+            with self._connect() as conn:
+                self._rebuild_tags(conn.cursor())
+                return True
+        except sqlite3.Error as e:
+            print(f"Ошибка при перестроении индекса тегов: {e}")
+            return False
 
     def get_user(self, username: str) -> Optional[Dict]:
         """Получение пользователя по имени"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT username, password, role
@@ -94,19 +562,17 @@ class DatabaseManager:
 
     def get_folders(self) -> Dict[str, Dict]:
         """Получение всех папок"""
-        print("Начало получения папок из БД")  # Отладка
         folders = {}
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
-                cursor.execute("SELECT path, name, parent_path FROM folders")
+                cursor.execute("SELECT id, path, name, parent_path FROM folders")
                 rows = cursor.fetchall()
-                print(f"Получено записей из БД: {len(rows)}")  # Отладка
                 
                 for row in rows:
-                    path, name, parent_path = row
-                    print(f"Обработка папки: path={path}, name={name}, parent={parent_path}")  # Отладка
+                    folder_id, path, name, parent_path = row
                     folders[path] = {
+                        "id": folder_id,
                         "name": name,
                         "parent_path": parent_path,
                         "subfolders": set()
@@ -118,7 +584,6 @@ class DatabaseManager:
                         if parent_path in folders:
                             folders[parent_path]["subfolders"].add(path)
                 
-                print(f"Итоговая структура папок: {folders}")  # Отладка
                 return folders
                 
         except sqlite3.Error as e:
@@ -128,158 +593,411 @@ class DatabaseManager:
     def add_folder(self, name: str, path: str, parent_path: Optional[str] = None) -> bool:
         """Добавление новой папки"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute("""
-                    INSERT INTO folders (name, path, parent_path)
-                    VALUES (?, ?, ?)
-                """, (name, path, parent_path))
-                conn.commit()
+                    INSERT INTO folders (name, path, parent_path, parent_id)
+                    VALUES (?, ?, ?, (SELECT id FROM folders WHERE path = ?))
+                """, (name, path, parent_path, parent_path))
                 return True
         except sqlite3.IntegrityError:
             return False
 
-    def rename_folder(self, old_path: str, new_name: str, new_path: str) -> bool:
-        """Переименование папки"""
+    def rename_folder(self, folder: FolderRef, new_name: str, new_path: str) -> bool:
+        """Переименование папки (по id или пути)"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
-                # Обновляем имя и путь папки
-                cursor.execute("""
-                    UPDATE folders 
-                    SET name = ?, path = ?
-                    WHERE path = ?
-                """, (new_name, new_path, old_path))
-                
-                # Обновляем пути в дочерних папках
-                cursor.execute("""
-                    UPDATE folders
-                    SET path = replace(path, ?, ?),
-                        parent_path = replace(parent_path, ?, ?)
-                    WHERE path LIKE ?
-                """, (old_path, new_path, old_path, new_path, f"{old_path}/%"))
-                
-                # Обновляем пути в документах
-                cursor.execute("""
-                    UPDATE documents
-                    SET folder_path = replace(folder_path, ?, ?)
-                    WHERE folder_path LIKE ?
-                """, (old_path, new_path, f"{old_path}%"))
-                
-                conn.commit()
-                return True
-        except sqlite3.Error:
+                folder_id = self._resolve_folder(cursor, folder)
+                cursor.execute("SELECT path, parent_path, parent_id FROM folders WHERE id = ?", (folder_id,))
+                row = cursor.fetchone()
+                if not row:
+                    return False
+                return self._relocate_folder(cursor, folder_id, row[0], new_path, new_name, row[1], row[2])
+        except (sqlite3.Error, KeyError):
             return False
 
-    def delete_folder(self, path: str) -> bool:
-        """Удаление папки"""
+    def move_folder(self, src: FolderRef, dst_parent: FolderRef) -> bool:
+        """Перенос папки со всеми подпапками и документами в другую папку.
+
+        Папки задаются id или путем; dst_parent=None или "/" делает папку корневой.
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
-                # Проверяем наличие документов
-                cursor.execute("SELECT COUNT(*) FROM documents WHERE folder_path = ?", (path,))
+                src_id = self._resolve_folder(cursor, src)
+                dst_id = self._resolve_folder(cursor, dst_parent)
+                cursor.execute("SELECT name, path, parent_id FROM folders WHERE id = ?", (src_id,))
+                row = cursor.fetchone()
+                if not row:
+                    return False
+                name, src_path, _ = row
+                dst_path = None
+                if dst_id is not None:
+                    cursor.execute("SELECT path FROM folders WHERE id = ?", (dst_id,))
+                    dst_row = cursor.fetchone()
+                    if not dst_row:
+                        return False
+                    dst_path = dst_row[0]
+                    # Нельзя перенести папку в саму себя или в своего потомка
+                    if dst_path == src_path or dst_path.startswith(src_path + "/"):
+                        return False
+                new_path = f"{dst_path or ''}/{name}"
+                return self._relocate_folder(cursor, src_id, src_path, new_path, name, dst_path, dst_id)
+        except (sqlite3.Error, KeyError) as e:
+            print(f"Ошибка при переносе папки: {e}")
+            return False
+
+    def _relocate_folder(self, cursor, folder_id: int, old_path: str, new_path: str,
+                         new_name: str, new_parent: Optional[str], new_parent_id: Optional[int]) -> bool:
+        """Смена пути папки и всего ее поддерева в текущей транзакции.
+
+        Документы ссылаются на папку по id и не изменяются. Путь хранится
+        в folders для навигации: потомки выбираются диапазоном [old/, old0)
+        по индексу пути ('0' - следующий символ после '/'), а префикс
+        заменяется через substr.
+        """
+        if new_path == old_path:
+            cursor.execute("UPDATE folders SET name = ? WHERE id = ?", (new_name, folder_id))
+            return True
+        cursor.execute("SELECT 1 FROM folders WHERE path = ?", (new_path,))
+        if cursor.fetchone():
+            return False
+
+        lower, upper = old_path + "/", old_path + "0"
+        suffix_start = len(old_path) + 1
+
+        cursor.execute("""
+            UPDATE folders
+            SET name = ?, path = ?, parent_path = ?, parent_id = ?
+            WHERE id = ?
+        """, (new_name, new_path, new_parent, new_parent_id, folder_id))
+        cursor.execute("""
+            UPDATE folders
+            SET path = ? || substr(path, ?),
+                parent_path = ? || substr(parent_path, ?)
+            WHERE path >= ? AND path < ?
+        """, (new_path, suffix_start, new_path, suffix_start, lower, upper))
+        return True
+
+    def delete_folder(self, folder: FolderRef) -> bool:
+        """Удаление папки (по id или пути)"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                folder_id = self._resolve_folder(cursor, folder)
+                if folder_id is None:
+                    return False
+                # Проверяем наличие документов, в том числе в корзине: восстановленный
+                # документ должен вернуться в свою папку
+                cursor.execute("SELECT COUNT(*) FROM documents WHERE folder_id = ?", (folder_id,))
                 if cursor.fetchone()[0] > 0:
                     return False
                 
                 # Проверяем наличие подпапок
-                cursor.execute("SELECT COUNT(*) FROM folders WHERE parent_path = ?", (path,))
+                cursor.execute("SELECT COUNT(*) FROM folders WHERE parent_id = ?", (folder_id,))
                 if cursor.fetchone()[0] > 0:
                     return False
                 
                 # Удаляем папку
-                cursor.execute("DELETE FROM folders WHERE path = ?", (path,))
-                conn.commit()
+                cursor.execute("DELETE FROM folders WHERE id = ?", (folder_id,))
                 return True
-        except sqlite3.Error:
+        except (sqlite3.Error, KeyError):
             return False
 
-    def get_documents(self, folder_path: str) -> List[Dict]:
-        """Получение документов в папке"""
+    def get_documents(self, folder: FolderRef) -> List[DocumentRecord]:
+        """Получение документов в папке (по id или пути)"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
-                query = """
-                    SELECT id, title, description, file_path, status, created_date, 
-                           author, tags, cabinet, shelf, box
+                query = f"""
+                    SELECT {DOCUMENT_LIST_COLUMNS}
                     FROM documents
-                    WHERE folder_path = ?
+                    WHERE folder_id IS ? AND deleted_at IS NULL
                     ORDER BY created_date DESC
                 """
-                cursor.execute(query, (folder_path,))
-                
-                documents = []
-                for row in cursor.fetchall():
-                    doc = {
-                        "id": row[0],
-                        "title": row[1],
-                        "description": row[2],
-                        "file_path": row[3],
-                        "status": row[4],
-                        "date_added": row[5],
-                        "author": row[6],
-                        "tags": row[7].split(',') if row[7] else [],
-                        "cabinet": row[8],
-                        "shelf": row[9],
-                        "box": row[10]
-                    }
-                    documents.append(doc)
-                return documents
+                folder_id = self._resolve_folder(cursor, folder)
+                cursor.row_factory = document_factory
+                cursor.execute(query, (folder_id,))
+                return cursor.fetchall()
+        except KeyError:
+            return []
         except sqlite3.Error as e:
             print(f"Ошибка при получении документов: {e}")
             return []
 
     def add_document(self, title: str, description: str, file_path: str, 
-                    folder_path: str, status: str, author: str, 
+                    folder_path: FolderRef, status: str, author: str, 
                     cabinet: str = None, shelf: str = None, box: str = None,
-                    tags: List[str] = None) -> bool:
-        """Добавление нового документа"""
+                    tags: List[str] = None, content_hash: str = None,
+                    file_size: int = None) -> bool:
+        """Добавление нового документа (папка задается id или путем)"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 query = """
                     INSERT INTO documents 
-                    (title, description, file_path, folder_path, status, author, 
-                     cabinet, shelf, box, tags)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    (title, description, file_path, folder_id, status, author, 
+                     cabinet, shelf, box, tags, content_hash, file_size)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """
+                tags = self._normalize_tags(tags)
                 params = (
-                    title, description, file_path, folder_path, status, author,
+                    title, description, file_path,
+                    self._resolve_folder(cursor, folder_path), status, author,
                     cabinet, shelf, box,
-                    ','.join(tags) if tags else None
+                    ','.join(tags) if tags else None,
+                    content_hash, file_size
                 )
                 cursor.execute(query, params)
-                conn.commit()
+                if tags:
+                    self._write_tags(cursor, [cursor.lastrowid], tags)
                 return True
-        except sqlite3.Error as e:
+        except (sqlite3.Error, KeyError) as e:
             print(f"Ошибка при добавлении документа: {e}")
             return False
 
     def delete_document(self, document_id: int) -> bool:
         """Удаление документа"""
+        return self.delete_documents([document_id]) > 0
+
+    def add_documents(self, documents: Iterable[Dict]) -> int:
+        """Пакетное добавление документов одной транзакцией.
+
+        Папка документа задается ключом folder_id или folder_path (id или путь).
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            documents = [
+                dict(doc, tags=self._normalize_tags(doc.get("tags"))) for doc in documents
+            ]
+            with self._connect() as conn:
                 cursor = conn.cursor()
-                # Получаем путь к файлу перед удалением
-                cursor.execute("SELECT file_path FROM documents WHERE id = ?", (document_id,))
-                result = cursor.fetchone()
-                if result:
-                    file_path = result[0]
-                    # Удаляем запись из БД
-                    cursor.execute("DELETE FROM documents WHERE id = ?", (document_id,))
-                    conn.commit()
-                    # Удаляем файл, если он существует
-                    if file_path and os.path.exists(file_path):
-                        os.remove(file_path)
-                    return True
-            return False
+                folder_ids = {}
+                for doc in documents:
+                    folder = doc["folder_id"] if "folder_id" in doc else doc["folder_path"]
+                    if folder not in folder_ids:
+                        folder_ids[folder] = self._resolve_folder(cursor, folder)
+                    doc["folder_id"] = folder_ids[folder]
+                cursor.executemany("""
+                    INSERT INTO documents
+                    (title, description, file_path, folder_id, status, author,
+                     cabinet, shelf, box, tags, content_hash, file_size)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    (
+                        doc["title"], doc.get("description"), doc.get("file_path"),
+                        doc["folder_id"], doc["status"], doc["author"],
+                        doc.get("cabinet"), doc.get("shelf"), doc.get("box"),
+                        ','.join(doc["tags"]) if doc.get("tags") else None,
+                        doc.get("content_hash"), doc.get("file_size")
+                    )
+                    for doc in documents
+                ))
+                added = cursor.rowcount
+                # Внутри транзакции AUTOINCREMENT выдает id подряд
+                cursor.execute("SELECT last_insert_rowid()")
+                first_id = cursor.fetchone()[0] - len(documents) + 1
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO document_tags (tag, document_id) VALUES (?, ?)",
+                    ((tag, first_id + i) for i, doc in enumerate(documents) for tag in doc["tags"])
+                )
+                return added
+        except (sqlite3.Error, KeyError) as e:
+            print(f"Ошибка при пакетном добавлении документов: {e}")
+            return 0
+
+    def update_documents(self, doc_ids: Iterable[int], **fields) -> int:
+        """Пакетное обновление одинаковых полей у нескольких документов.
+
+        Папка задается полем folder_id или folder_path (id или путь,
+        "/" - корневая папка); None, как и для остальных полей, оставляет
+        папку без изменений.
+        """
+        doc_ids = list(doc_ids)
+        folder = fields.pop("folder_id", None)
+        folder = fields.pop("folder_path", None) or folder
+        move = folder is not None
+        tags = None
+        if fields.get("tags") is not None:
+            tags = self._normalize_tags(fields["tags"])
+            fields["tags"] = ','.join(tags)
+        update_fields = []
+        values = []
+        for field, value in fields.items():
+            if value is not None:  # Обновляем только непустые поля
+                update_fields.append(f"{field} = ?")
+                values.append(value)
+        if not update_fields and not move:
+            return 0
+
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                if move:
+                    update_fields.append("folder_id = ?")
+                    values.append(self._resolve_folder(cursor, folder))
+                cursor.executemany(
+                    f"UPDATE documents SET {', '.join(update_fields)} WHERE id = ?",
+                    ((*values, doc_id) for doc_id in doc_ids)
+                )
+                updated = cursor.rowcount
+                if tags is not None:
+                    self._write_tags(cursor, doc_ids, tags)
+                return updated
+        except (sqlite3.Error, KeyError) as e:
+            print(f"Ошибка при пакетном обновлении документов: {e}")
+            return 0
+
+    def move_documents(self, doc_ids: Iterable[int], folder: FolderRef) -> int:
+        """Перенос нескольких документов в другую папку (по id или пути, None - корень)"""
+        return self.update_documents(doc_ids, folder_id="/" if folder is None else folder)
+
+    def delete_documents(self, doc_ids: Iterable[int]) -> int:
+        """Пакетное удаление документов в корзину.
+
+        Строки помечаются deleted_at и исключаются из запросов; записи и файлы
+        окончательно удаляет purge_documents по истечении срока хранения.
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.executemany(
+                    "UPDATE documents SET deleted_at = CURRENT_TIMESTAMP WHERE id = ? AND deleted_at IS NULL",
+                    ((doc_id,) for doc_id in doc_ids)
+                )
+                return cursor.rowcount
         except sqlite3.Error as e:
-            logger.error(f"Ошибка при удалении документа: {e}")
-            return False
+            logger.error(f"Ошибка при удалении документов: {e}")
+            return 0
+
+    def restore_document(self, document_id: int) -> bool:
+        """Восстановление документа из корзины"""
+        return self.restore_documents([document_id]) > 0
+
+    def restore_documents(self, doc_ids: Iterable[int]) -> int:
+        """Пакетное восстановление документов из корзины"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.executemany(
+                    "UPDATE documents SET deleted_at = NULL WHERE id = ? AND deleted_at IS NOT NULL",
+                    ((doc_id,) for doc_id in doc_ids)
+                )
+                return cursor.rowcount
+        except sqlite3.Error as e:
+            print(f"Ошибка при восстановлении документов: {e}")
+            return 0
+
+    def get_purge_candidates(self, retention_seconds: float, limit: int = 100) -> List[Dict]:
+        """Удаленные документы, срок хранения которых в корзине истек"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT id, file_path FROM documents
+                    WHERE deleted_at IS NOT NULL
+                      AND deleted_at <= datetime('now', ?)
+                    ORDER BY deleted_at
+                    LIMIT ?
+                """, (f"-{int(retention_seconds)} seconds", limit))
+                return [{"id": row[0], "file_path": row[1]} for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении документов для очистки: {e}")
+            return []
+
+    def purge_documents(self, doc_ids: Iterable[int]) -> int:
+        """Окончательное удаление документов из корзины вместе с файлами"""
+        doc_ids = list(doc_ids)
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                file_paths = []
+                # Получаем пути к файлам перед удалением (с учетом лимита параметров SQLite)
+                for start in range(0, len(doc_ids), 500):
+                    chunk = doc_ids[start:start + 500]
+                    placeholders = ','.join('?' * len(chunk))
+                    cursor.execute(
+                        f"SELECT file_path FROM documents WHERE id IN ({placeholders}) AND deleted_at IS NOT NULL",
+                        chunk
+                    )
+                    file_paths.extend(row[0] for row in cursor.fetchall())
+                # Удаляем записи из БД
+                cursor.executemany("DELETE FROM documents WHERE id = ? AND deleted_at IS NOT NULL",
+                                   ((doc_id,) for doc_id in doc_ids))
+                purged = cursor.rowcount
+                cursor.executemany("DELETE FROM document_tags WHERE document_id = ?",
+                                   ((doc_id,) for doc_id in doc_ids))
+                # Файл, на который ссылается другая запись, не удаляем
+                file_paths = [
+                    path for path in file_paths
+                    if path and not cursor.execute(
+                        "SELECT 1 FROM documents WHERE file_path = ? LIMIT 1", (path,)
+                    ).fetchone()
+                ]
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка при очистке корзины: {e}")
+            return 0
+
+        self._remove_files(file_paths)
+        return purged
+
+    def _remove_files(self, file_paths: List[str]):
+        """Удаление файлов после фиксации транзакции (внутри batch() - при выходе из пакета)"""
+        pending = getattr(self._local, "pending_removals", None)
+        if pending is not None:
+            pending.extend(file_paths)
+            return
+        for file_path in file_paths:
+            # Удаляем файл, если он существует
+            if file_path and os.path.exists(file_path):
+                try:
+                    os.remove(file_path)
+                except OSError as e:
+                    logger.error(f"Ошибка при удалении файла {file_path}: {e}")
+
+    def get_referenced_files(self, file_paths: Iterable[str]) -> Optional[Set[str]]:
+        """Пути из file_paths, на которые ссылаются документы (включая корзину)
+        или незавершенные задания загрузки; None при ошибке"""
+        file_paths = list(file_paths)
+        referenced = set()
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                for start in range(0, len(file_paths), 500):
+                    chunk = file_paths[start:start + 500]
+                    placeholders = ','.join('?' * len(chunk))
+                    cursor.execute(f"SELECT file_path FROM documents WHERE file_path IN ({placeholders})", chunk)
+                    referenced.update(row[0] for row in cursor.fetchall())
+                    # Файл задания уже скопирован, а строка документа появится при фиксации
+                    cursor.execute(f"""
+                        SELECT target_path FROM ingest_jobs
+                        WHERE state NOT IN ('committed', 'failed') AND target_path IN ({placeholders})
+                    """, chunk)
+                    referenced.update(row[0] for row in cursor.fetchall())
+                return referenced
+        except sqlite3.Error as e:
+            print(f"Ошибка при поиске ссылок на файлы: {e}")
+            return None
+
+    def get_document_hashes(self, folder: FolderRef, title: str, file_size: int) -> Set[str]:
+        """Хеши документов папки с таким названием и размером (для продолжения импорта)"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT content_hash FROM documents
+                    WHERE folder_id IS ? AND title = ? AND file_size = ?
+                      AND content_hash IS NOT NULL AND deleted_at IS NULL
+                """, (self._resolve_folder(cursor, folder), title, file_size))
+                return {row[0] for row in cursor.fetchall()}
+        except (sqlite3.Error, KeyError) as e:
+            print(f"Ошибка при поиске импортированных документов: {e}")
+            return set()
 
     def check_database_structure(self):
         """Проверка структуры базы данных"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
                 # Проверяем таблицу documents
@@ -305,15 +1023,15 @@ class DatabaseManager:
     def verify_document_table(self):
         """Проверка таблицы документов"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
                 # Пробуем добавить тестовый документ
                 cursor.execute("""
                     INSERT INTO documents 
-                    (title, description, file_path, folder_path, status, author)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, ("Тест", "Тестовый документ", "/test/path", "/", "Активный", "admin"))
+                    (title, description, file_path, status, author)
+                    VALUES (?, ?, ?, ?, ?)
+                """, ("Тест", "Тестовый документ", "/test/path", "Активный", "admin"))
                 
                 doc_id = cursor.lastrowid
                 print(f"Тестовый документ создан с ID: {doc_id}")
@@ -325,7 +1043,6 @@ class DatabaseManager:
                 
                 # Удаляем тестовый документ
                 cursor.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
-                conn.commit()
                 
                 return True
         except sqlite3.Error as e:
@@ -335,7 +1052,7 @@ class DatabaseManager:
     def get_folder_name(self, folder_path: str) -> str:
         """Получение имени папки по её пути"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
                     "SELECT name FROM folders WHERE path = ?",
@@ -347,33 +1064,19 @@ class DatabaseManager:
             print(f"Ошибка при получении имени папки: {e}")
             return "Ошибка"
 
-    def get_subfolders(self, parent_path: str) -> List[str]:
+    def get_subfolders(self, parent_path: FolderRef) -> List[str]:
         """Получение списка подпапок для указанной папки"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
-                
-                # Если это корневая папка
-                if parent_path == "/":
-                    query = "SELECT path FROM folders WHERE path != '/' AND path NOT LIKE '%/%/%'"
-                    cursor.execute(query)
-                else:
-                    # Для остальных папок ищем прямых потомков
-                    query = """
-                        SELECT path FROM folders 
-                        WHERE path LIKE ? 
-                        AND path != ? 
-                        AND (
-                            LENGTH(path) - LENGTH(REPLACE(path, '/', '')) = 
-                            LENGTH(?) - LENGTH(REPLACE(?, '/', '')) + 1
-                        )
-                    """
-                    parent_path_pattern = f"{parent_path}/%"
-                    cursor.execute(query, (parent_path_pattern, parent_path, parent_path, parent_path))
-                
-                result = cursor.fetchall()
-                return [row[0] for row in result]
-                
+                # Прямые потомки по индексу parent_id; у корневых папок parent_id IS NULL
+                cursor.execute(
+                    "SELECT path FROM folders WHERE parent_id IS ?",
+                    (self._resolve_folder(cursor, parent_path),)
+                )
+                return [row[0] for row in cursor.fetchall()]
+        except KeyError:
+            return []
         except sqlite3.Error as e:
             print(f"Ошибка при получении подпапок: {e}")
             return []
@@ -382,104 +1085,84 @@ class DatabaseManager:
         """Проверка наличия подпапок"""
         return bool(self.get_subfolders(folder_path))
 
-    def has_documents(self, folder_path: str) -> bool:
+    def has_documents(self, folder: FolderRef) -> bool:
         """Проверка наличия документов в папке"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
-                    "SELECT COUNT(*) FROM documents WHERE folder_path = ?", 
-                    (folder_path,)
+                    "SELECT COUNT(*) FROM documents WHERE folder_id IS ? AND deleted_at IS NULL", 
+                    (self._resolve_folder(cursor, folder),)
                 )
                 return cursor.fetchone()[0] > 0
+        except KeyError:
+            return False
         except sqlite3.Error as e:
             print(f"Ошибка при проверке документов: {e}")
             return False 
 
     def update_document(self, doc_id: int, **fields) -> bool:
         """Обновление документа"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                update_fields = []
-                values = []
-                for field, value in fields.items():
-                    if value is not None:  # Обновляем только непустые поля
-                        update_fields.append(f"{field} = ?")
-                        values.append(value)
-                
-                if not update_fields:
-                    return False
-                    
-                values.append(doc_id)  # Добавляем id для WHERE условия
-                
-                query = f"""
-                    UPDATE documents 
-                    SET {', '.join(update_fields)}
-                    WHERE id = ?
-                """
-                
-                cursor.execute(query, values)
-                conn.commit()
-                return True
-                
-        except sqlite3.Error as e:
-            print(f"Ошибка при обновлении документа: {e}")
-            return False
+        return self.update_documents([doc_id], **fields) > 0
 
-    def get_document(self, doc_id: int) -> Dict:
+    def get_document(self, doc_id: int) -> Optional[DocumentRecord]:
         """Получение документа по id"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT * FROM documents WHERE id = ?",
-                    (doc_id,)
-                )
-                row = cursor.fetchone()
-                if row:
-                    column_names = [description[0] for description in cursor.description]
-                    return dict(zip(column_names, row))
-                return None
+                cursor.row_factory = document_factory
+                cursor.execute("""
+                    SELECT d.*, COALESCE(f.path, '/') AS folder_path
+                    FROM documents d
+                    LEFT JOIN folders f ON f.id = d.folder_id
+                    WHERE d.id = ?
+                """, (doc_id,))
+                return cursor.fetchone()
         except sqlite3.Error as e:
             print(f"Ошибка при получении документа: {e}")
             return None 
 
-    def search_documents(self, query: str, folder_path: Optional[str] = None) -> List[Dict]:
-        """Поиск документов по заданному запросу"""
+    def search_documents(self, query: str, folder_path: FolderRef = None,
+                         limit: Optional[int] = None) -> List[DocumentRecord]:
+        """Поиск документов по заданному запросу (не более limit результатов)"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
                 # Базовый SQL запрос
                 sql = """
-                    SELECT * FROM documents 
+                    SELECT d.*, COALESCE(f.path, '/') AS folder_path
+                    FROM documents d
+                    LEFT JOIN folders f ON f.id = d.folder_id
                     WHERE (
-                        title LIKE ? OR 
-                        description LIKE ? OR 
-                        status LIKE ? OR 
-                        author LIKE ? OR 
-                        tags LIKE ? OR
-                        cabinet LIKE ? OR
-                        shelf LIKE ? OR
-                        box LIKE ?
+                        d.title LIKE ? OR 
+                        d.description LIKE ? OR 
+                        d.status LIKE ? OR 
+                        d.author LIKE ? OR 
+                        d.cabinet LIKE ? OR
+                        d.shelf LIKE ? OR
+                        d.box LIKE ? OR
+                        d.id IN (SELECT document_id FROM document_tags WHERE tag = ?)
                     )
+                    AND d.deleted_at IS NULL
                 """
                 
+                # Тег сравнивается целиком по индексу, а не как подстрока
+                params = [f"%{query}%"] * 7 + [query.strip()]
                 # Если указана папка, добавляем условие
                 if folder_path:
-                    sql += " AND folder_path = ?"
-                    params = [f"%{query}%"] * 8 + [folder_path]
-                else:
-                    params = [f"%{query}%"] * 8
+                    sql += " AND d.folder_id IS ?"
+                    params.append(self._resolve_folder(cursor, folder_path))
+                if limit is not None:
+                    sql += " LIMIT ?"
+                    params.append(limit)
                 
+                cursor.row_factory = document_factory
                 cursor.execute(sql, params)
+                return cursor.fetchall()
                 
-                # Преобразуем результаты в словари
-                columns = [description[0] for description in cursor.description]
-                return [dict(zip(columns, row)) for row in cursor.fetchall()]
-                
+        except KeyError:
+            return []
         except sqlite3.Error as e:
             print(f"Ошибка при поиске документов: {e}")
             return []
@@ -487,7 +1170,7 @@ class DatabaseManager:
     def get_all_users(self) -> List[Dict]:
         """Получение списка всех пользователей"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute("SELECT username, role FROM users")
                 return [{"username": row[0], "role": row[1]} for row in cursor.fetchall()]
@@ -498,13 +1181,12 @@ class DatabaseManager:
     def add_user(self, username: str, password: str, role: str) -> bool:
         """Добавление нового пользователя"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
                     "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
                     (username, password, role)
                 )
-                conn.commit()
                 return True
         except sqlite3.Error as e:
             print(f"Ошибка при добавлении пользователя: {e}")
@@ -513,22 +1195,103 @@ class DatabaseManager:
     def delete_user(self, username: str) -> bool:
         """Удаление пользователя"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute("DELETE FROM users WHERE username = ? AND username != 'admin'", (username,))
-                conn.commit()
                 return True
         except sqlite3.Error as e:
             print(f"Ошибка при удалении пользователя: {e}")
             return False
 
+    def _get_table_count(self, cursor, table: str) -> int:
+        """Количество строк из счетчиков archive_stats"""
+        cursor.execute(
+            "SELECT doc_count FROM archive_stats WHERE scope = 'table' AND key = ?", (table,)
+        )
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+    def get_archive_stats(self) -> Dict:
+        """Сводная статистика архива для панели администратора"""
+        stats = {
+            "documents": 0,
+            "folders": 0,
+            "users": 0,
+            "bytes": 0,
+            "by_folder": {},
+            "by_status": {},
+            "by_author": {},
+        }
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                # Счетчики папок хранятся по id (0 - корневая), в ответе - пути
+                cursor.execute("""
+                    SELECT s.scope,
+                           CASE WHEN s.scope = 'folder' THEN COALESCE(f.path, '/') ELSE s.key END,
+                           s.doc_count, s.bytes
+                    FROM archive_stats s
+                    LEFT JOIN folders f ON s.scope = 'folder' AND s.key = CAST(f.id AS TEXT)
+                    WHERE s.scope = 'table' OR s.doc_count > 0
+                """)
+                for scope, key, doc_count, size in cursor.fetchall():
+                    if scope == "table":
+                        stats[key] = doc_count
+                        if key == "documents":
+                            stats["bytes"] = size
+                    else:
+                        stats[f"by_{scope}"][key] = {"documents": doc_count, "bytes": size}
+                return stats
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении статистики: {e}")
+            return stats
+
+    def get_folder_tree_stats(self) -> Dict[str, Dict]:
+        """Количество и объем документов по папкам, включая вложенные.
+
+        Счетчики самих папок поддерживаются триггерами в archive_stats и
+        читаются одним запросом; суммирование по поддеревьям выполняется
+        за один проход по списку папок.
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT f.path, f.parent_path,
+                           COALESCE(s.doc_count, 0), COALESCE(s.bytes, 0)
+                    FROM folders f
+                    LEFT JOIN archive_stats s ON s.scope = 'folder' AND s.key = CAST(f.id AS TEXT)
+                """)
+                rows = cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении статистики папок: {e}")
+            return {}
+
+        stats = {}
+        parents = {}
+        for path, parent_path, doc_count, size in rows:
+            parents[path] = parent_path
+            stats[path] = {
+                "documents": doc_count,
+                "bytes": size,
+                "total_documents": doc_count,
+                "total_bytes": size,
+            }
+        # Самые глубокие папки первыми: к моменту обработки папки
+        # итоги всех ее потомков уже добавлены
+        for path in sorted(stats, key=lambda p: p.count("/"), reverse=True):
+            parent_path = parents[path]
+            if parent_path in stats:
+                stats[parent_path]["total_documents"] += stats[path]["total_documents"]
+                stats[parent_path]["total_bytes"] += stats[path]["total_bytes"]
+        return stats
+
     def get_documents_count(self) -> int:
         """Получение общего количества документов"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
-                cursor.execute("SELECT COUNT(*) FROM documents")
-                return cursor.fetchone()[0]
+                return self._get_table_count(cursor, "documents")
         except sqlite3.Error as e:
             print(f"Ошибка при подсчете документов: {e}")
             return 0
@@ -536,10 +1299,9 @@ class DatabaseManager:
     def get_folders_count(self) -> int:
         """Получение общего количества папок"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
-                cursor.execute("SELECT COUNT(*) FROM folders")
-                return cursor.fetchone()[0]
+                return self._get_table_count(cursor, "folders")
         except sqlite3.Error as e:
             print(f"Ошибка при подсчете папок: {e}")
             return 0
@@ -547,10 +1309,445 @@ class DatabaseManager:
     def get_users_count(self) -> int:
         """Получение общего количества пользователей"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
-                cursor.execute("SELECT COUNT(*) FROM users")
-                return cursor.fetchone()[0]
+                return self._get_table_count(cursor, "users")
         except sqlite3.Error as e:
             print(f"Ошибка при подсчете пользователей: {e}")
-            return 0
\ No newline at end of file
+            return 0
+
+    def enqueue_ingest_job(self, source_path: str, target_path: str, payload: Dict,
+                           max_attempts: int = 5) -> Optional[int]:
+        """Постановка задания на загрузку документа в очередь.
+
+        Если target_path уже занят (файл на диске, документ или незавершенное
+        задание), к имени добавляется номер задания. Имя выбирается в той же
+        транзакции, что и вставка, поэтому два задания его не разделят.
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO ingest_jobs (source_path, target_path, payload, max_attempts)
+                    VALUES (?, ?, ?, ?)
+                """, (source_path, target_path, json.dumps(payload, ensure_ascii=False), max_attempts))
+                job_id = cursor.lastrowid
+                if self._target_taken(cursor, target_path, job_id):
+                    target = Path(target_path)
+                    target_path = str(target.with_name(f"{target.stem}_{job_id}{target.suffix}"))
+                    cursor.execute("UPDATE ingest_jobs SET target_path = ? WHERE id = ?",
+                                   (target_path, job_id))
+                return job_id
+        except sqlite3.Error as e:
+            print(f"Ошибка при постановке задания в очередь: {e}")
+            return None
+
+    def _target_taken(self, cursor, target_path: str, job_id: int) -> bool:
+        if os.path.exists(target_path):
+            return True
+        cursor.execute("SELECT 1 FROM documents WHERE file_path = ? LIMIT 1", (target_path,))
+        if cursor.fetchone():
+            return True
+        cursor.execute("""
+            SELECT 1 FROM ingest_jobs
+            WHERE target_path = ? AND id != ? AND state NOT IN ('committed', 'failed')
+            LIMIT 1
+        """, (target_path, job_id))
+        return cursor.fetchone() is not None
+
+    def lease_ingest_job(self, owner: str, lease_seconds: float,
+                         job_id: Optional[int] = None) -> Optional[Dict]:
+        """Захват готового к выполнению задания с арендой на lease_seconds"""
+        now = time.time()
+        # Отдельное соединение и вне пакета: захват фиксируется сразу
+        conn = self._acquire_connection()
+        try:
+            cursor = conn.cursor()
+            # BEGIN IMMEDIATE не даст двум обработчикам захватить одно задание
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                sql = """
+                    SELECT id FROM ingest_jobs
+                    WHERE state IN ('pending', 'copying', 'processing')
+                      AND next_attempt_at <= ?
+                      AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+                """
+                params = [now, now]
+                if job_id is not None:
+                    sql += " AND id = ?"
+                    params.append(job_id)
+                cursor.execute(sql + " ORDER BY id LIMIT 1", params)
+                row = cursor.fetchone()
+                if row:
+                    cursor.execute("""
+                        UPDATE ingest_jobs
+                        SET lease_owner = ?, lease_expires_at = ?, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ?
+                    """, (owner, now + lease_seconds, row[0]))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        except sqlite3.Error as e:
+            print(f"Ошибка при захвате задания: {e}")
+            return None
+        finally:
+            self._release_connection(conn)
+        return self.get_ingest_job(row[0]) if row else None
+
+    def get_ingest_job(self, job_id: int) -> Optional[Dict]:
+        """Получение задания очереди по id"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT * FROM ingest_jobs WHERE id = ?", (job_id,))
+                row = cursor.fetchone()
+                if row:
+                    column_names = [description[0] for description in cursor.description]
+                    job = dict(zip(column_names, row))
+                    job["payload"] = json.loads(job["payload"])
+                    return job
+                return None
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении задания: {e}")
+            return None
+
+    def set_ingest_job_state(self, job_id: int, owner: str, state: str,
+                             content_hash: str = None, file_size: int = None) -> bool:
+        """Перевод задания в новое состояние (только владельцем аренды)"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    UPDATE ingest_jobs
+                    SET state = ?,
+                        content_hash = COALESCE(?, content_hash),
+                        file_size = COALESCE(?, file_size),
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND lease_owner = ? AND state != 'committed'
+                """, (state, content_hash, file_size, job_id, owner))
+                return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            print(f"Ошибка при обновлении состояния задания: {e}")
+            return False
+
+    def fail_ingest_job(self, job_id: int, owner: str, error: str, retry_delay: float) -> Optional[str]:
+        """Регистрация неудачной попытки: повтор с задержкой или перевод в failed"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    UPDATE ingest_jobs
+                    SET attempts = attempts + 1,
+                        state = CASE WHEN attempts + 1 >= max_attempts THEN 'failed' ELSE state END,
+                        next_attempt_at = ?,
+                        last_error = ?,
+                        lease_owner = NULL,
+                        lease_expires_at = NULL,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND lease_owner = ? AND state != 'committed'
+                """, (time.time() + retry_delay, error, job_id, owner))
+                cursor.execute("SELECT state FROM ingest_jobs WHERE id = ?", (job_id,))
+                row = cursor.fetchone()
+                return row[0] if row else None
+        except sqlite3.Error as e:
+            print(f"Ошибка при регистрации сбоя задания: {e}")
+            return None
+
+    def commit_ingest_job(self, job_id: int, owner: str) -> Optional[int]:
+        """Добавление документа и завершение задания в одной транзакции"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT state, document_id, target_path, payload, lease_owner,
+                           content_hash, file_size
+                    FROM ingest_jobs WHERE id = ?
+                """, (job_id,))
+                row = cursor.fetchone()
+                if not row:
+                    return None
+                state, document_id, target_path, payload, lease_owner, content_hash, file_size = row
+                # Повторный коммит после перезапуска не создает дубликат документа
+                if state == 'committed':
+                    return document_id
+                if lease_owner != owner:
+                    return None
+
+                payload = json.loads(payload)
+                tags = self._normalize_tags(payload.get("tags"))
+                cursor.execute("""
+                    INSERT INTO documents
+                    (title, description, file_path, folder_id, status, author,
+                     cabinet, shelf, box, tags, content_hash, file_size)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    payload["title"], payload.get("description"), target_path,
+                    self._resolve_folder(cursor, payload["folder_path"]),
+                    payload["status"], payload["author"],
+                    payload.get("cabinet"), payload.get("shelf"), payload.get("box"),
+                    ','.join(tags) if tags else None,
+                    content_hash, file_size
+                ))
+                document_id = cursor.lastrowid
+                if tags:
+                    self._write_tags(cursor, [document_id], tags)
+                cursor.execute("""
+                    UPDATE ingest_jobs
+                    SET state = 'committed', document_id = ?, lease_owner = NULL,
+                        lease_expires_at = NULL, last_error = NULL,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, (document_id, job_id))
+                return document_id
+        except (sqlite3.Error, KeyError) as e:
+            print(f"Ошибка при завершении задания: {e}")
+            return None
+
+    def get_ingest_queue_depth(self) -> int:
+        """Количество незавершенных заданий в очереди"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT COUNT(*) FROM ingest_jobs WHERE state IN ('pending', 'copying', 'processing')"
+                )
+                return cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Ошибка при подсчете заданий: {e}")
+            return 0
+
+    def get_tag_counts(self, folder_path: FolderRef = None) -> Dict[str, int]:
+        """Количество документов по каждому тегу (для фасетов)"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                if folder_path:
+                    cursor.execute("""
+                        SELECT t.tag, COUNT(*) FROM document_tags t
+                        JOIN documents d ON d.id = t.document_id
+                        WHERE d.folder_id IS ? AND d.deleted_at IS NULL
+                        GROUP BY t.tag
+                        ORDER BY COUNT(*) DESC, t.tag
+                    """, (self._resolve_folder(cursor, folder_path),))
+                else:
+                    cursor.execute("""
+                        SELECT t.tag, COUNT(*) FROM document_tags t
+                        JOIN documents d ON d.id = t.document_id
+                        WHERE d.deleted_at IS NULL
+                        GROUP BY t.tag
+                        ORDER BY COUNT(*) DESC, t.tag
+                    """)
+                return dict(cursor.fetchall())
+        except KeyError:
+            return {}
+        except sqlite3.Error as e:
+            print(f"Ошибка при подсчете тегов: {e}")
+            return {}
+
+    def _documents_query(self, cursor, folder: FolderRef, recursive: bool,
+                         after_id: int, include_deleted: bool):
+        """Запрос документов папки (или поддерева) с id больше after_id.
+
+        Возвращает (запрос, параметры) без ORDER BY или None, если папки нет.
+        """
+        query = """
+            SELECT d.*, COALESCE(f.path, '/') AS folder_path
+            FROM documents d
+            LEFT JOIN folders f ON f.id = d.folder_id
+            WHERE d.id > ?
+        """
+        params = [after_id]
+        if not include_deleted:
+            query += " AND d.deleted_at IS NULL"
+        try:
+            folder_id = self._resolve_folder(cursor, folder)
+        except KeyError:
+            return None
+        if folder_id is None and not recursive:
+            query += " AND d.folder_id IS NULL"
+        elif folder_id is not None and not recursive:
+            query += " AND d.folder_id = ?"
+            params.append(folder_id)
+        elif folder_id is not None:
+            # Поддерево выбирается диапазоном путей, как в _relocate_folder
+            cursor.execute("SELECT path FROM folders WHERE id = ?", (folder_id,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            query += """
+                AND d.folder_id IN (
+                    SELECT id FROM folders WHERE id = ? OR (path >= ? AND path < ?)
+                )
+            """
+            params += [folder_id, row[0] + "/", row[0] + "0"]
+        return query, params
+
+    def iter_documents(self, folder: FolderRef = None, recursive: bool = True,
+                       batch_size: int = 1000, after_id: int = 0,
+                       include_deleted: bool = False) -> Iterator[DocumentRecord]:
+        """Потоковый обход документов в порядке id без загрузки всей выборки.
+
+        folder=None с recursive=True - весь архив, без recursive - только
+        корневая папка. Строки читаются пачками по batch_size через fetchmany,
+        поэтому память не зависит от размера архива. after_id позволяет
+        продолжить прерванный обход с последнего обработанного документа.
+        Соединение и снимок чтения открыты, пока генератор не исчерпан или
+        не закрыт; база работает в WAL (_enable_wal), поэтому запись из
+        других соединений при этом не блокируется. Ошибка БД посреди обхода
+        передается вызывающему коду: оборванный поток нельзя принять за полный.
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                built = self._documents_query(cursor, folder, recursive, after_id, include_deleted)
+                if built is None:
+                    return
+                query, params = built
+                cursor.row_factory = document_factory
+                cursor.execute(query + " ORDER BY d.id", params)
+                while rows := cursor.fetchmany(batch_size):
+                    yield from rows
+        except sqlite3.Error as e:
+            print(f"Ошибка при обходе документов: {e}")
+            raise
+
+    def get_documents_page(self, folder: FolderRef = None, limit: int = 50, after_id: int = 0,
+                           recursive: bool = False) -> List[DocumentRecord]:
+        """Страница документов папки в порядке id, начиная после after_id.
+
+        Следующая страница запрашивается с after_id, равным id последнего
+        документа: в отличие от OFFSET, стоимость не растет с номером страницы.
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                built = self._documents_query(cursor, folder, recursive, after_id, False)
+                if built is None:
+                    return []
+                query, params = built
+                cursor.row_factory = document_factory
+                cursor.execute(query + " ORDER BY d.id LIMIT ?", params + [limit])
+                return cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении страницы документов: {e}")
+            return []
+
+    def get_documents_by_tags(self, tags: Iterable[str], match_all: bool = True,
+                              folder_path: FolderRef = None) -> List[DocumentRecord]:
+        """Документы с указанными тегами: все теги (AND) или любой из них (OR)"""
+        tags = self._normalize_tags(tags)
+        if not tags:
+            return []
+        # Каждый тег - отдельный поиск по первичному ключу (tag, document_id),
+        # результаты пересекаются (AND) или объединяются (OR)
+        operator = " INTERSECT " if match_all else " UNION "
+        tag_query = operator.join(["SELECT document_id FROM document_tags WHERE tag = ?"] * len(tags))
+        query = f"""
+            SELECT {DOCUMENT_LIST_COLUMNS}
+            FROM documents
+            WHERE id IN ({tag_query}) AND deleted_at IS NULL
+        """
+        params = list(tags)
+        if folder_path:
+            query += " AND folder_id IS ?"
+        query += " ORDER BY created_date DESC"
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                if folder_path:
+                    params.append(self._resolve_folder(cursor, folder_path))
+                cursor.row_factory = document_factory
+                cursor.execute(query, params)
+                return cursor.fetchall()
+        except KeyError:
+            return []
+        except sqlite3.Error as e:
+            print(f"Ошибка при поиске документов по тегам: {e}")
+            return []
+
+    def get_documents_by_location(self, cabinet: str, shelf: Optional[str] = None,
+                                  box: Optional[str] = None) -> List[DocumentRecord]:
+        """Документы в шкафу, на полке или в коробе (фильтры независимы)"""
+        # Шкаф - префикс индекса (cabinet, shelf, box); короб без полки
+        # проверяется по строкам шкафа
+        query = f"""
+            SELECT {DOCUMENT_LIST_COLUMNS}
+            FROM documents
+            WHERE cabinet = ? AND deleted_at IS NULL
+        """
+        params = [cabinet]
+        if shelf is not None:
+            query += " AND shelf = ?"
+            params.append(shelf)
+        if box is not None:
+            query += " AND box = ?"
+            params.append(box)
+        query += " ORDER BY shelf, box, created_date DESC"
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = document_factory
+                cursor.execute(query, params)
+                return cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении документов по расположению: {e}")
+            return []
+
+    def get_location_counts(self, cabinet: Optional[str] = None) -> List[Dict]:
+        """Количество документов и коробов по шкафам и полкам"""
+        query = """
+            SELECT cabinet, shelf, COUNT(*), COUNT(DISTINCT box)
+            FROM documents
+            WHERE cabinet IS NOT NULL AND deleted_at IS NULL
+        """
+        params = []
+        if cabinet is not None:
+            query += " AND cabinet = ?"
+            params.append(cabinet)
+        query += " GROUP BY cabinet, shelf ORDER BY cabinet, shelf"
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                return [
+                    {"cabinet": row[0], "shelf": row[1], "documents": row[2], "boxes": row[3]}
+                    for row in cursor.fetchall()
+                ]
+        except sqlite3.Error as e:
+            print(f"Ошибка при подсчете документов по расположению: {e}")
+            return []
+
+    def get_free_capacity(self, box_capacity: int, cabinet: Optional[str] = None,
+                          shelf: Optional[str] = None) -> List[Dict]:
+        """Короба, в которых осталось место (не более box_capacity документов в коробе)"""
+        query = """
+            SELECT cabinet, shelf, box, COUNT(*)
+            FROM documents
+            WHERE box IS NOT NULL AND deleted_at IS NULL
+        """
+        params = []
+        if cabinet is not None:
+            query += " AND cabinet = ?"
+            params.append(cabinet)
+        if shelf is not None:
+            query += " AND shelf = ?"
+            params.append(shelf)
+        query += " GROUP BY cabinet, shelf, box HAVING COUNT(*) < ? ORDER BY cabinet, shelf, box"
+        params.append(box_capacity)
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                return [
+                    {"cabinet": row[0], "shelf": row[1], "box": row[2],
+                     "documents": row[3], "free": box_capacity - row[3]}
+                    for row in cursor.fetchall()
+                ]
+        except sqlite3.Error as e:
+            print(f"Ошибка при поиске свободных коробов: {e}")
+            return []
+
+
+# Все публичные методы учитываются в статистике, если она включена
+instrument_methods(DatabaseManager)
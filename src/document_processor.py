@@ -1,26 +1,42 @@
 import asyncio
-import aiofiles
+import codecs
+import mmap
+import os
+import time
+from contextlib import contextmanager
 from pathlib import Path
 from PIL import Image
 import fitz  # PyMuPDF для работы с PDF
-from typing import Dict, Tuple
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+TEXT_CHUNK_SIZE = 1024 * 1024  # размер фрагмента при потоковом декодировании текста
+DEFAULT_PREVIEW = Path("assets/default_preview.png")  # для неподдерживаемых форматов
+ERROR_PREVIEW = Path("assets/error_preview.png")
 
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(self, on_stage: Optional[Callable[[str, float], None]] = None,
+                 on_preview: Optional[Callable[[bool], None]] = None):
         self.preview_size = (200, 200)  # размер превью
         self.preview_folder = Path("previews")
         self.preview_folder.mkdir(exist_ok=True)
+        self.on_stage = on_stage  # (этап, секунды) для этапов process_document
+        self.on_preview = on_preview  # True, если превью взято из previews
 
     async def process_document(self, file_path: str) -> Dict:
         """Асинхронная обработка загруженного документа"""
         file_path = Path(file_path)
-        tasks = [
-            self.generate_preview(file_path),
-            self.extract_text(file_path),
-            self.get_metadata(file_path)
-        ]
-        
-        preview_path, extracted_text, metadata = await asyncio.gather(*tasks)
+        started = time.perf_counter()
+        with self._open_pdf(file_path) as pdf_doc:
+            self._stage_done("open", started)
+            # PDF открывается один раз для превью и извлечения текста
+            tasks = [
+                self._timed("preview", self.generate_preview(file_path, pdf_doc=pdf_doc)),
+                self._timed("text", self.extract_text(file_path, pdf_doc=pdf_doc)),
+                self._timed("metadata", self.get_metadata(file_path))
+            ]
+            
+            preview_path, extracted_text, metadata = await asyncio.gather(*tasks)
+        self._stage_done("total", started)
         
         return {
             "preview_path": str(preview_path),
@@ -28,25 +44,107 @@ class DocumentProcessor:
             "metadata": metadata
         }
 
-    async def generate_preview(self, file_path: Path) -> Path:
+    async def _timed(self, stage: str, coro):
+        """Выполнение этапа обработки с замером времени"""
+        started = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            self._stage_done(stage, started)
+
+    def _stage_done(self, stage: str, started: float):
+        if self.on_stage is not None:
+            self.on_stage(stage, time.perf_counter() - started)
+
+    @contextmanager
+    def _open_pdf(self, file_path: Path):
+        """Открытие PDF для повторного использования (None для остальных форматов).
+
+        MuPDF читает страницы из файла по мере надобности, поэтому документ
+        целиком в память Python не копируется. Поврежденный или недоступный
+        файл тоже дает None: этапы обработки откроют его сами и вернут
+        превью ошибки и пустой текст.
+        """
+        if file_path.suffix.lower() != '.pdf':
+            yield None
+            return
+        try:
+            doc = fitz.open(file_path)
+        except Exception as e:
+            print(f"Ошибка при открытии PDF: {e}")
+            yield None
+            return
+        try:
+            yield doc
+        finally:
+            doc.close()
+
+    @contextmanager
+    def _mapped(self, file_path: Path):
+        """Отображение файла в память только для чтения"""
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # mmap не поддерживает файлы нулевой длины
+                yield b""
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield data
+
+    def iter_text(self, file_path: Path, encoding: str = 'utf-8',
+                  chunk_size: int = TEXT_CHUNK_SIZE) -> Iterator[str]:
+        """Потоковое декодирование текстового файла фрагментами"""
+        decoder = codecs.getincrementaldecoder(encoding)()
+        with self._mapped(file_path) as data:
+            for offset in range(0, len(data), chunk_size):
+                text = decoder.decode(data[offset:offset + chunk_size])
+                if text:
+                    yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+    def read_text_prefix(self, file_path: Path, max_chars: int = 1000,
+                         encoding: str = 'utf-8') -> str:
+        """Декодирование только начала текстового файла (не более max_chars символов)"""
+        decoder = codecs.getincrementaldecoder(encoding)()
+        parts = []
+        count = 0
+        # Для UTF-8 одному символу соответствует не более 4 байт
+        step = max(max_chars * 4, 4096)
+        with self._mapped(file_path) as data:
+            for offset in range(0, len(data), step):
+                text = decoder.decode(data[offset:offset + step])
+                parts.append(text)
+                count += len(text)
+                if count >= max_chars:
+                    break
+            else:
+                parts.append(decoder.decode(b"", final=True))
+        return "".join(parts)[:max_chars]
+
+    async def generate_preview(self, file_path: Path, pdf_doc=None) -> Path:
         """Генерация превью документа"""
         preview_path = self.preview_folder / f"{file_path.stem}_preview.png"
         
         if preview_path.exists():
+            if self.on_preview is not None:
+                self.on_preview(True)
             return preview_path
+        if self.on_preview is not None:
+            self.on_preview(False)
 
         ext = file_path.suffix.lower()
         try:
             if ext in ['.jpg', '.jpeg', '.png']:
                 await self._generate_image_preview(file_path, preview_path)
             elif ext == '.pdf':
-                await self._generate_pdf_preview(file_path, preview_path)
+                await self._generate_pdf_preview(file_path, preview_path, pdf_doc)
             else:
                 # Для неподдерживаемых форматов возвращаем путь к стандартному превью
-                return Path("assets/default_preview.png")
+                return DEFAULT_PREVIEW
         except Exception as e:
             print(f"Ошибка при создании превью: {e}")
-            return Path("assets/error_preview.png")
+            return ERROR_PREVIEW
             
         return preview_path
 
@@ -56,37 +154,36 @@ class DocumentProcessor:
         img.thumbnail(self.preview_size)
         img.save(target, "PNG")
 
-    async def _generate_pdf_preview(self, source: Path, target: Path):
+    async def _generate_pdf_preview(self, source: Path, target: Path, pdf_doc=None):
         """Создание превью для PDF"""
-        doc = fitz.open(source)
+        doc = pdf_doc if pdf_doc is not None else fitz.open(source)
         if doc.page_count > 0:
             page = doc[0]
             pix = page.get_pixmap()
             pix.save(target)
-        doc.close()
+        if pdf_doc is None:
+            doc.close()
 
-    async def extract_text(self, file_path: Path) -> str:
+    async def extract_text(self, file_path: Path, pdf_doc=None) -> str:
         """Извлечение текста из документа"""
         ext = file_path.suffix.lower()
         try:
             if ext == '.pdf':
-                return await self._extract_pdf_text(file_path)
+                return await self._extract_pdf_text(file_path, pdf_doc)
             elif ext in ['.txt']:
-                async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
-                    return await f.read()
+                return "".join(self.iter_text(file_path))
             else:
                 return ""
         except Exception as e:
             print(f"Ошибка при извлечении текста: {e}")
             return ""
 
-    async def _extract_pdf_text(self, file_path: Path) -> str:
+    async def _extract_pdf_text(self, file_path: Path, pdf_doc=None) -> str:
         """Извлечение текста из PDF"""
-        doc = fitz.open(file_path)
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        doc.close()
+        doc = pdf_doc if pdf_doc is not None else fitz.open(file_path)
+        text = "".join(page.get_text() for page in doc)
+        if pdf_doc is None:
+            doc.close()
         return text
 
     async def get_metadata(self, file_path: Path) -> Dict:
@@ -97,4 +194,25 @@ class DocumentProcessor:
             "created": stat.st_ctime,
             "modified": stat.st_mtime,
             "type": file_path.suffix.lower()
-        } 
\ No newline at end of file
+        }
+
+
+_pool_processors: Dict[str, DocumentProcessor] = {}
+
+
+def render_preview(file_path: str, preview_dir: str = "previews", force: bool = False) -> str:
+    """Превью файла в процессе пула (ProcessPoolExecutor); путь к PNG.
+
+    DocumentProcessor создается один раз на процесс и каталог превью.
+    При ошибке возвращается ERROR_PREVIEW, для неподдерживаемых форматов -
+    DEFAULT_PREVIEW.
+    """
+    processor = _pool_processors.get(preview_dir)
+    if processor is None:
+        processor = _pool_processors[preview_dir] = DocumentProcessor()
+        processor.preview_folder = Path(preview_dir)
+        processor.preview_folder.mkdir(exist_ok=True)
+    path = Path(file_path)
+    if force:
+        (processor.preview_folder / f"{path.stem}_preview.png").unlink(missing_ok=True)
+    return str(asyncio.run(processor.generate_preview(path)))
@@ -0,0 +1,304 @@
+import csv
+import gzip
+import json
+import os
+import re
+import threading
+import zipfile
+from pathlib import Path
+from typing import Callable, Optional, Union
+from xml.sax.saxutils import escape
+
+from database import DatabaseManager, FolderRef
+
+FORMATS = ("csv", "jsonl", "xlsx")
+
+# Колонки выгрузки: ключ записи и заголовок
+EXPORT_COLUMNS = [
+    ("id", "ID"),
+    ("title", "Название"),
+    ("description", "Описание"),
+    ("folder_path", "Папка"),
+    ("status", "Статус"),
+    ("created_date", "Дата добавления"),
+    ("author", "Автор"),
+    ("tags", "Теги"),
+    ("cabinet", "Шкаф"),
+    ("shelf", "Полка"),
+    ("box", "Короб"),
+    ("file_path", "Файл"),
+    ("file_size", "Размер"),
+    ("content_hash", "SHA-256"),
+]
+
+# Ограничение Excel на число строк листа (включая заголовок)
+XLSX_MAX_ROWS = 1048576
+
+# Символы, недопустимые в XML 1.0
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+class ExportCancelled(Exception):
+    """Выгрузка прервана пользователем"""
+
+
+class DocumentExporter:
+    """Потоковая выгрузка документов в CSV, JSON Lines или XLSX.
+
+    Документы читаются через DatabaseManager.iter_documents пачками и
+    сразу записываются в файл, поэтому память не зависит от числа строк.
+    Запись идет во временный файл, который переименовывается только после
+    успешного завершения.
+    """
+
+    def __init__(self, db: DatabaseManager, batch_size: int = 1000):
+        self.db = db
+        self.batch_size = batch_size
+
+    def export(self, target: Union[str, Path], fmt: Optional[str] = None,
+               folder: FolderRef = None, recursive: bool = True,
+               compress: Optional[bool] = None,
+               on_progress: Optional[Callable[[int, int], None]] = None,
+               cancel: Optional[threading.Event] = None) -> int:
+        """Выгрузка документов папки (или всего архива) в файл.
+
+        fmt по умолчанию определяется по расширению, compress - по суффиксу
+        .gz. on_progress(выгружено, всего) вызывается после каждой пачки.
+        Возвращает количество выгруженных документов.
+        """
+        target = Path(target)
+        suffixes = [s.lower() for s in target.suffixes]
+        if compress is None:
+            compress = bool(suffixes) and suffixes[-1] == ".gz"
+        if fmt is None:
+            ext = suffixes[-2] if compress and len(suffixes) > 1 else (suffixes[-1] if suffixes else "")
+            fmt = ext.lstrip(".")
+        if fmt not in FORMATS:
+            raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+        if fmt == "xlsx" and compress:
+            raise ValueError("XLSX уже сжат, gzip не поддерживается")
+
+        total = self._estimate_total(folder, recursive)
+        documents = self.db.iter_documents(folder, recursive=recursive, batch_size=self.batch_size)
+
+        def rows():
+            done = 0
+            for doc in documents:
+                if cancel is not None and cancel.is_set():
+                    raise ExportCancelled()
+                yield doc
+                done += 1
+                if on_progress and done % self.batch_size == 0:
+                    on_progress(done, max(total, done))
+            if on_progress:
+                on_progress(done, done)
+
+        partial = target.with_name(target.name + ".part")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            if fmt == "xlsx":
+                count = _write_xlsx(partial, rows())
+            else:
+                writer = _write_csv if fmt == "csv" else _write_jsonl
+                # utf-8-sig: Excel правильно открывает CSV с кириллицей
+                encoding = "utf-8-sig" if fmt == "csv" else "utf-8"
+                with _open_text(partial, compress, encoding) as f:
+                    count = writer(f, rows())
+            os.replace(partial, target)
+            return count
+        except BaseException:
+            documents.close()
+            if partial.exists():
+                partial.unlink()
+            raise
+
+    def _estimate_total(self, folder: FolderRef, recursive: bool) -> int:
+        """Число документов для прогресса по счетчикам archive_stats"""
+        if isinstance(folder, int):
+            folder = self.db.get_folder_path(folder)
+        if folder in (None, "/"):
+            if recursive:
+                return self.db.get_documents_count()
+            return self.db.get_archive_stats()["by_folder"].get("/", {}).get("documents", 0)
+        info = self.db.get_folder_tree_stats().get(folder, {})
+        return info.get("total_documents" if recursive else "documents", 0)
+
+    def start(self, target: Union[str, Path], on_done: Optional[Callable] = None,
+              **kwargs) -> "ExportTask":
+        """Выгрузка в фоновом потоке; параметры как у export"""
+        task = ExportTask(self, target, on_done, kwargs)
+        task.start()
+        return task
+
+
+class ExportTask:
+    """Фоновая выгрузка. on_done(task) вызывается из потока выгрузки;
+    результат - task.count или task.error."""
+
+    def __init__(self, exporter: DocumentExporter, target, on_done, kwargs):
+        self.exporter = exporter
+        self.target = Path(target)
+        self.on_done = on_done
+        self.kwargs = kwargs
+        self.count = 0
+        self.error: Optional[BaseException] = None
+        self.cancelled = False
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="export", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        """Прерывание выгрузки; частично записанный файл удаляется"""
+        self._cancel.set()
+
+    def join(self, timeout: Optional[float] = None):
+        self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            self.count = self.exporter.export(self.target, cancel=self._cancel, **self.kwargs)
+        except ExportCancelled:
+            self.cancelled = True
+        except Exception as e:
+            print(f"Ошибка при выгрузке документов: {e}")
+            self.error = e
+        if self.on_done:
+            self.on_done(self)
+
+
+def _open_text(path: Path, compress: bool, encoding: str):
+    if compress:
+        return gzip.open(path, "wt", encoding=encoding, newline="")
+    return open(path, "w", encoding=encoding, newline="")
+
+
+def _cell_value(doc, key: str):
+    value = doc.get(key)
+    if key == "tags":
+        return ", ".join(value) if value else ""
+    return "" if value is None else value
+
+
+def _write_csv(f, rows) -> int:
+    writer = csv.writer(f)
+    writer.writerow([header for _, header in EXPORT_COLUMNS])
+    count = 0
+    for doc in rows:
+        writer.writerow([_cell_value(doc, key) for key, _ in EXPORT_COLUMNS])
+        count += 1
+    return count
+
+
+def _write_jsonl(f, rows) -> int:
+    count = 0
+    for doc in rows:
+        f.write(json.dumps({key: doc.get(key) for key, _ in EXPORT_COLUMNS}, ensure_ascii=False))
+        f.write("\n")
+        count += 1
+    return count
+
+
+def _column_letter(index: int) -> str:
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(ord("A") + rem) + letters
+    return letters
+
+
+def _xlsx_row(number: int, values) -> str:
+    cells = []
+    for i, value in enumerate(values):
+        ref = f"{_column_letter(i)}{number}"
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+        elif value != "":
+            text = escape(_XML_ILLEGAL.sub("", str(value)))
+            cells.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f'<row r="{number}">{"".join(cells)}</row>'
+
+
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetData>'
+)
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+
+def _write_xlsx(path: Path, rows) -> int:
+    """Минимальная книга XLSX: листы пишутся в архив построчно (inline-строки,
+    без общей таблицы строк), при превышении лимита Excel начинается новый лист"""
+    headers = [header for _, header in EXPORT_COLUMNS]
+    count = 0
+    sheets = 0
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        sheet = None
+        row_number = 0
+        for doc in rows:
+            if sheet is None or row_number >= XLSX_MAX_ROWS:
+                if sheet is not None:
+                    sheet.write(_SHEET_TAIL.encode("utf-8"))
+                    sheet.close()
+                sheets += 1
+                sheet = zf.open(f"xl/worksheets/sheet{sheets}.xml", "w", force_zip64=True)
+                sheet.write(_SHEET_HEAD.encode("utf-8"))
+                sheet.write(_xlsx_row(1, headers).encode("utf-8"))
+                row_number = 1
+            row_number += 1
+            values = [_cell_value(doc, key) for key, _ in EXPORT_COLUMNS]
+            sheet.write(_xlsx_row(row_number, values).encode("utf-8"))
+            count += 1
+        if sheet is None:
+            sheets = 1
+            sheet = zf.open("xl/worksheets/sheet1.xml", "w")
+            sheet.write(_SHEET_HEAD.encode("utf-8"))
+            sheet.write(_xlsx_row(1, headers).encode("utf-8"))
+        sheet.write(_SHEET_TAIL.encode("utf-8"))
+        sheet.close()
+
+        sheet_ids = range(1, sheets + 1)
+        zf.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            + "".join(
+                f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                for i in sheet_ids
+            )
+            + '</Types>'
+        ))
+        zf.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ))
+        zf.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+            + "".join(f'<sheet name="Документы {i}" sheetId="{i}" r:id="rId{i}"/>' for i in sheet_ids)
+            + '</sheets></workbook>'
+        ))
+        zf.writestr("xl/_rels/workbook.xml.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(
+                f'<Relationship Id="rId{i}" '
+                'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+                f'Target="worksheets/sheet{i}.xml"/>'
+                for i in sheet_ids
+            )
+            + '</Relationships>'
+        ))
+    return count
@@ -0,0 +1,162 @@
+import errno
+import hashlib
+import os
+import shutil
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# ioctl FICLONE из linux/fs.h: клонирование экстентов (btrfs, xfs, ...)
+FICLONE = 0x40049409
+CHUNK_SIZE = 8 * 1024 * 1024
+MODES = ("auto", "reflink", "hardlink", "kernel", "copy")
+
+
+@dataclass
+class CopyResult:
+    """Результат копирования файла"""
+    path: str
+    size: int
+    sha256: Optional[str]  # None при compute_hash=False
+    method: str
+
+
+def hash_file(path: Union[str, Path], chunk_size: int = CHUNK_SIZE) -> str:
+    """SHA-256 файла с чтением в переиспользуемый буфер"""
+    digest = hashlib.sha256()
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        while n := f.readinto(buf):
+            digest.update(view[:n])
+    return digest.hexdigest()
+
+
+def copy_file(source: Union[str, Path], target: Union[str, Path], mode: str = "auto",
+              chunk_size: int = CHUNK_SIZE, compute_hash: bool = True) -> CopyResult:
+    """Копирование файла с вычислением SHA-256.
+
+    mode:
+      auto     - reflink, затем copy_file_range/sendfile, затем обычное копирование;
+      reflink  - только клонирование экстентов (ошибка, если ФС не поддерживает);
+      hardlink - жесткая ссылка (для импорта в пределах одного тома),
+                 при другом томе - как auto;
+      kernel   - copy_file_range/sendfile без reflink;
+      copy     - копирование через пользовательский буфер.
+
+    При копировании через буфер хеш считается в том же проходе. При reflink,
+    жесткой ссылке и копировании ядром данные в процесс не попадают, и хеш
+    (если он нужен, compute_hash) считается отдельным чтением исходного
+    файла - обычно уже из page cache. Метаданные копируются как в shutil.copy2.
+
+    Существующий target не перезаписывается (FileExistsError). Если
+    копирование не удалось или скопировано меньше байт, чем в исходном
+    файле, созданный target удаляется и возникает OSError.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Неизвестный режим копирования: {mode}")
+    source, target = Path(source), Path(target)
+
+    if mode == "hardlink":
+        try:
+            os.link(source, target)
+            sha256 = hash_file(source, chunk_size) if compute_hash else None
+            return CopyResult(str(target), source.stat().st_size, sha256, "hardlink")
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                raise
+        mode = "auto"
+
+    with open(source, "rb", buffering=0) as fsrc:
+        # "xb": target создается этим вызовом, поэтому при ошибке его можно удалить
+        fdst = open(target, "xb", buffering=0)
+        try:
+            with fdst:
+                size = os.fstat(fsrc.fileno()).st_size
+                method = None
+                if mode in ("auto", "reflink"):
+                    if _reflink(fsrc.fileno(), fdst.fileno()):
+                        method = "reflink"
+                    elif mode == "reflink":
+                        raise OSError(errno.EOPNOTSUPP, "Файловая система не поддерживает reflink", str(target))
+
+                if method is None and mode in ("auto", "kernel"):
+                    method = _kernel_copy(fsrc.fileno(), fdst.fileno(), size, chunk_size)
+                if method is None:
+                    digest = hashlib.sha256() if compute_hash else None
+                    method = _buffered_copy(fsrc, fdst, digest, chunk_size)
+                    sha256 = digest.hexdigest() if compute_hash else None
+                else:
+                    sha256 = hash_file(source, chunk_size) if compute_hash else None
+                copied = os.fstat(fdst.fileno()).st_size
+                if copied != size:
+                    raise OSError(errno.EIO, f"Скопировано {copied} байт из {size}", str(source))
+            shutil.copystat(source, target)
+        except BaseException:
+            target.unlink(missing_ok=True)
+            raise
+
+    return CopyResult(str(target), size, sha256, method)
+
+
+def _reflink(src_fd: int, dst_fd: int) -> bool:
+    if fcntl is None or not sys.platform.startswith("linux"):
+        return False
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return True
+    except OSError:
+        return False
+
+
+def _kernel_copy(src_fd: int, dst_fd: int, size: int, chunk_size: int) -> Optional[str]:
+    """copy_file_range или sendfile; None, если ни один не поддерживается.
+
+    Если вызов вернул 0 раньше конца файла (некоторые ФС и псевдофайлы не
+    отдают данные ядру), target очищается и тоже возвращается None:
+    копирование продолжит _buffered_copy.
+    """
+    for method in ("copy_file_range", "sendfile"):
+        if not hasattr(os, method):
+            continue
+        offset = 0
+        try:
+            while offset < size:
+                count = min(chunk_size, size - offset)
+                if method == "copy_file_range":
+                    sent = os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+                else:
+                    os.lseek(dst_fd, offset, os.SEEK_SET)
+                    sent = os.sendfile(dst_fd, src_fd, offset, count)
+                if sent == 0:
+                    break
+                offset += sent
+            if offset == size:
+                return method
+            os.ftruncate(dst_fd, 0)
+            os.lseek(dst_fd, 0, os.SEEK_SET)
+            os.lseek(src_fd, 0, os.SEEK_SET)
+            return None
+        except OSError as e:
+            if offset or e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL,
+                                         errno.EOPNOTSUPP, errno.EBADF):
+                raise
+    return None
+
+
+def _buffered_copy(fsrc, fdst, digest, chunk_size: int) -> str:
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    while n := fsrc.readinto(buf):
+        if digest is not None:
+            digest.update(view[:n])
+        chunk = view[:n]
+        while chunk:
+            chunk = chunk[fdst.write(chunk):]
+    return "copy"
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from database import DatabaseManager
+from file_copy import copy_file, hash_file
+
+
+class LeaseLost(Exception):
+    """Аренда задания истекла и передана другому обработчику"""
+
+
+class IngestWorker:
+    """Обработчик очереди загрузки документов.
+
+    Задание проходит состояния pending -> copying -> processing -> committed
+    (или failed после исчерпания попыток). Состояние хранится в archive.db,
+    поэтому после падения приложения незавершенные задания подхватываются
+    заново по истечении аренды.
+    """
+
+    def __init__(self, db: DatabaseManager, processor=None,
+                 files_dir: str = "document_files",
+                 lease_seconds: float = 300.0,
+                 base_backoff: float = 5.0,
+                 max_backoff: float = 600.0,
+                 min_interval: float = 0.0,
+                 poll_interval: float = 2.0,
+                 copy_mode: str = "auto",
+                 on_job_done: Optional[Callable[[Dict], None]] = None):
+        self.db = db
+        self.processor = processor
+        self.files_dir = Path(files_dir)
+        self.lease_seconds = lease_seconds
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.min_interval = min_interval  # пауза между заданиями для ночных импортов
+        self.poll_interval = poll_interval
+        self.copy_mode = copy_mode  # "hardlink" для импорта в пределах тома
+        self.on_job_done = on_job_done
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._thread = None
+
+    def enqueue(self, source_path: str, payload: Dict, max_attempts: int = 5) -> Optional[int]:
+        """Постановка файла в очередь загрузки (занятое имя в files_dir получает номер задания)"""
+        self.files_dir.mkdir(exist_ok=True)
+        target_path = self.files_dir / Path(source_path).name
+        return self.db.enqueue_ingest_job(str(source_path), str(target_path), payload, max_attempts)
+
+    def run_once(self, job_id: Optional[int] = None) -> Optional[Dict]:
+        """Выполнение одного задания; None, если готовых заданий нет"""
+        job = self.db.lease_ingest_job(self.owner, self.lease_seconds, job_id)
+        if not job:
+            return None
+
+        state = None
+        try:
+            if job["state"] == "pending":
+                self._set_state(job, "copying")
+            if job["state"] == "copying":
+                content_hash, file_size = self._copy(Path(job["source_path"]), Path(job["target_path"]),
+                                                     job["content_hash"])
+                self._set_state(job, "processing", content_hash=content_hash, file_size=file_size)
+            if job["state"] == "processing":
+                if self.processor is not None:
+                    asyncio.run(self.processor.process_document(job["target_path"]))
+                if self.db.commit_ingest_job(job["id"], self.owner) is None:
+                    raise RuntimeError("не удалось записать документ в БД")
+        except LeaseLost:
+            # Задание продолжает новый владелец: его файлы и счетчик попыток не трогаем
+            print(f"Задание {job['id']} передано другому обработчику, обработка прервана")
+        except Exception as e:
+            delay = min(self.base_backoff * 2 ** job["attempts"], self.max_backoff)
+            state = self.db.fail_ingest_job(job["id"], self.owner, str(e), delay)
+            print(f"Ошибка при обработке задания {job['id']} ({state}): {e}")
+
+        job = self.db.get_ingest_job(job["id"])
+        if job and state == "failed":
+            self._discard_files(job)
+        if job and job["state"] in ("committed", "failed") and self.on_job_done:
+            self.on_job_done(job)
+        return job
+
+    def _set_state(self, job: Dict, state: str, **fields):
+        """Смена состояния задания; LeaseLost, если аренда уже не наша"""
+        if not self.db.set_ingest_job_state(job["id"], self.owner, state, **fields):
+            raise LeaseLost(job["id"])
+        job["state"] = state
+
+    def _discard_files(self, job: Dict):
+        """Удаление копии окончательно не загруженного файла из files_dir.
+
+        .part всегда принадлежит заданию (имя цели уникально). Готовый
+        target удаляется, только если на него нет ссылок и это копия
+        загружаемого файла: чужой файл под тем же именем остается на месте.
+        """
+        target = Path(job["target_path"])
+        try:
+            target.with_name(target.name + ".part").unlink(missing_ok=True)
+            if not target.exists():
+                return
+            referenced = self.db.get_referenced_files([str(target)])
+            if referenced is None or referenced:
+                return
+            expected = job["content_hash"]
+            source = Path(job["source_path"])
+            if expected is None and source.exists():
+                expected = hash_file(source)
+            if expected is not None and hash_file(target) == expected:
+                target.unlink()
+        except OSError as e:
+            print(f"Ошибка при удалении файлов задания {job['id']}: {e}")
+
+    def _copy(self, source: Path, target: Path, expected_hash: Optional[str] = None):
+        """Копирование через временный файл: повтор после сбоя безопасен.
+
+        Готовый target остается от прерванной попытки этого же задания;
+        он принимается, только если хеш совпадает с записанным в задании
+        (или, если записать его не успели, с хешем исходного файла).
+        """
+        if target.exists():
+            content_hash = hash_file(target)
+            if content_hash == (expected_hash or hash_file(source)):
+                return content_hash, target.stat().st_size
+            raise RuntimeError(f"файл {target} уже существует и отличается от загружаемого")
+        partial = target.with_name(target.name + ".part")
+        # .part остается только от прерванной попытки этого же задания
+        partial.unlink(missing_ok=True)
+        result = copy_file(source, partial, mode=self.copy_mode)
+        if result.method != "hardlink":
+            with open(partial, "rb") as f:
+                os.fsync(f.fileno())
+        os.replace(partial, target)
+        return result.sha256, result.size
+
+    def start(self):
+        """Запуск фоновой обработки очереди"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ingest-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Остановка фоновой обработки"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            job = self.run_once()
+            if job is None:
+                self._stop.wait(self.poll_interval)
+            elif self.min_interval:
+                self._stop.wait(self.min_interval)
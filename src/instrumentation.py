@@ -0,0 +1,377 @@
+import functools
+import inspect
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Методы, которые не оборачиваются: управление соединениями и сама статистика
+SKIP_METHODS = {"batch", "stats", "reset_stats", "close"}
+EXPLAIN_PREFIXES = ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class _Frame:
+    """Вызов метода DatabaseManager в текущем потоке"""
+    __slots__ = ("name", "rows", "cursors", "overhead")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+        self.cursors = []
+        self.overhead = 0.0  # время учета запросов (в том числе EXPLAIN), не входит во время метода
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Курсор, измеряющий время каждого запроса вместе с чтением строк"""
+
+    def _begin(self, sql: str, parameters, many: bool):
+        self._finish()
+        instrumentation = self.connection.instrumentation
+        frame = instrumentation.current_frame()
+        if frame is None:
+            self._query = None
+            return
+        frame.cursors.append(self)
+        self._query = [sql, parameters, many, 0.0, 0, frame]
+
+    def _add(self, elapsed: float, rows: int):
+        query = getattr(self, "_query", None)
+        if query is not None:
+            query[3] += elapsed
+            query[4] += rows
+
+    def _finish(self):
+        query = getattr(self, "_query", None)
+        if query is None:
+            return
+        self._query = None
+        sql, parameters, many, elapsed, rows, frame = query
+        frame.rows += rows
+        started = time.perf_counter()
+        self.connection.instrumentation.record_query(
+            frame.name, sql, parameters, many, elapsed, rows, self.connection
+        )
+        frame.overhead += time.perf_counter() - started
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql, parameters, False)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            # Для INSERT/UPDATE/DELETE строками считаются измененные
+            changed = max(self.rowcount, 0) if self.description is None else 0
+            self._add(time.perf_counter() - started, changed)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql, None, True)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._add(time.perf_counter() - started, max(self.rowcount, 0))
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._add(time.perf_counter() - started, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._add(time.perf_counter() - started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._add(time.perf_counter() - started, len(rows))
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Соединение, создающее InstrumentedCursor по умолчанию"""
+    instrumentation = None
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or InstrumentedCursor)
+
+
+class DatabaseInstrumentation:
+    """Статистика вызовов DatabaseManager и выполненных ими запросов.
+
+    Для каждого метода считаются вызовы, ошибки, время и прочитанные или
+    измененные строки; для каждого запроса (по тексту SQL) - то же самое.
+    Запросы дольше slow_threshold_ms попадают в журнал медленных запросов
+    (slow_log_path) вместе с планом EXPLAIN QUERY PLAN.
+    """
+
+    def __init__(self, slow_threshold_ms: float = 100.0, explain: bool = True,
+                 slow_log_path: Optional[str] = None, keep_slow: int = 50):
+        self.slow_threshold = slow_threshold_ms / 1000
+        self.explain = explain
+        self.slow_log_path = slow_log_path
+        self.db_path = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._methods: Dict[str, Dict] = {}
+        self._queries: Dict[str, Dict] = {}
+        self._slow = deque(maxlen=keep_slow)
+        self._since = datetime.now()
+        # Вызываются как listener(kind, method, seconds, rows), kind - "call" или "query"
+        self.listeners = []
+        self._slow_logger = None
+        if slow_log_path:
+            self._slow_logger = logging.getLogger(f"{__name__}.slow.{slow_log_path}")
+            self._slow_logger.propagate = False
+            if not self._slow_logger.handlers:
+                handler = logging.FileHandler(slow_log_path, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+                self._slow_logger.addHandler(handler)
+            self._slow_logger.setLevel(logging.INFO)
+
+    def connect(self, db_path: str, **kwargs) -> sqlite3.Connection:
+        """Соединение, запросы которого учитываются в статистике"""
+        self.db_path = db_path
+        conn = sqlite3.connect(db_path, factory=InstrumentedConnection, **kwargs)
+        conn.instrumentation = self
+        return conn
+
+    def current_frame(self) -> Optional[_Frame]:
+        stack = getattr(self._local, "stack", None)
+        return stack[-1] if stack else None
+
+    def _push(self, name: str) -> _Frame:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        frame = _Frame(name)
+        stack.append(frame)
+        return frame
+
+    def _pop(self, frame: _Frame, started: float, error: bool):
+        for cursor in frame.cursors:
+            cursor._finish()
+        elapsed = time.perf_counter() - started - frame.overhead
+        stack = self._local.stack
+        stack.pop()
+        # Строки и накладные расходы вложенного вызова учитываются и во внешнем
+        if stack:
+            stack[-1].rows += frame.rows
+            stack[-1].overhead += frame.overhead
+        self.record_call(frame.name, elapsed, frame.rows, error)
+
+    def call(self, name: str, func, args, kwargs):
+        frame = self._push(name)
+        started = time.perf_counter()
+        error = False
+        try:
+            return func(*args, **kwargs)
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self._pop(frame, started, error)
+
+    def call_generator(self, name: str, func, args, kwargs):
+        """Генератор учитывается целиком: время обхода и все выданные строки"""
+        frame = _Frame(name)
+        elapsed = 0.0
+        yielded = 0
+        error = False
+        iterator = func(*args, **kwargs)
+        try:
+            while True:
+                stack = getattr(self._local, "stack", None)
+                if stack is None:
+                    stack = self._local.stack = []
+                stack.append(frame)
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                except BaseException:
+                    error = True
+                    raise
+                finally:
+                    elapsed += time.perf_counter() - started
+                    # Кадр снимается на время обработки строки вызывающим кодом
+                    stack.pop()
+                yielded += 1
+                yield item
+        finally:
+            # Учет запросов при закрытии уже не входит в elapsed
+            elapsed -= frame.overhead
+            iterator.close()
+            for cursor in frame.cursors:
+                cursor._finish()
+            self.record_call(name, elapsed, yielded, error)
+
+    def record_call(self, name: str, elapsed: float, rows: int, error: bool):
+        with self._lock:
+            stats = self._methods.get(name)
+            if stats is None:
+                stats = self._methods[name] = {
+                    "calls": 0, "errors": 0, "total": 0.0, "max": 0.0, "rows": 0
+                }
+            stats["calls"] += 1
+            stats["errors"] += error
+            stats["total"] += elapsed
+            stats["max"] = max(stats["max"], elapsed)
+            stats["rows"] += rows
+        for listener in self.listeners:
+            listener("call", name, elapsed, rows)
+        if elapsed >= self.slow_threshold and self._slow_logger:
+            self._slow_logger.info(f"CALL {name} {elapsed * 1000:.1f} мс, строк: {rows}")
+
+    def record_query(self, method: str, sql: str, parameters, many: bool,
+                     elapsed: float, rows: int, conn: Optional[sqlite3.Connection] = None):
+        key = _WHITESPACE.sub(" ", sql).strip()
+        with self._lock:
+            stats = self._queries.get(key)
+            if stats is None:
+                stats = self._queries[key] = {
+                    "method": method, "calls": 0, "total": 0.0, "max": 0.0, "rows": 0
+                }
+            stats["calls"] += 1
+            stats["total"] += elapsed
+            stats["max"] = max(stats["max"], elapsed)
+            stats["rows"] += rows
+        for listener in self.listeners:
+            listener("query", method, elapsed, rows)
+        if elapsed < self.slow_threshold:
+            return
+
+        plan = None
+        if self.explain and not many and key.upper().startswith(EXPLAIN_PREFIXES):
+            plan = self._explain(sql, parameters, conn)
+        entry = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "method": method,
+            "sql": key,
+            "ms": elapsed * 1000,
+            "rows": rows,
+            "plan": plan,
+        }
+        with self._lock:
+            self._slow.append(entry)
+        if self._slow_logger:
+            message = f"QUERY {method} {entry['ms']:.1f} мс, строк: {rows}: {key}"
+            if plan:
+                message += "\n    " + "\n    ".join(plan)
+            self._slow_logger.info(message)
+
+    def _explain(self, sql: str, parameters,
+                 conn: Optional[sqlite3.Connection] = None) -> Optional[List[str]]:
+        """План запроса: на том же соединении, а если оно уже закрыто - на отдельном.
+
+        План читается обычным sqlite3.Cursor: сам EXPLAIN не должен попасть
+        в статистику метода, запрос которого измерялся.
+        """
+        query = f"EXPLAIN QUERY PLAN {sql}"
+        try:
+            try:
+                if conn is None:
+                    raise sqlite3.ProgrammingError("нет соединения")
+                cursor = conn.cursor(sqlite3.Cursor)
+                try:
+                    rows = cursor.execute(query, parameters or ()).fetchall()
+                finally:
+                    cursor.close()
+            except sqlite3.ProgrammingError:
+                if not self.db_path:
+                    return None
+                # Короткое ожидание: план не должен задерживать сам запрос
+                conn = sqlite3.connect(self.db_path, timeout=0.5)
+                try:
+                    rows = conn.execute(query, parameters or ()).fetchall()
+                finally:
+                    conn.close()
+        except sqlite3.Error as e:
+            logger.debug(f"Не удалось получить план запроса: {e}")
+            return None
+        return [row[-1] for row in rows]
+
+    def snapshot(self, top: int = 20) -> Dict:
+        """Снимок статистики для панели администратора"""
+        def summarize(stats: Dict) -> Dict:
+            result = {
+                "calls": stats["calls"],
+                "total_ms": stats["total"] * 1000,
+                "avg_ms": stats["total"] * 1000 / stats["calls"] if stats["calls"] else 0.0,
+                "max_ms": stats["max"] * 1000,
+                "rows": stats["rows"],
+            }
+            for extra in ("errors", "method"):
+                if extra in stats:
+                    result[extra] = stats[extra]
+            return result
+
+        with self._lock:
+            methods = {name: summarize(stats) for name, stats in self._methods.items()}
+            queries = sorted(self._queries.items(), key=lambda item: -item[1]["total"])[:top]
+            slow = list(self._slow)
+        return {
+            "enabled": True,
+            "since": self._since.isoformat(timespec="seconds"),
+            "slow_threshold_ms": self.slow_threshold * 1000,
+            "methods": methods,
+            "queries": [dict(summarize(stats), sql=sql) for sql, stats in queries],
+            "slow_queries": slow,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+            self._queries.clear()
+            self._slow.clear()
+            self._since = datetime.now()
+
+
+def instrument_methods(cls):
+    """Обертка публичных методов класса для учета в DatabaseInstrumentation.
+
+    Без включенной статистики (self.instrumentation is None) обертка
+    сразу вызывает исходный метод.
+    """
+    for name, func in list(vars(cls).items()):
+        if name.startswith("_") or name in SKIP_METHODS or not inspect.isfunction(func):
+            continue
+        if inspect.isgeneratorfunction(func):
+            setattr(cls, name, _wrap_generator(name, func))
+        else:
+            setattr(cls, name, _wrap(name, func))
+    return cls
+
+
+def _wrap(name, func):
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        instrumentation = self.instrumentation
+        if instrumentation is None:
+            return func(self, *args, **kwargs)
+        return instrumentation.call(name, func, (self, *args), kwargs)
+    return wrapper
+
+
+def _wrap_generator(name, func):
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        instrumentation = self.instrumentation
+        if instrumentation is None:
+            return func(self, *args, **kwargs)
+        return instrumentation.call_generator(name, func, (self, *args), kwargs)
+    return wrapper
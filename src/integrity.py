@@ -0,0 +1,321 @@
+"""Сверка archive.db с каталогом файлов документов.
+
+Проверки:
+    missing  - документ ссылается на несуществующий файл (висячая строка)
+    size     - размер файла отличается от file_size в БД
+    hash     - SHA-256 файла отличается от content_hash в БД
+    orphan   - файл каталога, на который не ссылается ни один документ
+               (включая корзину) и ни одно незавершенное задание загрузки
+
+Относительный file_path в БД отсчитывается от корня архива - каталога
+archive.db, а не от текущего каталога процесса; файлы каталога и ссылки
+из БД сравниваются по Path.resolve(). Поэтому проверка дает одинаковый
+результат при запуске из любого каталога.
+
+Документы читаются порциями в порядке id, файлы проверяются в пуле
+потоков; каталог обходится в порядке имен. После каждой порции ход
+проверки сохраняется в файл состояния, поэтому прерванная проверка
+большого архива продолжается с места остановки.
+
+Исправление (repair=True):
+    missing - документ переносится в корзину;
+    orphan  - файл переносится в каталог карантина, а не удаляется;
+    документы без хеша или размера получают их по файлу.
+Расхождения размера и хеша только сообщаются: это повреждение файла, и
+перезапись значений в БД его бы скрыла. Исправление отменяется
+(RepairRefused), если каталога файлов нет, почти все документы
+порции остались без файла или почти все файлы порции - без ссылки: так
+выглядит не повреждение архива, а неверный --files-dir или --db.
+"""
+import contextlib
+import itertools
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from database import DatabaseManager, FolderRef
+from file_copy import hash_file
+
+KINDS = ("missing", "size", "hash", "orphan")
+# Доля документов без файла (или файлов без ссылки) в порции, при которой исправление отменяется
+MAX_MISSING_RATIO = 0.9
+MIN_MISSING_SAMPLE = 10  # в порции меньшего размера доля не проверяется
+
+
+class RepairRefused(RuntimeError):
+    """Исправление отменено: результаты проверки похожи на неверные пути"""
+
+
+@dataclass
+class Problem:
+    """Найденное расхождение"""
+    kind: str
+    path: str
+    doc_id: Optional[int] = None
+    detail: str = ""
+
+    def __str__(self) -> str:
+        subject = f"документ {self.doc_id}" if self.doc_id is not None else "файл"
+        detail = f": {self.detail}" if self.detail else ""
+        return f"{self.kind} - {subject} ({self.path}){detail}"
+
+
+def resolve_stored_path(file_path: str, root: Path) -> Path:
+    """Абсолютный путь файла документа; относительный - от корня архива"""
+    return (root / file_path).resolve()
+
+
+def _check_document(job) -> Tuple[Optional[Problem], Optional[Tuple[str, int]]]:
+    """Проверка файла документа: (расхождение, (хеш, размер) для дозаписи в БД)"""
+    doc_id, file_path, root, file_size, content_hash, check_hash, fill_missing = job
+    path = resolve_stored_path(file_path, root)
+    try:
+        size = os.stat(path).st_size
+    except OSError:
+        return Problem("missing", file_path, doc_id, f"файл не найден: {path}"), None
+    if file_size is not None and size != file_size:
+        return Problem("size", file_path, doc_id, f"размер {size}, в БД {file_size}"), None
+    if content_hash and check_hash:
+        actual = hash_file(path)
+        if actual != content_hash:
+            return Problem("hash", file_path, doc_id, "хеш не совпадает"), None
+    if fill_missing and (content_hash is None or file_size is None):
+        return None, (content_hash or hash_file(path), size)
+    return None, None
+
+
+class IntegrityScanner:
+    """Параллельная сверка документов БД и файлов каталога.
+
+    files_dir и quarantine_dir по умолчанию (None) - каталоги document_files
+    и orphaned_files в корне архива; заданные относительные пути
+    отсчитываются от текущего каталога, как обычные аргументы командной строки.
+    """
+
+    def __init__(self, db: DatabaseManager, files_dir: Optional[str] = None,
+                 jobs: int = 4, check_hash: bool = True, repair: bool = False,
+                 quarantine_dir: Optional[str] = None, state_path: Optional[str] = None,
+                 chunk_size: int = 1000, grace_seconds: float = 3600.0,
+                 on_problem: Optional[Callable[[Problem], None]] = None,
+                 on_progress: Optional[Callable[[int], None]] = None):
+        self.db = db
+        self.root = Path(db.db_path).resolve().parent
+        self.files_dir = Path(files_dir).resolve() if files_dir else self.root / "document_files"
+        self.jobs = jobs
+        self.check_hash = check_hash
+        self.repair = repair
+        self.quarantine_dir = (Path(quarantine_dir).resolve() if quarantine_dir
+                               else self.root / "orphaned_files")
+        self.state_path = Path(state_path) if state_path else None
+        self.chunk_size = chunk_size  # документов или файлов между сохранениями состояния
+        # Свежий файл может быть еще не записан в БД (копирование идет до вставки строки)
+        self.grace_seconds = grace_seconds
+        self.on_problem = on_problem
+        self.on_progress = on_progress
+        self.counts: Dict[str, int] = {}  # счетчики текущей проверки, в том числе прерванной
+
+    def scan(self, folder: FolderRef = None) -> Dict[str, int]:
+        """Проверка; возвращает счетчики (с учетом продолженной проверки).
+
+        При заданной папке проверяются только ее документы: поиск
+        бесхозных файлов имеет смысл лишь для всего архива.
+        """
+        if self.repair and not self.files_dir.is_dir():
+            raise RepairRefused(f"каталог файлов {self.files_dir} не найден, исправление отменено")
+        state = self._load_state(folder)
+        self.counts = state["counts"]
+        if state["phase"] == "documents":
+            self._scan_documents(state, folder)
+            state["phase"] = "files" if folder is None else "done"
+            self._save_state(state)
+        if state["phase"] == "files":
+            self._scan_files(state)
+            state["phase"] = "done"
+            self._save_state(state)
+        if self.state_path is not None:
+            # Завершенная проверка в следующий раз начинается заново
+            self.state_path.unlink(missing_ok=True)
+        return state["counts"]
+
+    # --- состояние ---
+
+    def _load_state(self, folder: FolderRef) -> Dict:
+        scope = {"files_dir": str(self.files_dir), "folder": folder}
+        if self.state_path is not None and self.state_path.exists():
+            try:
+                state = json.loads(self.state_path.read_text(encoding="utf-8"))
+                if state.get("scope") == scope:
+                    return state
+                print(f"Файл состояния {self.state_path} от другой проверки, начинаем заново")
+            except (OSError, ValueError) as e:
+                print(f"Ошибка при чтении состояния проверки: {e}")
+        counts = dict.fromkeys(("documents", "files", "skipped", "repaired", "filled") + KINDS, 0)
+        return {"scope": scope, "phase": "documents", "after_id": 0, "after_file": [], "counts": counts}
+
+    def _save_state(self, state: Dict):
+        if self.state_path is None:
+            return
+        # Запись через временный файл: прерывание не оставляет поврежденного состояния
+        partial = self.state_path.with_name(self.state_path.name + ".tmp")
+        partial.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+        os.replace(partial, self.state_path)
+
+    def _report(self, state: Dict, problem: Problem):
+        state["counts"][problem.kind] += 1
+        if self.on_problem is not None:
+            self.on_problem(problem)
+
+    def _progress(self, count: int):
+        if self.on_progress is not None:
+            self.on_progress(count)
+
+    # --- документы ---
+
+    def _document_chunks(self, folder: FolderRef, after_id: int) -> Iterator[List]:
+        """Документы порциями; между порциями соединение чтения закрыто,
+        поэтому исправления можно записывать в БД"""
+        while True:
+            with contextlib.closing(self.db.iter_documents(folder, after_id=after_id,
+                                                           include_deleted=True)) as documents:
+                chunk = list(itertools.islice(documents, self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+            after_id = chunk[-1]["id"]
+
+    def _scan_documents(self, state: Dict, folder: FolderRef):
+        counts = state["counts"]
+        # hashlib отпускает GIL на больших блоках, поэтому хватает потоков
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            for chunk in self._document_chunks(folder, state["after_id"]):
+                jobs = [
+                    (doc["id"], doc["file_path"], self.root, doc["file_size"], doc["content_hash"],
+                     self.check_hash, self.repair)
+                    for doc in chunk if doc["file_path"]
+                ]
+                problems = []
+                dangling = []
+                checksums = []
+                for job, (problem, checksum) in zip(jobs, executor.map(_check_document, jobs)):
+                    if problem is not None:
+                        problems.append(problem)
+                        if problem.kind == "missing":
+                            dangling.append(job[0])
+                    elif checksum is not None:
+                        checksums.append((job[0], checksum))
+                if (self.repair and len(jobs) >= MIN_MISSING_SAMPLE
+                        and len(dangling) >= len(jobs) * MAX_MISSING_RATIO):
+                    # Состояние не сохраняется: после исправления путей порция проверится заново
+                    raise RepairRefused(
+                        f"нет файлов у {len(dangling)} из {len(jobs)} документов "
+                        f"(корень архива {self.root}), исправление отменено: проверьте --db и --files-dir")
+                for problem in problems:
+                    self._report(state, problem)
+                if self.repair and (dangling or checksums):
+                    # Счетчики растут только после фиксации: отмененный пакет ничего не исправил
+                    with self.db.batch():
+                        repaired = self.db.delete_documents(dangling)
+                        filled = sum(self.db.update_document(doc_id, content_hash=content_hash,
+                                                             file_size=file_size)
+                                     for doc_id, (content_hash, file_size) in checksums)
+                    counts["repaired"] += repaired
+                    counts["filled"] += filled
+                counts["documents"] += len(chunk)
+                state["after_id"] = chunk[-1]["id"]
+                self._save_state(state)
+                self._progress(len(chunk))
+
+    # --- файлы ---
+
+    def _walk_files(self, directory: Path, parts: Tuple[str, ...], after: Tuple[str, ...]) -> Iterator[Tuple[str, ...]]:
+        """Файлы каталога в порядке имен (подкаталоги - на месте своего имени)
+        после after; пути - кортежи частей относительно files_dir"""
+        try:
+            with os.scandir(directory) as scan:
+                entries = sorted(scan, key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"Ошибка при чтении каталога {directory}: {e}")
+            return
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            path = parts + (entry.name,)
+            if entry.is_dir(follow_symlinks=False):
+                # Каталог целиком до after пропускается, не открываясь
+                if path < after[:len(path)]:
+                    continue
+                if Path(entry.path).resolve() == self.quarantine_dir.resolve():
+                    continue
+                yield from self._walk_files(Path(entry.path), path, after)
+            elif entry.is_file(follow_symlinks=False) and path > after:
+                yield path
+
+    def _scan_files(self, state: Dict):
+        counts = state["counts"]
+        if not self.files_dir.is_dir():
+            return
+        files = self._walk_files(self.files_dir, (), tuple(state["after_file"]))
+        while chunk := list(itertools.islice(files, self.chunk_size)):
+            referenced = self._referenced(chunk)
+            if (self.repair and len(chunk) >= MIN_MISSING_SAMPLE
+                    and len(chunk) - len(referenced) >= len(chunk) * MAX_MISSING_RATIO):
+                raise RepairRefused(
+                    f"нет ссылок в БД на {len(chunk) - len(referenced)} из {len(chunk)} файлов "
+                    f"(корень архива {self.root}), исправление отменено: проверьте --db и --files-dir")
+            now = time.time()
+            for parts in chunk:
+                if parts in referenced:
+                    continue
+                path = self.files_dir.joinpath(*parts)
+                try:
+                    if now - path.stat().st_mtime < self.grace_seconds:
+                        counts["skipped"] += 1
+                        continue
+                except OSError:
+                    continue  # файл удален во время проверки
+                self._report(state, Problem("orphan", str(path), detail="нет ссылки в БД"))
+                if self.repair and self._quarantine(path, parts):
+                    counts["repaired"] += 1
+            counts["files"] += len(chunk)
+            state["after_file"] = list(chunk[-1])
+            self._save_state(state)
+            self._progress(len(chunk))
+
+    def _referenced(self, chunk: List[Tuple[str, ...]]) -> set:
+        """Файлы порции, на которые есть ссылки в БД.
+
+        Путь в БД может быть абсолютным или относительным от корня архива
+        (в том числе с "./"); БД ищет по всем этим написаниям, а найденная
+        строка засчитывается, только если после resolve() она указывает на
+        тот же файл.
+        """
+        candidates = {}
+        for parts in chunk:
+            path = self.files_dir.joinpath(*parts)
+            relative = os.path.relpath(path, self.root)
+            for spelling in (str(path), relative, os.path.join(".", relative)):
+                candidates[spelling] = parts
+        referenced = self.db.get_referenced_files(candidates)
+        if referenced is None:
+            # Без ответа БД любой файл выглядел бы бесхозным
+            raise RuntimeError("не удалось проверить ссылки на файлы")
+        return {
+            candidates[stored] for stored in referenced
+            if resolve_stored_path(stored, self.root) == self.files_dir.joinpath(*candidates[stored]).resolve()
+        }
+
+    def _quarantine(self, path: Path, parts: Tuple[str, ...]) -> bool:
+        """Перенос бесхозного файла в карантин с сохранением относительного пути"""
+        target = self.quarantine_dir.joinpath(*parts)
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(path), str(target))
+            return True
+        except OSError as e:
+            print(f"Ошибка при переносе файла {path} в карантин: {e}")
+            return False
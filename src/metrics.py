@@ -0,0 +1,289 @@
+"""Экспорт метрик архива в текстовом формате Prometheus.
+
+Метрики копятся в памяти процесса; MetricsServer отдает их по
+http://127.0.0.1:<порт>/metrics. Сервер слушает только localhost и
+запускается по желанию (параметр --metrics-port приложения).
+"""
+import bisect
+import threading
+import time
+from contextlib import ContextDecorator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: ожидаются метки {self.labelnames}, получены {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Монотонно растущий счетчик"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in values]
+
+
+class Gauge(_Metric):
+    """Текущее значение; при func значение вычисляется в момент опроса"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 func: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self.func = func
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self) -> List[str]:
+        if self.func is not None:
+            return [f"{self.name} {_format_value(self.func())}"]
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in values]
+
+
+class _Timer(ContextDecorator):
+    def __init__(self, histogram: "Histogram", labels: Dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        # Замеры вложенных и параллельных вызовов не должны мешать друг другу
+        local = self.histogram._local
+        local.starts = getattr(local, "starts", [])
+        local.starts.append(time.perf_counter())
+        return self
+
+    def __exit__(self, *exc):
+        started = self.histogram._local.starts.pop()
+        self.histogram.observe(time.perf_counter() - started, **self.labels)
+        return False
+
+
+class Histogram(_Metric):
+    """Распределение значений по корзинам (накопительным, как в Prometheus)"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, list] = {}  # метки -> [счетчики корзин, сумма, количество]
+        self._local = threading.local()
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *values, **labels) -> _Timer:
+        """Замер длительности блока with или функции (как декоратор)"""
+        labels.update(zip(self.labelnames, values))
+        return _Timer(self, labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, (list(counts), total, count))
+                            for key, (counts, total, count) in self._series.items())
+        lines = []
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Набор метрик, выводимых одним ответом /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # Ошибка одной метрики (например, недоступная БД) не ломает остальные
+                lines.append(f"# {metric.name}: ошибка при сборе: {_escape(e)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+DB_CALL_SECONDS = REGISTRY.register(Histogram(
+    "archive_db_call_seconds", "Длительность вызовов методов DatabaseManager", ["method"]))
+DB_QUERY_SECONDS = REGISTRY.register(Histogram(
+    "archive_db_query_seconds", "Длительность SQL-запросов (выполнение и чтение строк)", ["method"]))
+DB_ROWS = REGISTRY.register(Counter(
+    "archive_db_rows_total", "Строки, прочитанные или измененные методами DatabaseManager", ["method"]))
+PROCESS_STAGE_SECONDS = REGISTRY.register(Histogram(
+    "archive_process_stage_seconds", "Длительность этапов process_document", ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)))
+PREVIEW_CACHE = REGISTRY.register(Counter(
+    "archive_preview_cache_total", "Обращения к кэшу превью (result: hit или miss)", ["result"]))
+UI_REFRESH_SECONDS = REGISTRY.register(Histogram(
+    "archive_ui_refresh_seconds", "Длительность обновления элементов интерфейса", ["view"]))
+INGEST_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "archive_ingest_queue_depth", "Незавершенные задания очереди загрузки"))
+
+
+def observe_database(db, registry: MetricsRegistry = REGISTRY):
+    """Передача статистики DatabaseManager в метрики.
+
+    Если у db нет инструментирования, оно включается; глубина очереди
+    загрузки читается из этой же базы при каждом опросе.
+    """
+    from instrumentation import DatabaseInstrumentation
+
+    if db.instrumentation is None:
+        db.instrumentation = DatabaseInstrumentation()
+    call_seconds = registry.get("archive_db_call_seconds")
+    query_seconds = registry.get("archive_db_query_seconds")
+    rows_total = registry.get("archive_db_rows_total")
+
+    def listener(kind: str, method: str, seconds: float, rows: int):
+        if kind == "call":
+            call_seconds.observe(seconds, method=method)
+            rows_total.inc(rows, method=method)
+        else:
+            query_seconds.observe(seconds, method=method)
+
+    db.instrumentation.listeners.append(listener)
+    registry.get("archive_ingest_queue_depth").func = db.get_ingest_queue_depth
+
+
+def observe_processor(processor, registry: MetricsRegistry = REGISTRY):
+    """Передача длительности этапов и попаданий в кэш превью DocumentProcessor"""
+    stage_seconds = registry.get("archive_process_stage_seconds")
+    preview_cache = registry.get("archive_preview_cache_total")
+    processor.on_stage = lambda stage, seconds: stage_seconds.observe(seconds, stage=stage)
+    processor.on_preview = lambda hit: preview_cache.inc(result="hit" if hit else "miss")
+
+
+class MetricsServer:
+    """HTTP-сервер метрик на localhost в фоновом потоке"""
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY, port: int = 9464, host: str = "127.0.0.1"):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """Запуск сервера; port=0 выбирает свободный порт (см. self.port)"""
+        if self._thread and self._thread.is_alive():
+            return
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # опрос раз в несколько секунд не должен засорять вывод
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Остановка сервера"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        if self._thread:
+            self._thread.join(timeout)
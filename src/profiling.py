@@ -0,0 +1,237 @@
+"""Профилирование сеанса ArchiveApp по обработчикам.
+
+Режим cprofile профилирует каждый вызов обработчика отдельным
+cProfile.Profile и накапливает статистику по имени обработчика.
+Режим sample раз в interval секунд снимает стеки всех потоков; выборки,
+попавшие в работающий обработчик, учитываются под его именем.
+
+При остановке в каталог профилей записываются:
+    <обработчик>.prof       - статистика pstats (режим cprofile)
+    <обработчик>.collapsed  - стеки обработчика (при выборке стеков)
+    summary.txt             - вызовы и время по обработчикам
+и, если задан flamegraph_path, общий файл стеков в формате collapsed
+(строка "кадр;кадр;... число") для flamegraph.pl или speedscope.
+"""
+import cProfile
+import functools
+import inspect
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+MODES = ("cprofile", "sample")
+
+
+class SessionProfiler:
+    """Профилировщик обработчиков интерфейса и фоновых потоков"""
+
+    def __init__(self, mode: str = "sample", output_dir: str = "profiles",
+                 interval: float = 0.005, flamegraph_path: Optional[str] = None):
+        if mode not in MODES:
+            raise ValueError(f"Неизвестный режим профилирования: {mode}")
+        self.mode = mode
+        self.output_dir = Path(output_dir)
+        self.interval = interval
+        self.flamegraph_path = flamegraph_path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._timings: Dict[str, List[float]] = {}  # имя -> [вызовы, всего, максимум]
+        self._stats: Dict[str, pstats.Stats] = {}
+        self._active: Dict[int, List[str]] = {}  # поток -> стек активных обработчиков
+        self._samples: Dict[str, Counter] = {}
+        self._all_samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Запуск выборки стеков (в режиме sample или для flamegraph_path)"""
+        if self.mode != "sample" and not self.flamegraph_path:
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Остановка и запись профилей"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.dump()
+
+    def instrument(self, obj, names: Iterable[str], prefix: str = ""):
+        """Замена методов объекта профилирующими обертками.
+
+        Обертка ставится атрибутом экземпляра, поэтому ее получают и
+        обработчики, созданные до вызова (lambda e: self.select_folder(...)).
+        """
+        for name in names:
+            method = getattr(obj, name, None)
+            if method is None:
+                print(f"Профилирование: нет метода {name}")
+                continue
+            setattr(obj, name, self.wrap(prefix + name, method))
+
+    def wrap(self, name: str, func):
+        """Профилирующая обертка функции под заданным именем"""
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                # Сопрограмма уступает цикл событий на await, поэтому cProfile
+                # к ней не применяется: учитываются время и выборки стеков
+                with self._handler(name, profile=False):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self._handler(name, profile=self.mode == "cprofile"):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def _handler(self, name: str, profile: bool):
+        return _HandlerCall(self, name, profile)
+
+    def _enter(self, name: str, profile: bool) -> Optional[cProfile.Profile]:
+        thread_id = threading.get_ident()
+        with self._lock:
+            stack = self._active.setdefault(thread_id, [])
+            stack.append(name)
+        # Вложенный обработчик (select_folder -> update_folder_tree) уже
+        # профилируется внешним: второй профилировщик в потоке не включается
+        if not profile or getattr(self._local, "profiling", False):
+            return None
+        profiler = cProfile.Profile()
+        self._local.profiling = True
+        profiler.enable()
+        return profiler
+
+    def _exit(self, name: str, elapsed: float, profiler: Optional[cProfile.Profile]):
+        if profiler is not None:
+            profiler.disable()
+            self._local.profiling = False
+        thread_id = threading.get_ident()
+        with self._lock:
+            stack = self._active.get(thread_id)
+            if stack:
+                # Сопрограммы в цикле событий завершаются не в порядке вызова
+                index = len(stack) - 1 - stack[::-1].index(name)
+                del stack[index]
+                if not stack:
+                    del self._active[thread_id]
+            timing = self._timings.setdefault(name, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += elapsed
+            timing[2] = max(timing[2], elapsed)
+        if profiler is not None:
+            try:
+                stats = pstats.Stats(profiler)
+            except TypeError:
+                return  # профилировщик не записал ни одного вызова
+            with self._lock:
+                if name in self._stats:
+                    self._stats[name].add(stats)
+                else:
+                    self._stats[name] = stats
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            with self._lock:
+                active = {thread_id: stack[-1] for thread_id, stack in self._active.items() if stack}
+            for thread_id, frame in frames.items():
+                if thread_id == own:
+                    continue
+                stack = _collapse(frame)
+                handler = active.get(thread_id)
+                root = handler or names.get(thread_id, str(thread_id))
+                key = f"{root};{stack}"
+                with self._lock:
+                    self._all_samples[key] += 1
+                    if handler:
+                        self._samples.setdefault(handler, Counter())[stack] += 1
+
+    def dump(self):
+        """Запись профилей и сводки в output_dir"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            timings = dict(self._timings)
+            stats = dict(self._stats)
+            samples = {name: Counter(counter) for name, counter in self._samples.items()}
+            all_samples = Counter(self._all_samples)
+
+        for name, handler_stats in stats.items():
+            handler_stats.dump_stats(str(self.output_dir / f"{_file_name(name)}.prof"))
+        for name, counter in samples.items():
+            _write_collapsed(self.output_dir / f"{_file_name(name)}.collapsed", counter)
+        if self.flamegraph_path:
+            _write_collapsed(Path(self.flamegraph_path), all_samples)
+
+        lines = [f"Режим: {self.mode}", ""]
+        lines.append(f"{'обработчик':40s} {'вызовы':>8s} {'всего, с':>10s} {'сред., мс':>10s} "
+                     f"{'макс., мс':>10s} {'выборки':>8s}")
+        for name, (calls, total, longest) in sorted(timings.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:40s} {calls:8d} {total:10.3f} {total / calls * 1000:10.1f} "
+                         f"{longest * 1000:10.1f} {sum(samples.get(name, {}).values()):8d}")
+        for name, handler_stats in sorted(stats.items()):
+            out = io.StringIO()
+            handler_stats.stream = out
+            handler_stats.sort_stats("cumulative").print_stats(15)
+            lines.extend(["", f"=== {name} ===", out.getvalue().strip()])
+        (self.output_dir / "summary.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+class _HandlerCall:
+    """Контекст одного вызова обработчика"""
+    __slots__ = ("profiler", "name", "profile", "started", "cprofile")
+
+    def __init__(self, profiler: SessionProfiler, name: str, profile: bool):
+        self.profiler = profiler
+        self.name = name
+        self.profile = profile
+
+    def __enter__(self):
+        self.cprofile = self.profiler._enter(self.name, self.profile)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._exit(self.name, time.perf_counter() - self.started, self.cprofile)
+        return False
+
+
+def _collapse(frame) -> str:
+    """Стек от внешнего кадра к внутреннему в виде "кадр;кадр;..." """
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename == __file__:
+            # Обертки профилировщика в стеке не показываются
+            frame = frame.f_back
+            continue
+        # ';' и пробел в collapsed-формате служебные
+        parts.append(f"{code.co_name}({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                     .replace(";", ":").replace(" ", "_"))
+        frame = frame.f_back
+    parts.reverse()
+    return ";".join(parts)
+
+
+def _write_collapsed(path: Path, counter: Counter):
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in sorted(counter.items()):
+            f.write(f"{stack} {count}\n")
+
+
+def _file_name(name: str) -> str:
+    return "".join(ch if ch.isalnum() or ch in "._-" else "_" for ch in name)
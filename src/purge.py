@@ -0,0 +1,64 @@
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+from database import DatabaseManager
+
+
+class PurgeWorker:
+    """Фоновая очистка корзины: окончательно удаляет документы, файлы и превью
+    по истечении срока хранения, небольшими пакетами."""
+
+    def __init__(self, db: DatabaseManager, retention_days: float = 30,
+                 batch_size: int = 100, interval: float = 3600.0,
+                 preview_folder: str = "previews"):
+        self.db = db
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.interval = interval
+        self.preview_folder = Path(preview_folder)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self) -> int:
+        """Очистка одного пакета; возвращает количество удаленных документов"""
+        candidates = self.db.get_purge_candidates(self.retention_days * 86400, self.batch_size)
+        if not candidates:
+            return 0
+        purged = self.db.purge_documents([doc["id"] for doc in candidates])
+        for doc in candidates:
+            if doc["file_path"]:
+                self._remove_preview(Path(doc["file_path"]))
+        return purged
+
+    def _remove_preview(self, file_path: Path):
+        # Имя превью как в DocumentProcessor.generate_preview
+        preview_path = self.preview_folder / f"{file_path.stem}_preview.png"
+        # Превью общего файла остается, пока файл существует
+        if file_path.exists() or not preview_path.exists():
+            return
+        try:
+            os.remove(preview_path)
+        except OSError as e:
+            print(f"Ошибка при удалении превью {preview_path}: {e}")
+
+    def start(self):
+        """Запуск фоновой очистки"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="purge-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Остановка фоновой очистки"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Пакеты идут подряд, пока корзина не опустеет
+            if self.run_once() < self.batch_size:
+                self._stop.wait(self.interval)
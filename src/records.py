@@ -0,0 +1,94 @@
+from collections.abc import Mapping
+from typing import Dict, Tuple
+
+# Синонимы колонок: get_documents исторически отдает created_date как date_added
+ALIASES = {"date_added": "created_date", "created_date": "date_added"}
+
+_UNSET = object()
+
+
+class RecordLayout:
+    """Соответствие имен колонок позициям в строке; общее для всех строк запроса.
+
+    keys - имена колонок и добавленные к ним синонимы: запись отдает их
+    все, чтобы dict(doc) и "date_added" in doc согласовывались.
+    """
+    __slots__ = ("names", "keys", "index")
+
+    def __init__(self, names: Tuple[str, ...]):
+        self.names = names
+        self.index = {name: i for i, name in enumerate(names)}
+        for alias, name in ALIASES.items():
+            if alias not in self.index and name in self.index:
+                self.index[alias] = self.index[name]
+        self.keys = tuple(self.index)
+
+
+class DocumentRecord(Mapping):
+    """Строка документа без копирования в словарь.
+
+    Хранит кортеж строки из sqlite3 и общую для запроса раскладку колонок.
+    Поддерживает доступ как у словаря (doc["title"], doc.get(...), dict(doc))
+    и как к атрибутам (doc.title). Теги разбиваются в список при первом обращении.
+    """
+    __slots__ = ("_layout", "_row", "_tags")
+
+    def __init__(self, layout: RecordLayout, row: tuple):
+        self._layout = layout
+        self._row = row
+        self._tags = _UNSET
+
+    def __getitem__(self, key: str):
+        i = self._layout.index[key]
+        if key == "tags":
+            if self._tags is _UNSET:
+                raw = self._row[i]
+                self._tags = raw.split(',') if raw else []
+            return self._tags
+        return self._row[i]
+
+    def __getattr__(self, name: str):
+        # Служебные атрибуты (в том числе при копировании до заполнения слотов)
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __iter__(self):
+        return iter(self._layout.keys)
+
+    def __len__(self) -> int:
+        return len(self._layout.keys)
+
+    def __contains__(self, key) -> bool:
+        return key in self._layout.index
+
+    def __repr__(self) -> str:
+        return f"DocumentRecord({dict(self)!r})"
+
+    def __reduce__(self):
+        return DocumentRecord, (self._layout, self._row)
+
+
+_layouts: Dict[Tuple[str, ...], RecordLayout] = {}
+_last = (None, None)
+
+
+def document_factory(cursor, row: tuple) -> DocumentRecord:
+    """row_factory для запросов к documents: DocumentRecord вместо кортежа.
+
+    Раскладка колонок строится один раз на запрос: cursor.description
+    не меняется до следующего execute, поэтому сравнивается по идентичности.
+    """
+    global _last
+    description, layout = _last
+    if description is not cursor.description:
+        description = cursor.description
+        names = tuple(column[0] for column in description)
+        layout = _layouts.get(names)
+        if layout is None:
+            layout = _layouts.setdefault(names, RecordLayout(names))
+        _last = (description, layout)
+    return DocumentRecord(layout, row)
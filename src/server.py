@@ -0,0 +1,708 @@
+"""HTTP/JSON API архива для одновременной работы нескольких клиентов.
+
+Сервер владеет единственным DatabaseManager (с пулом соединений).
+Изменения из обработчиков запросов идут через одного писателя
+AsyncDatabaseManager, чтения - через пул читателей, поэтому клиенты не
+борются за блокировки SQLite. Второй источник записи - IngestWorker: он
+обрабатывает задания загрузки в своем потоке через тот же DatabaseManager.
+Его транзакции короткие (захват, смена состояния, вставка документа), а в
+режиме WAL они лишь ожидают писателя в пределах таймаута блокировки.
+Превью строятся в пуле процессов и хранятся в общем кэше в памяти.
+
+Маршруты:
+    GET  /api/folders                        - папки
+    GET  /api/documents?folder=&after=&limit=&recursive=
+                                             - страница документов папки
+    GET  /api/documents/{id}                 - документ
+    GET  /api/documents/{id}/file            - файл документа
+    GET  /api/documents/{id}/preview         - превью (PNG)
+    GET  /api/search?q=&folder=&limit=       - поиск
+    POST /api/documents?filename=&folder=&title=&status=&author=&tags=
+                                             - загрузка файла (тело - содержимое),
+                                               ответ 202 с номером задания
+    GET  /api/jobs/{id}                      - состояние задания загрузки
+
+Папка задается путем или id. Для следующей страницы документов передается
+after, равный next_after из ответа.
+
+Время обработки запроса ограничено request_timeout. Для загрузки файла
+оно отсчитывается после чтения тела, а само тело ограничено таймаутом
+ожидания каждого фрагмента (body_timeout), поэтому медленный, но живой
+клиент может передать большой файл.
+
+Файл и превью отдаются с ETag (по хэшу содержимого): при совпадении с
+If-None-Match ответ 304 без тела. Заголовок Range (один диапазон байт)
+дает ответ 206, так что большой PDF можно читать по частям. Файл
+передается через sendfile без копирования в память процесса.
+
+Запуск:
+    python src/server.py --db archive.db --port 8080
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import mimetypes
+import os
+import re
+import uuid
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Awaitable, BinaryIO, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from async_database import AsyncDatabaseManager
+from database import DatabaseManager
+from ingest import IngestWorker
+
+MAX_HEADER_SIZE = 64 * 1024
+BODY_CHUNK_SIZE = 256 * 1024
+# Обработчики, читающие тело запроса: на них не действует общий request_timeout
+STREAMING_HANDLERS = {"upload_document"}
+MAX_PAGE_SIZE = 500
+JOB_FIELDS = ("id", "state", "document_id", "last_error")  # поля задания в ответе API
+
+REASONS = {
+    200: "OK", 202: "Accepted", 206: "Partial Content", 304: "Not Modified",
+    400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    408: "Request Timeout", 411: "Length Required", 413: "Payload Too Large",
+    416: "Range Not Satisfiable", 431: "Request Header Fields Too Large",
+    500: "Internal Server Error", 501: "Not Implemented", 503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    """Ошибка, возвращаемая клиенту с заданным кодом"""
+
+    def __init__(self, status: int, message: str = ""):
+        super().__init__(message or REASONS.get(status, ""))
+        self.status = status
+        self.message = message or REASONS.get(status, "")
+
+
+class Request:
+    """Разобранный запрос; тело читается обработчиком по мере надобности"""
+
+    def __init__(self, method: str, target: str, version: str, headers: Dict[str, str],
+                 reader: asyncio.StreamReader, body_timeout: Optional[float] = None):
+        self.method = method
+        self.version = version
+        self.headers = headers
+        split = urlsplit(target)
+        self.path = unquote(split.path)
+        self.query = {key: values[0] for key, values in parse_qs(split.query).items()}
+        self.reader = reader
+        self.body_timeout = body_timeout  # ожидание очередного фрагмента тела
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HTTPError(501, "Transfer-Encoding: chunked не поддерживается")
+        try:
+            self.content_length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HTTPError(400, "Неверный Content-Length")
+        self._remaining = self.content_length
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    @property
+    def body_consumed(self) -> bool:
+        return self._remaining == 0
+
+    async def iter_body(self, chunk_size: int = BODY_CHUNK_SIZE):
+        """Тело запроса фрагментами без загрузки целиком в память"""
+        while self._remaining:
+            try:
+                chunk = await asyncio.wait_for(self.reader.read(min(chunk_size, self._remaining)),
+                                               self.body_timeout)
+            except asyncio.TimeoutError:
+                raise HTTPError(408, "Превышено время ожидания тела запроса")
+            if not chunk:
+                raise HTTPError(400, "Тело запроса оборвано")
+            self._remaining -= len(chunk)
+            yield chunk
+
+    def int_param(self, name: str, default: int, minimum: int = 0,
+                  maximum: Optional[int] = None) -> int:
+        value = self.query.get(name)
+        if value is None:
+            return default
+        try:
+            number = int(value)
+        except ValueError:
+            raise HTTPError(400, f"Параметр {name} должен быть числом")
+        if number < minimum:
+            raise HTTPError(400, f"Параметр {name} должен быть не меньше {minimum}")
+        return min(number, maximum) if maximum is not None else number
+
+    def folder_param(self, name: str = "folder"):
+        """Папка из параметра: id, путь или None"""
+        value = self.query.get(name)
+        if value is None or value == "":
+            return None
+        return int(value) if value.isdigit() else value
+
+
+class Response:
+    """Ответ; вместо body может быть открытый файл (передается через sendfile)"""
+
+    def __init__(self, body: bytes = b"", status: int = 200,
+                 content_type: Optional[str] = "application/json; charset=utf-8",
+                 headers: Optional[Dict[str, str]] = None,
+                 file: Optional[BinaryIO] = None, offset: int = 0, count: int = 0):
+        self.status = status
+        self.body = body
+        self.headers = {"Content-Type": content_type} if content_type else {}
+        if headers:
+            self.headers.update(headers)
+        self.file = file
+        self.offset = offset
+        self.count = count
+
+    @property
+    def length(self) -> int:
+        return self.count if self.file is not None else len(self.body)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def _json_default(value):
+    if isinstance(value, Mapping):
+        return dict(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"Объект {type(value).__name__} не сериализуется в JSON")
+
+
+def json_response(data, status: int = 200) -> Response:
+    body = json.dumps(data, ensure_ascii=False, default=_json_default).encode("utf-8")
+    return Response(body, status)
+
+
+def error_response(error: HTTPError) -> Response:
+    return json_response({"error": error.message}, error.status)
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Совпадение ETag с If-None-Match (слабое сравнение, RFC 9110)"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tag = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == tag:
+            return True
+    return False
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Диапазон из заголовка Range: (начало, конец включительно).
+
+    None - заголовок не применяется (неверный формат или несколько
+    диапазонов: тогда отдается весь файл). RangeNotSatisfiable - диапазон
+    за пределами файла.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = (part.strip() for part in spec.strip().partition("-"))
+    # Границы - только десятичные цифры: int() принял бы и знак ("bytes=--5")
+    if not sep or not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+        return None
+    if first:
+        start = int(first)
+        end = int(last) if last else size - 1
+        if last and end < start:
+            return None
+    else:
+        suffix = int(last)  # bytes=-N: последние N байт
+        if suffix == 0:
+            raise RangeNotSatisfiable()
+        start, end = max(size - suffix, 0), size - 1
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def content_response(request: "Request", etag: str, size: int, content_type: str,
+                     body: bytes = b"", file: Optional[BinaryIO] = None,
+                     headers: Optional[Dict[str, str]] = None) -> Response:
+    """Ответ с содержимым с учетом If-None-Match, Range и If-Range.
+
+    Содержимое - body или открытый file размером size; файл закрывается
+    вместе с ответом.
+    """
+    headers = dict(headers or {})
+    headers.update({"ETag": etag, "Accept-Ranges": "bytes", "Cache-Control": "no-cache"})
+
+    def partial(status: int, start: int, count: int, content_type: Optional[str] = content_type,
+                **extra) -> Response:
+        if file is None:
+            return Response(body[start:start + count], status, content_type, dict(headers, **extra))
+        if count == 0:
+            file.close()
+        return Response(b"", status, content_type, dict(headers, **extra),
+                        file=file if count else None, offset=start, count=count)
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return partial(304, 0, 0, content_type=None)
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range: диапазон только от той же версии, иначе весь файл заново.
+    # Сравнение сильное: слабый ETag не гарантирует побайтного совпадения
+    if range_header and (if_range is None
+                         or (if_range.strip() == etag and not etag.startswith("W/"))):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            return partial(416, 0, 0, content_type=None, **{"Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            return partial(206, start, end - start + 1,
+                           **{"Content-Range": f"bytes {start}-{end}/{size}"})
+    return partial(200, 0, size)
+
+
+class PreviewCache:
+    """Общий кэш превью в памяти: LRU с ограничением по суммарному размеру.
+
+    Одновременные запросы одного превью ждут одну генерацию.
+    Используется только из цикла событий, поэтому блокировки не нужны.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        self._pending: Dict[Tuple, asyncio.Future] = {}
+
+    async def get(self, key: Tuple, load: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
+        data = self._items.get(key)
+        if data is not None:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return data
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            data = await load()
+        except BaseException as e:
+            future.set_exception(e)
+            # Исключение уже передано ожидающим; без них не должно считаться потерянным
+            future.exception()
+            raise
+        finally:
+            self._pending.pop(key, None)
+        future.set_result(data)
+        if data is not None:
+            self._put(key, data)
+        return data
+
+    def _put(self, key: Tuple, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self._items[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted)
+
+
+class ArchiveServer:
+    """Асинхронный HTTP-сервер API архива"""
+
+    def __init__(self, db_path: str = "archive.db", host: str = "127.0.0.1", port: int = 8080,
+                 readers: int = 8, preview_workers: int = 2, preview_dir: str = "previews",
+                 preview_cache_mb: int = 64, files_dir: str = "document_files",
+                 upload_dir: str = "uploads", max_upload_mb: int = 512,
+                 max_connections: int = 256, request_timeout: float = 30.0,
+                 keepalive_timeout: float = 15.0, body_timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.preview_dir = preview_dir
+        self.preview_workers = preview_workers
+        self.upload_dir = Path(upload_dir)
+        self.max_upload = max_upload_mb * 1024 * 1024
+        self.max_connections = max_connections
+        self.request_timeout = request_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.body_timeout = body_timeout
+        with contextlib.redirect_stdout(io.StringIO()):
+            # Соединений в пуле - по одному на читателя и писателя
+            self.db = DatabaseManager(db_path, pool_size=readers + 1)
+        self.adb = AsyncDatabaseManager(self.db, readers=readers)
+        self.previews = PreviewCache(preview_cache_mb * 1024 * 1024)
+        # Загруженный файл лежит на том же томе: в document_files он попадает жесткой ссылкой
+        self.ingest = IngestWorker(self.db, files_dir=files_dir, copy_mode="hardlink",
+                                   poll_interval=0.5, on_job_done=self._on_job_done)
+        self._preview_pool = None
+        self._server = None
+        self._connections = None
+        self._tasks = set()  # обработчики открытых соединений
+        self.routes: List[Tuple[str, "re.Pattern", Callable]] = [
+            ("GET", re.compile(r"^/api/folders$"), self.list_folders),
+            ("GET", re.compile(r"^/api/documents$"), self.list_documents),
+            ("POST", re.compile(r"^/api/documents$"), self.upload_document),
+            ("GET", re.compile(r"^/api/documents/(\d+)$"), self.get_document),
+            ("GET", re.compile(r"^/api/documents/(\d+)/file$"), self.get_file),
+            ("GET", re.compile(r"^/api/documents/(\d+)/preview$"), self.get_preview),
+            ("GET", re.compile(r"^/api/search$"), self.search),
+            ("GET", re.compile(r"^/api/jobs/(\d+)$"), self.get_job),
+        ]
+
+    async def start(self):
+        self.upload_dir.mkdir(exist_ok=True)
+        Path(self.preview_dir).mkdir(exist_ok=True)
+        self._connections = asyncio.Semaphore(self.max_connections)
+        self._preview_pool = ProcessPoolExecutor(max_workers=self.preview_workers)
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port,
+                                                  limit=MAX_HEADER_SIZE)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.ingest.start()
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            # Соединения keep-alive ждут следующего запроса: их обработчики прерываются
+            for task in list(self._tasks):
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            await self._server.wait_closed()
+        await asyncio.to_thread(self.ingest.stop, 5)
+        if self._preview_pool:
+            self._preview_pool.shutdown(wait=False, cancel_futures=True)
+        self.adb.close()
+        self.db.close()
+
+    # --- HTTP ---
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        async with self._connections:
+            try:
+                while True:
+                    try:
+                        request = await asyncio.wait_for(self._read_request(reader), self.keepalive_timeout)
+                    except HTTPError as e:
+                        await self._send(writer, error_response(e), keep_alive=False)
+                        break
+                    except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                        break
+                    if request is None:
+                        break
+                    response = await self._respond(request)
+                    # Непрочитанное тело не дает разобрать следующий запрос
+                    keep_alive = request.keep_alive and request.body_consumed
+                    await self._send(writer, response, keep_alive, head=request.method == "HEAD")
+                    if not keep_alive:
+                        break
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+                with contextlib.suppress(ConnectionError, asyncio.CancelledError):
+                    await writer.wait_closed()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if not e.partial.strip():
+                return None  # клиент закрыл соединение между запросами
+            raise HTTPError(400, "Неполный заголовок запроса")
+        except asyncio.LimitOverrunError:
+            raise HTTPError(431)
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            raise HTTPError(400, "Неверная строка запроса")
+        headers = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, sep, value = line.partition(":")
+            if not sep:
+                raise HTTPError(400, "Неверный заголовок")
+            headers[name.strip().lower()] = value.strip()
+        return Request(method.upper(), target, version, headers, reader, self.body_timeout)
+
+    async def _respond(self, request: Request) -> Response:
+        try:
+            handler, args = self._route(request)
+            if handler.__name__ in STREAMING_HANDLERS:
+                # Тело ограничено body_timeout, остальное обработчик ограничивает сам
+                return await handler(request, *args)
+            return await asyncio.wait_for(handler(request, *args), self.request_timeout)
+        except HTTPError as e:
+            return error_response(e)
+        except asyncio.TimeoutError:
+            return error_response(HTTPError(503, "Превышено время обработки запроса"))
+        except Exception as e:
+            print(f"Ошибка при обработке {request.method} {request.path}: {e}")
+            return error_response(HTTPError(500))
+
+    def _route(self, request: Request):
+        method = "GET" if request.method == "HEAD" else request.method
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(request.path)
+            if not match:
+                continue
+            if route_method == method:
+                return handler, match.groups()
+            allowed = True
+        raise HTTPError(405 if allowed else 404)
+
+    async def _send(self, writer: asyncio.StreamWriter, response: Response,
+                    keep_alive: bool, head: bool = False):
+        try:
+            headers = dict(response.headers)
+            if response.status != 304:
+                headers.setdefault("Content-Length", str(response.length))
+            headers["Connection"] = "keep-alive" if keep_alive else "close"
+            lines = [f"HTTP/1.1 {response.status} {REASONS.get(response.status, '')}"]
+            lines += [f"{name}: {value}" for name, value in headers.items()]
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+            if head:
+                await writer.drain()
+            elif response.file is not None:
+                await writer.drain()
+                # os.sendfile, если транспорт позволяет; иначе asyncio читает файл сам
+                await asyncio.get_running_loop().sendfile(
+                    writer.transport, response.file, response.offset, response.count)
+            else:
+                writer.write(response.body)
+                await writer.drain()
+        finally:
+            response.close()
+
+    # --- обработчики ---
+
+    async def list_folders(self, request: Request) -> Response:
+        folders = await self.adb.get_folders()
+        return json_response({"folders": folders})
+
+    async def list_documents(self, request: Request) -> Response:
+        limit = request.int_param("limit", 50, minimum=1, maximum=MAX_PAGE_SIZE)
+        after = request.int_param("after", 0)
+        recursive = request.query.get("recursive", "0") in ("1", "true", "yes")
+        documents = await self.adb.get_documents_page(request.folder_param(), limit, after, recursive)
+        return json_response({
+            "documents": documents,
+            "next_after": documents[-1]["id"] if len(documents) == limit else None,
+        })
+
+    async def get_document(self, request: Request, doc_id: str) -> Response:
+        document = await self.adb.get_document(int(doc_id))
+        if document is None:
+            raise HTTPError(404, "Документ не найден")
+        return json_response(document)
+
+    async def search(self, request: Request) -> Response:
+        query = request.query.get("q", "").strip()
+        if not query:
+            raise HTTPError(400, "Не задан параметр q")
+        limit = request.int_param("limit", 100, minimum=1, maximum=MAX_PAGE_SIZE)
+        documents = await self.adb.search_documents(query, request.folder_param(), limit)
+        return json_response({"documents": documents})
+
+    async def _document_file(self, doc_id: str):
+        """Документ и stat его файла; 404, если того или другого нет"""
+        document = await self.adb.get_document(int(doc_id))
+        if document is None or not document["file_path"]:
+            raise HTTPError(404, "Документ не найден")
+        try:
+            stat = await asyncio.to_thread(os.stat, document["file_path"])
+        except OSError:
+            raise HTTPError(404, "Файл документа не найден")
+        return document, stat
+
+    @staticmethod
+    def _version(document, stat: os.stat_result) -> str:
+        """Версия содержимого файла для ETag: хэш из БД, пока размер файла с ним согласуется.
+
+        Для документов без хэша (или файла, измененного в обход архива) -
+        по времени изменения и размеру.
+        """
+        if document["content_hash"] and document["file_size"] == stat.st_size:
+            return document["content_hash"]
+        return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+    async def get_file(self, request: Request, doc_id: str) -> Response:
+        document, stat = await self._document_file(doc_id)
+        file_path = document["file_path"]
+        etag = f'"{self._version(document, stat)}"'
+        content_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+        headers = {"Content-Disposition": f"inline; filename*=UTF-8''{quote(Path(file_path).name)}"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return content_response(request, etag, stat.st_size, content_type, headers=headers)
+        try:
+            file = await asyncio.to_thread(open, file_path, "rb")
+        except OSError:
+            raise HTTPError(404, "Файл документа не найден")
+        # Размер по открытому файлу: он мог измениться после stat
+        size = os.fstat(file.fileno()).st_size
+        return content_response(request, etag, size, content_type, file=file, headers=headers)
+
+    async def get_preview(self, request: Request, doc_id: str) -> Response:
+        document, stat = await self._document_file(doc_id)
+        file_path = document["file_path"]
+        # Превью определяется содержимым файла; у клиента с тем же ETag оно
+        # уже есть, и генерировать или читать его не нужно
+        etag = f'"p-{self._version(document, stat)}"'
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return content_response(request, etag, 0, "image/png")
+        key = (file_path, stat.st_mtime_ns, stat.st_size)
+        data = await self.previews.get(key, lambda: self._render_preview(file_path, stat.st_mtime))
+        if data is None:
+            raise HTTPError(404, "Превью для этого формата не поддерживается")
+        return content_response(request, etag, len(data), "image/png", body=data)
+
+    async def _render_preview(self, file_path: str, source_mtime: float) -> Optional[bytes]:
+        from document_processor import DEFAULT_PREVIEW, ERROR_PREVIEW, render_preview
+
+        # Превью на диске от прежней версии файла пересоздается
+        stored = Path(self.preview_dir) / f"{Path(file_path).stem}_preview.png"
+        force = stored.exists() and stored.stat().st_mtime < source_mtime
+        loop = asyncio.get_running_loop()
+        preview = await loop.run_in_executor(self._preview_pool, render_preview,
+                                             file_path, self.preview_dir, force)
+        if preview == str(DEFAULT_PREVIEW):
+            return None
+        if preview == str(ERROR_PREVIEW):
+            raise HTTPError(500, "Не удалось создать превью")
+        return await asyncio.to_thread(Path(preview).read_bytes)
+
+    async def upload_document(self, request: Request) -> Response:
+        filename = Path(request.query.get("filename") or request.headers.get("x-filename", "")).name
+        if not filename:
+            raise HTTPError(400, "Не задано имя файла (filename)")
+        if "content-length" not in request.headers:
+            raise HTTPError(411)
+        if request.content_length > self.max_upload:
+            raise HTTPError(413, f"Файл больше {self.max_upload // 1024 // 1024} МБ")
+
+        # Уникальное имя: под ним файл попадет и в document_files
+        upload_path = self.upload_dir / f"{uuid.uuid4().hex[:12]}_{filename}"
+        partial = upload_path.with_name(upload_path.name + ".part")
+        try:
+            await self._receive_file(request, partial)
+            await asyncio.to_thread(os.replace, partial, upload_path)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        return await asyncio.wait_for(self._enqueue_upload(request, filename, upload_path),
+                                      self.request_timeout)
+
+    @staticmethod
+    async def _receive_file(request: Request, path: Path):
+        """Запись тела запроса в файл; диск занят в потоке, а не в цикле событий"""
+        f = await asyncio.to_thread(open, path, "wb")
+        try:
+            # Фрагменты из сокета мелкие: пишем блоками не меньше BODY_CHUNK_SIZE
+            buffer = bytearray()
+            async for chunk in request.iter_body():
+                buffer += chunk
+                if len(buffer) >= BODY_CHUNK_SIZE:
+                    await asyncio.to_thread(f.write, bytes(buffer))
+                    buffer.clear()
+            if buffer:
+                await asyncio.to_thread(f.write, bytes(buffer))
+        finally:
+            await asyncio.to_thread(f.close)
+
+    async def _enqueue_upload(self, request: Request, filename: str, upload_path: Path) -> Response:
+        tags = [tag for tag in request.query.get("tags", "").split(",") if tag.strip()]
+        payload = {
+            "title": request.query.get("title") or Path(filename).stem,
+            "description": request.query.get("description", ""),
+            "folder_path": request.folder_param() or "/",
+            "status": request.query.get("status", "Активный"),
+            "author": request.query.get("author", "api"),
+            "cabinet": request.query.get("cabinet"),
+            "shelf": request.query.get("shelf"),
+            "box": request.query.get("box"),
+            "tags": tags,
+        }
+        job_id = await self.adb.run_write(self.ingest.enqueue, str(upload_path), payload)
+        if job_id is None:
+            upload_path.unlink(missing_ok=True)
+            raise HTTPError(500, "Не удалось поставить файл в очередь")
+        return json_response({"job_id": job_id}, 202)
+
+    async def get_job(self, request: Request, job_id: str) -> Response:
+        job = await self.adb.get_ingest_job(int(job_id))
+        if job is None:
+            raise HTTPError(404, "Задание не найдено")
+        # Пути на сервере и сведения об аренде клиенту не нужны
+        return json_response({key: job[key] for key in JOB_FIELDS})
+
+    def _on_job_done(self, job: Dict):
+        """Загруженный файл больше не нужен: документ ссылается на копию"""
+        Path(job["source_path"]).unlink(missing_ok=True)
+
+
+async def run(args):
+    server = ArchiveServer(
+        db_path=args.db, host=args.host, port=args.port, readers=args.readers,
+        preview_workers=args.preview_workers, preview_cache_mb=args.preview_cache_mb,
+        max_upload_mb=args.max_upload_mb, max_connections=args.max_connections,
+    )
+    await server.start()
+    print(f"API архива: http://{server.host}:{server.port}/api/")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="archive.db")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="адрес; 0.0.0.0 открывает доступ из сети (без авторизации)")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--readers", type=int, default=8, help="потоков чтения из БД")
+    parser.add_argument("--preview-workers", type=int, default=2, help="процессов генерации превью")
+    parser.add_argument("--preview-cache-mb", type=int, default=64)
+    parser.add_argument("--max-upload-mb", type=int, default=512)
+    parser.add_argument("--max-connections", type=int, default=256)
+    args = parser.parse_args()
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
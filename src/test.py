@@ -1,3 +1,6 @@
+import argparse
+import asyncio
+import functools
 import flet as ft
 from datetime import datetime
 import os
@@ -9,6 +12,22 @@ import tempfile
 from PIL import Image
 import io
 from database import DatabaseManager
+from instrumentation import DatabaseInstrumentation
+from async_database import AsyncDatabaseManager
+from ingest import IngestWorker
+from purge import PurgeWorker
+from exporter import DocumentExporter
+from document_processor import DocumentProcessor
+from metrics import MetricsServer, UI_REFRESH_SECONDS, observe_database, observe_processor
+from profiling import MODES as PROFILE_MODES, SessionProfiler
+
+# Обработчики, профилируемые при запуске с --profile
+PROFILED_HANDLERS = (
+    "authenticate", "create_main_ui", "select_folder", "search_documents", "filter_documents",
+    "update_documents_list", "update_folder_tree", "refresh_ui", "show_preview",
+    "show_document_preview", "show_pdf_preview", "add_document", "edit_document",
+    "export_dialog", "show_admin_panel", "on_ingest_job_done",
+)
 
 @dataclass
 class Document:
@@ -125,6 +144,7 @@ class FolderTree:
         is_expanded = path in self.expanded_paths
         is_selected = path == self.app.current_folder
         has_subfolders = bool(self.app.folders[path]["subfolders"])
+        stats = self.app.folder_stats.get(path, {})
         
         def toggle_expand(e):
             if path in self.expanded_paths:
@@ -173,6 +193,14 @@ class FolderTree:
                     color=text_color,
                     weight=text_weight,
                 ),
+                ft.Text(
+                    str(stats.get("total_documents", 0)),
+                    size=12,
+                    color=text_color or ft.colors.GREY_500,
+                    tooltip=f"Документов: {stats.get('documents', 0)}, "
+                            f"с подпапками: {stats.get('total_documents', 0)}, "
+                            f"объем: {self.app.format_size(stats.get('total_bytes', 0))}",
+                ),
                 ft.IconButton(
                     icon=ft.icons.MORE_VERT,
                     icon_size=16,
@@ -199,14 +227,20 @@ class FolderTree:
         )
 
 class ArchiveApp:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, metrics_port: Optional[int] = None):
+        # Статистика запросов для панели администратора; медленные - в slow_queries.log
+        self.db = DatabaseManager(instrumentation=DatabaseInstrumentation(slow_log_path="slow_queries.log"))
+        # Запросы из асинхронных обработчиков не блокируют цикл событий
+        self.async_db = AsyncDatabaseManager(self.db)
+        self.processor = DocumentProcessor()
+        self.exporter = DocumentExporter(self.db)
         self.current_user = None
         self.current_folder = None
         self.folder_tree = None
         self.preview_panel = None
         self.current_document = None
         self.folders = {}
+        self.folder_stats = {}
         self.documents = {}
         
         # Добавляем атрибуты для работы с файлами
@@ -231,6 +265,18 @@ class ArchiveApp:
         # Добавляем атрибут для хранения путей к временным файлам
         self.temp_files = set()
 
+        # Очередь загрузки документов (переживает перезапуск приложения)
+        self.ingest_worker = IngestWorker(self.db, on_job_done=self.on_ingest_job_done)
+        # Окончательное удаление документов из корзины по истечении срока хранения
+        self.purge_worker = PurgeWorker(self.db)
+
+        # Метрики для Prometheus на localhost (только при заданном порте)
+        self.metrics_server = None
+        if metrics_port is not None:
+            observe_database(self.db)
+            observe_processor(self.processor)
+            self.metrics_server = MetricsServer(port=metrics_port)
+
     def authenticate(self, username: str, password: str) -> bool:
         """Аутентификация пользователя"""
         print("Начало аутентификации")  # Отладка
@@ -320,7 +366,8 @@ class ArchiveApp:
                         icon=ft.icons.ADD,
                         tooltip="Добавить документ",
                         on_click=lambda _: self.add_document_dialog()
-                    )
+                    ),
+                    self.add_export_button()
                 ]),
                 self.create_search_bar(),
                 ft.Divider(),
@@ -540,8 +587,8 @@ class ArchiveApp:
     def text_preview(self, file_path: str) -> ft.Container:
         """Превью текстового документа"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read(1000)  # Читаем первые 1000 символов
+            # Декодируем только первые 1000 символов из отображенного в память файла
+            content = self.processor.read_text_prefix(file_path, 1000)
             return ft.Container(
                 content=ft.Text(content + "..." if len(content) == 1000 else content),
                 bgcolor=ft.colors.SURFACE_VARIANT,
@@ -870,65 +917,38 @@ class ArchiveApp:
             e.control.bgcolor = None
         e.control.update()
 
-    async def add_document(self, e):
-        """Добавление документа с асинхронной обработкой"""
-        print("Начало добавления документа")  # Отладочный вывод
-        
+    def add_document(self, e):
+        """Добавление документа: копирование и запись в БД выполняет очередь загрузки"""
         if not self._validate_document_input():
             return
 
         try:
-            # Создаем директорию для файлов, если её нет
-            files_dir = Path("document_files")
-            files_dir.mkdir(exist_ok=True)
-
-            # Получаем имя исходного файла и создаем путь для нового файла
-            source_file_path = Path(self.selected_file_path)
-            new_file_path = files_dir / source_file_path.name
-            
-            print(f"Копирование файла из {self.selected_file_path} в {new_file_path}")
-            
-            # Копируем файл
-            import shutil
-            shutil.copy2(self.selected_file_path, new_file_path)
-            
-            # Создаем процессор документов
-            processor = DocumentProcessor()
-            
-            # Асинхронная обработка документа
-            processing_result = await processor.process_document(str(new_file_path))
-            
-            print("Добавление документа в БД")  # Отладочный вывод
-            
-            # Добавляем документ в БД с дополнительными данными
-            success = self.db.add_document(
-                title=self.title_field.value,
-                description=self.description_field.value,
-                file_path=str(new_file_path),
-                folder_path=self.current_folder,
-                status=self.status_dropdown.value,
-                author=self.current_user.username,
-                cabinet=self.cabinet_field.value,
-                shelf=self.shelf_field.value,
-                box=self.box_field.value,
-                tags=[]
-            )
-            
-            if success:
-                print("Документ успешно добавлен")
+            job_id = self.ingest_worker.enqueue(self.selected_file_path, {
+                "title": self.title_field.value,
+                "description": self.description_field.value,
+                "folder_path": self.current_folder,
+                "status": self.status_dropdown.value,
+                "author": self.current_user.username,
+                "cabinet": self.cabinet_field.value,
+                "shelf": self.shelf_field.value,
+                "box": self.box_field.value,
+                "tags": []
+            })
+
+            if job_id:
+                print(f"Документ поставлен в очередь, задание {job_id}")
                 # Закрываем диалог
                 for dlg in self.page.overlay:
                     if isinstance(dlg, ft.AlertDialog):
                         dlg.open = False
                 self.page.update()
-                self.update_documents_list()
-                self.show_snack_bar("Документ успешно добавлен")
+                self.show_snack_bar("Документ поставлен в очередь на загрузку")
             else:
-                print("Ошибка при добавлении документа в БД")  # Отладочный вывод
+                print("Ошибка при постановке документа в очередь")
                 self.show_error("Ошибка при добавлении документа")
-                
+
         except Exception as e:
-            print(f"Ошибка при добавлении документа: {e}")  # Отладочный вывод
+            print(f"Ошибка при добавлении документа: {e}")
             self.show_error(f"Ошибка при добавлении документа: {str(e)}")
 
     def _validate_document_input(self) -> bool:
@@ -961,6 +981,7 @@ class ArchiveApp:
         self.status_dropdown.update()
         self.selected_file_name.update()
 
+    @UI_REFRESH_SECONDS.time("documents_list")
     def update_documents_list(self):
         """Обновление списка документов"""
         try:
@@ -988,12 +1009,25 @@ class ArchiveApp:
 
     def delete_document(self, doc):
         """Удаление документа"""
-        def confirm_delete(e):
-            if self.db.delete_document(doc["id"]):
+        async def undo_delete(e):
+            if await self.async_db.restore_document(doc["id"]):
+                await asyncio.to_thread(self.update_documents_list)
+                self.show_snack_bar("Документ восстановлен")
+
+        async def confirm_delete(e):
+            # Документ перемещается в корзину; файл удаляется фоновой очисткой
+            if await self.async_db.delete_document(doc["id"]):
                 dialog.open = False
                 self.page.update()
-                self.update_documents_list()
-                self.show_snack_bar("Документ успешно удален")
+                await asyncio.to_thread(self.update_documents_list)
+                snack = ft.SnackBar(
+                    content=ft.Text("Документ удален"),
+                    action="Отменить",
+                    on_action=undo_delete
+                )
+                self.page.overlay.append(snack)
+                snack.open = True
+                self.page.update()
             else:
                 self.show_error("Ошибка при удалении документа")
         
@@ -1018,6 +1052,7 @@ class ArchiveApp:
         snack.open = True
         self.page.update()
 
+    @UI_REFRESH_SECONDS.time("select_folder")
     def select_folder(self, folder_path: str):
         """Выбор папки"""
         # Обновляем текущую папку
@@ -1029,31 +1064,93 @@ class ArchiveApp:
         self.page.update()
 
     def add_export_button(self):
-        def export_to_file(e):
-            current_docs = self.documents.get(self.current_folder, [])
-            if not current_docs:
-                self.show_error("Нет документов для экспорта")
-                return
-            
-            export_text = "Список документов:\n\n"
-            for doc in current_docs:
-                export_text += f"Название: {doc.title}\n"
-                export_text += f"Описание: {doc.description}\n"
-                export_text += f"Статус: {doc.status}\n"
-                export_text += f"Дата: {doc.date_added}\n"
-                export_text += f"Теги: {', '.join(doc.tags) if doc.tags else 'Нет'}\n"
-                export_text += "-" * 50 + "\n"
-            
-            with open("documents_export.txt", "w", encoding="utf-8") as f:
-                f.write(export_text)
-            
-            self.show_snack_bar("Документы экспортированы в файл documents_export.txt")
-        
-        return ft.ElevatedButton(
-            "Экспорт документов",
+        return ft.IconButton(
             icon=ft.icons.DOWNLOAD,
-            on_click=export_to_file
+            tooltip="Экспорт документов",
+            on_click=lambda _: self.export_dialog()
+        )
+
+    def export_dialog(self):
+        """Диалог выгрузки документов текущей папки в файл"""
+        if not self.current_folder:
+            self.show_error("Выберите папку для экспорта")
+            return
+
+        format_dropdown = ft.Dropdown(
+            label="Формат",
+            value="csv",
+            options=[
+                ft.dropdown.Option("csv", "CSV"),
+                ft.dropdown.Option("jsonl", "JSON Lines"),
+                ft.dropdown.Option("xlsx", "Excel (XLSX)"),
+            ],
+        )
+        recursive_checkbox = ft.Checkbox(label="Включая вложенные папки", value=True)
+        gzip_checkbox = ft.Checkbox(label="Сжать (gzip)", value=False)
+        progress = ft.ProgressBar(width=400, value=0, visible=False)
+        progress_text = ft.Text("", size=12, color=ft.colors.GREY_700)
+        task = None
+
+        def on_progress(done, total):
+            progress.value = done / total if total else None
+            progress_text.value = f"Выгружено {done} из {total}"
+            self.page.update()
+
+        def on_done(finished):
+            dialog.open = False
+            self.page.update()
+            if finished.cancelled:
+                self.show_snack_bar("Экспорт отменен")
+            elif finished.error:
+                self.show_error(f"Ошибка при экспорте: {finished.error}")
+            else:
+                self.show_snack_bar(f"Экспортировано документов: {finished.count} в {finished.target}")
+
+        def start_export(e):
+            nonlocal task
+            fmt = format_dropdown.value
+            compress = gzip_checkbox.value and fmt != "xlsx"
+            name = (self.db.get_folder_name(self.current_folder) or "documents").replace("/", "_")
+            stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            target = Path("exports") / f"{name}_{stamp}.{fmt}{'.gz' if compress else ''}"
+            progress.visible = True
+            start_button.disabled = True
+            self.page.update()
+            task = self.exporter.start(
+                target,
+                on_done=on_done,
+                fmt=fmt,
+                folder=self.current_folder,
+                recursive=recursive_checkbox.value,
+                compress=compress,
+                on_progress=on_progress,
+            )
+
+        def close_dialog(e):
+            if task is not None:
+                task.cancel()
+            dialog.open = False
+            self.page.update()
+
+        start_button = ft.TextButton("Экспорт", on_click=start_export)
+        dialog = ft.AlertDialog(
+            title=ft.Text("Экспорт документов"),
+            content=ft.Column([
+                format_dropdown,
+                recursive_checkbox,
+                gzip_checkbox,
+                progress,
+                progress_text,
+            ], tight=True, spacing=10),
+            actions=[
+                ft.TextButton("Отмена", on_click=close_dialog),
+                start_button,
+            ],
+            actions_alignment=ft.MainAxisAlignment.END
         )
+        self.page.overlay.append(dialog)
+        dialog.open = True
+        self.page.update()
 
     def add_sort_dropdown(self):
         def on_sort_change(e):
@@ -1133,17 +1230,17 @@ class ArchiveApp:
             dialog.open = False
             self.page.update()
 
-        def add_folder(e):
+        async def add_folder(e):
             name = name_field.value.strip()
             if not name:
                 self.show_error("Введите название папки")
                 return
                 
             path = f"/{name}"
-            if self.db.add_folder(name, path):
+            if await self.async_db.add_folder(name, path):
                 dialog.open = False
                 self.page.update()
-                self.refresh_ui()
+                await asyncio.to_thread(self.refresh_ui)
                 self.show_snack_bar("Папка успешно создана")
             else:
                 self.show_error("Ошибка при создании папки")
@@ -1178,7 +1275,7 @@ class ArchiveApp:
             dialog.open = False
             self.page.update()
 
-        def create_folder(e):
+        async def create_folder(e):
             folder_name = folder_name_field.value.strip()
             if not folder_name:
                 self.show_error("Введите имя папки")
@@ -1187,10 +1284,10 @@ class ArchiveApp:
             # Создаем путь для новой папки
             new_path = f"{parent_path}/{folder_name}".replace("//", "/")
             
-            if self.db.add_folder(folder_name, new_path, parent_path):
+            if await self.async_db.add_folder(folder_name, new_path, parent_path):
                 dialog.open = False
                 self.page.update()
-                self.update_folder_tree()
+                await asyncio.to_thread(self.update_folder_tree)
                 self.show_snack_bar(f"Папка '{folder_name}' создана")
             else:
                 self.show_error("Папка с таким именем уже существует")
@@ -1218,6 +1315,7 @@ class ArchiveApp:
         dialog.open = True
         self.page.update()
 
+    @UI_REFRESH_SECONDS.time("folder_tree")
     def update_folder_tree(self):
         """Обновление дерева папок"""
         print("Начало обновления дерева папок")
@@ -1234,6 +1332,8 @@ class ArchiveApp:
         
         # Перезагружаем папки из базы данных
         self.folders = self.db.get_folders()
+        # Количество и объем документов для всех папок одним запросом
+        self.folder_stats = self.db.get_folder_tree_stats()
         print(f"Папки при обновлении дерева: {self.folders}")  # Отладка
         
         if hasattr(self, 'folder_list') and self.folder_tree:
@@ -1245,15 +1345,31 @@ class ArchiveApp:
     def main(self, page: ft.Page):
         self.page = page
         page.title = "AVS-Архив"
+        # Запускаем обработку очереди, в том числе незавершенных заданий
+        self.ingest_worker.start()
+        self.purge_worker.start()
+        if self.metrics_server:
+            self.metrics_server.start()
         self.show_login_dialog()
 
+    def on_ingest_job_done(self, job: Dict):
+        """Обработка завершения задания загрузки (вызывается из потока очереди)"""
+        if not hasattr(self, 'page'):
+            return
+        if job["state"] == "committed":
+            if job["payload"].get("folder_path") == self.current_folder:
+                self.update_documents_list()
+            self.show_snack_bar(f"Документ '{job['payload']['title']}' добавлен")
+        else:
+            self.show_error(f"Не удалось загрузить документ: {job.get('last_error')}")
+
     def rename_folder_dialog(self, folder_path: str):
         """Диалог переименования папки"""
         def close_dialog(e):
             dialog.open = False
             self.page.update()
 
-        def rename_folder(e):
+        async def rename_folder(e):
             new_name = name_field.value.strip()
             if not new_name:
                 self.show_error("Введите имя папки")
@@ -1264,10 +1380,10 @@ class ArchiveApp:
                 parent_path = "/"
             new_path = f"{parent_path}/{new_name}".replace("//", "/")
             
-            if self.db.rename_folder(folder_path, new_name, new_path):
+            if await self.async_db.rename_folder(folder_path, new_name, new_path):
                 dialog.open = False
                 self.page.update()
-                self.update_folder_tree()
+                await asyncio.to_thread(self.update_folder_tree)
                 self.show_snack_bar(f"Папка переименована в '{new_name}'")
             else:
                 self.show_error("Ошибка при переименовании папки")
@@ -1300,14 +1416,14 @@ class ArchiveApp:
             dialog.open = False
             self.page.update()
 
-        def delete_folder(e):
-            if self.db.delete_folder(folder_path):
+        async def delete_folder(e):
+            if await self.async_db.delete_folder(folder_path):
                 dialog.open = False
                 self.page.update()
-                self.update_folder_tree()
+                await asyncio.to_thread(self.update_folder_tree)
                 self.show_snack_bar("Папка удалена")
             else:
-                self.show_error("Нельзя удалить папку с документами или подпапками")
+                self.show_error("Нельзя удалить папку с документами (в том числе в корзине) или подпапками")
 
         dialog = ft.AlertDialog(
             modal=True,
@@ -1445,54 +1561,6 @@ class ArchiveApp:
                 dialog.update()
                 print(f"Выбран файл: {self.selected_file_path}")
 
-        def add_document_sync(e):
-            """Синхронная обертка для асинхронного метода add_document"""
-            if not self._validate_document_input():
-                return
-
-            try:
-                # Создаем директорию для файлов, если её нет
-                files_dir = Path("document_files")
-                files_dir.mkdir(exist_ok=True)
-
-                # Получаем имя исходного файла и создаем путь для нового файла
-                source_file_path = Path(self.selected_file_path)
-                new_file_path = files_dir / source_file_path.name
-                
-                print(f"Копирование файла из {self.selected_file_path} в {new_file_path}")
-                
-                # Копируем файл
-                import shutil
-                shutil.copy2(self.selected_file_path, new_file_path)
-                
-                # Добавляем документ в БД
-                success = self.db.add_document(
-                    title=self.title_field.value,
-                    description=self.description_field.value,
-                    file_path=str(new_file_path),
-                    folder_path=self.current_folder,
-                    status=self.status_dropdown.value,
-                    author=self.current_user.username,
-                    cabinet=self.cabinet_field.value,
-                    shelf=self.shelf_field.value,
-                    box=self.box_field.value,
-                    tags=[]
-                )
-                
-                if success:
-                    print("Документ успешно добавлен")
-                    dialog.open = False
-                    self.page.update()
-                    self.update_documents_list()
-                    self.show_snack_bar("Документ успешно добавлен")
-                else:
-                    print("Ошибка при добавлении документа в БД")
-                    self.show_error("Ошибка при добавлении документа")
-                    
-            except Exception as e:
-                print(f"Ошибка при добавлении документа: {e}")
-                self.show_error(f"Ошибка при добавлении документа: {str(e)}")
-
         # Создаем поля формы
         self.title_field = ft.TextField(
             label="Название документа",
@@ -1580,7 +1648,7 @@ class ArchiveApp:
             ], spacing=10),
             actions=[
                 ft.TextButton("Отмена", on_click=close_dialog),
-                ft.TextButton("Добавить", on_click=add_document_sync)
+                ft.TextButton("Добавить", on_click=self.add_document)
             ],
             actions_alignment=ft.MainAxisAlignment.END
         )
@@ -1780,10 +1848,10 @@ class ArchiveApp:
             dialog.open = False
             self.page.update()
 
-        def save_changes(e):
+        async def save_changes(e):
             try:
                 # Обновляем документ в базе данных
-                success = self.db.update_document(
+                success = await self.async_db.update_document(
                     doc["id"],
                     title=self.title_field.value,
                     description=self.description_field.value,
@@ -1796,8 +1864,8 @@ class ArchiveApp:
                 if success:
                     dialog.open = False
                     self.page.update()
-                    self.update_documents_list()
-                    self.show_document_preview(self.db.get_document(doc["id"]))
+                    await asyncio.to_thread(self.update_documents_list)
+                    self.show_document_preview(await self.async_db.get_document(doc["id"]))
                     self.show_snack_bar("Документ успешно обновлен")
                 else:
                     self.show_error("Ошибка при обновлении документа")
@@ -1900,6 +1968,7 @@ class ArchiveApp:
             spacing=10,
         )
 
+    @UI_REFRESH_SECONDS.time("search")
     def search_documents(self, query: str):
         """Выполнение поиска и обновление списка документов"""
         try:
@@ -1960,11 +2029,11 @@ class ArchiveApp:
             self.page.update()
             self.add_user_dialog()
 
-        def delete_user(e, username):
-            if self.db.delete_user(username):
+        async def delete_user(e, username):
+            if await self.async_db.delete_user(username):
                 self.show_snack_bar("Пользователь удален")
                 # Получаем актуальный список пользователей
-                users = self.db.get_all_users()
+                users = await self.async_db.get_all_users()
                 users_list.controls.clear()
                 for user in users:
                     if user["username"] != "admin":  # Не показываем админа в списке
@@ -1976,7 +2045,7 @@ class ArchiveApp:
                                 trailing=ft.IconButton(
                                     icon=ft.icons.DELETE,
                                     icon_color=ft.colors.RED_400,
-                                    on_click=lambda e, u=user: delete_user(e, u["username"])
+                                    on_click=functools.partial(delete_user, username=user["username"])
                                 ),
                             )
                         )
@@ -1984,6 +2053,52 @@ class ArchiveApp:
             else:
                 self.show_error("Ошибка при удалении пользователя")
 
+        # Счетчики читаются из archive_stats одним запросом
+        stats = self.db.get_archive_stats()
+        status_lines = [
+            ft.Text(f"{status}: {values['documents']} ({self.format_size(values['bytes'])})")
+            for status, values in sorted(stats["by_status"].items())
+        ]
+        top_authors = sorted(stats["by_author"].items(), key=lambda item: -item[1]["documents"])[:10]
+        author_lines = [
+            ft.Text(f"{author}: {values['documents']}")
+            for author, values in top_authors
+        ]
+
+        # Время вызовов DatabaseManager с момента запуска или сброса
+        db_stats = self.db.stats()
+        performance_lines = []
+        if db_stats["enabled"]:
+            top_methods = sorted(db_stats["methods"].items(), key=lambda item: -item[1]["total_ms"])[:10]
+            performance_lines.extend(
+                ft.Text(
+                    f"{name}: {values['calls']} выз., среднее {values['avg_ms']:.1f} мс, "
+                    f"макс. {values['max_ms']:.1f} мс, строк {values['rows']}"
+                )
+                for name, values in top_methods
+            )
+            slow = db_stats["slow_queries"][-10:]
+            if slow:
+                performance_lines.append(
+                    ft.Text(f"Медленные запросы (от {db_stats['slow_threshold_ms']:.0f} мс)",
+                            weight=ft.FontWeight.BOLD)
+                )
+            for entry in reversed(slow):
+                sql = entry["sql"] if len(entry["sql"]) <= 120 else entry["sql"][:117] + "..."
+                performance_lines.append(
+                    ft.Text(f"{entry['time']} {entry['method']}: {entry['ms']:.0f} мс - {sql}",
+                            size=12, selectable=True)
+                )
+        else:
+            performance_lines.append(ft.Text("Статистика запросов отключена"))
+
+        def reset_db_stats(e):
+            self.db.reset_stats()
+            performance_column.controls = [ft.Text("Статистика сброшена")]
+            dialog.update()
+
+        performance_column = ft.Column(performance_lines, spacing=5)
+
         # Создаем список пользователей
         users_list = ft.ListView(expand=1, spacing=10, padding=20)
         users = self.db.get_all_users()
@@ -1997,7 +2112,7 @@ class ArchiveApp:
                         trailing=ft.IconButton(
                             icon=ft.icons.DELETE,
                             icon_color=ft.colors.RED_400,
-                            on_click=lambda e, u=user: delete_user(e, u["username"])
+                            on_click=functools.partial(delete_user, username=user["username"])
                         ),
                     )
                 )
@@ -2021,10 +2136,24 @@ class ArchiveApp:
                     ft.Text("Системная информация", size=20, weight=ft.FontWeight.BOLD),
                 ]),
                 ft.Column([
-                    ft.Text(f"Всего документов: {self.db.get_documents_count()}"),
-                    ft.Text(f"Всего папок: {self.db.get_folders_count()}"),
-                    ft.Text(f"Всего пользователей: {self.db.get_users_count()}"),
+                    ft.Text(f"Всего документов: {stats['documents']}"),
+                    ft.Text(f"Всего папок: {stats['folders']}"),
+                    ft.Text(f"Всего пользователей: {stats['users']}"),
+                    ft.Text(f"Объем файлов: {self.format_size(stats['bytes'])}"),
                 ], spacing=10),
+                ft.Text("Документы по статусам", size=16, weight=ft.FontWeight.BOLD),
+                ft.Column(status_lines, spacing=5),
+                ft.Text("Документы по авторам", size=16, weight=ft.FontWeight.BOLD),
+                ft.Column(author_lines, spacing=5),
+                ft.Row([
+                    ft.Text("Производительность БД", size=16, weight=ft.FontWeight.BOLD),
+                    ft.IconButton(
+                        icon=ft.icons.RESTART_ALT,
+                        tooltip="Сбросить статистику",
+                        on_click=reset_db_stats
+                    ),
+                ]),
+                performance_column,
             ], scroll=ft.ScrollMode.AUTO, height=400),
             actions=[
                 ft.TextButton("Закрыть", on_click=close_dialog),
@@ -2036,13 +2165,22 @@ class ArchiveApp:
         dialog.open = True
         self.page.update()
 
+    @staticmethod
+    def format_size(size: int) -> str:
+        """Размер в байтах в удобочитаемом виде"""
+        for unit in ("Б", "КБ", "МБ", "ГБ"):
+            if size < 1024:
+                return f"{size:.0f} {unit}" if unit == "Б" else f"{size:.1f} {unit}"
+            size /= 1024
+        return f"{size:.1f} ТБ"
+
     def add_user_dialog(self):
         """Диалог добавления нового пользователя"""
         def close_dialog(e):
             dialog.open = False
             self.page.update()
 
-        def add_user(e):
+        async def add_user(e):
             username = username_field.value
             password = password_field.value
             role = role_dropdown.value
@@ -2051,7 +2189,7 @@ class ArchiveApp:
                 self.show_error("Заполните все поля")
                 return
 
-            if self.db.add_user(username, password, role):
+            if await self.async_db.add_user(username, password, role):
                 dialog.open = False
                 self.page.update()
                 self.show_snack_bar("Пользователь успешно добавлен")
@@ -2098,6 +2236,7 @@ class ArchiveApp:
         dialog.open = True
         self.page.update()
 
+    @UI_REFRESH_SECONDS.time("refresh_ui")
     def refresh_ui(self):
         """Обновление всего интерфейса"""
         self.update_folder_tree()
@@ -2105,5 +2244,33 @@ class ArchiveApp:
         self.page.update()
 
 if __name__ == "__main__":
-    app = ArchiveApp()
-    ft.app(target=app.main)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="AVS-Архив")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="порт для метрик Prometheus на 127.0.0.1 (по умолчанию выключено)")
+    parser.add_argument("--profile", choices=PROFILE_MODES, default=None,
+                        help="профилирование обработчиков: cprofile или выборка стеков (sample)")
+    parser.add_argument("--profile-dir", default="profiles",
+                        help="каталог для профилей по обработчикам")
+    parser.add_argument("--profile-interval", type=float, default=5.0,
+                        help="интервал выборки стеков, мс")
+    parser.add_argument("--flamegraph", default=None,
+                        help="файл стеков в формате collapsed, записывается при выходе")
+    args = parser.parse_args()
+    app = ArchiveApp(metrics_port=args.metrics_port)
+
+    profiler = None
+    if args.profile or args.flamegraph:
+        profiler = SessionProfiler(args.profile or "sample", args.profile_dir,
+                                   args.profile_interval / 1000, args.flamegraph)
+        profiler.instrument(app, PROFILED_HANDLERS)
+        # Фоновые потоки вызывают run_once через атрибут экземпляра
+        profiler.instrument(app.ingest_worker, ["run_once"], prefix="ingest_worker.")
+        profiler.instrument(app.purge_worker, ["run_once"], prefix="purge_worker.")
+        profiler.instrument(app.exporter, ["export"], prefix="exporter.")
+        profiler.start()
+    try:
+        ft.app(target=app.main)
+    finally:
+        if profiler:
+            profiler.stop()
+            print(f"Профили сохранены в {args.profile_dir}")
\ No newline at end of file
@@ -0,0 +1,71 @@
+"""Регрессии командной строки: сбой записи пакета при импорте и продолжение"""
+import contextlib
+import io
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC))
+
+import cli  # noqa: E402
+from database import DatabaseManager  # noqa: E402
+
+FILES = 5
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source = tmp_path / "scan"
+    source.mkdir()
+    for i in range(FILES):
+        (source / f"doc_{i}.txt").write_text(f"документ {i}", encoding="utf-8")
+    with contextlib.redirect_stdout(io.StringIO()):
+        db = DatabaseManager(str(tmp_path / "archive.db"))
+    yield db, tmp_path
+    db.close()
+
+
+def run_import(db: DatabaseManager, root: Path) -> int:
+    args = cli.build_parser().parse_args([
+        "--db", str(root / "archive.db"), "import", str(root / "scan"), "--folder", "/Сканы",
+        "--files-dir", str(root / "document_files"), "--batch-size", "2", "--jobs", "2",
+    ])
+    return cli.cmd_import(args, db)
+
+
+def document_paths(root: Path):
+    with contextlib.closing(sqlite3.connect(root / "archive.db")) as conn:
+        return sorted(row[0] for row in conn.execute("SELECT file_path FROM documents"))
+
+
+def copied_files(root: Path):
+    return sorted(str(path) for path in (root / "document_files").iterdir())
+
+
+def test_failed_batch_removes_its_copies_and_rerun_resumes(archive, monkeypatch, capsys):
+    db, root = archive
+    add_documents = db.add_documents
+    calls = []
+
+    def failing_add_documents(documents):
+        calls.append(len(documents))
+        if len(calls) == 2:
+            return 0  # как при ошибке БД: транзакция пакета откатана
+        return add_documents(documents)
+
+    monkeypatch.setattr(db, "add_documents", failing_add_documents)
+    assert run_import(db, root) == 1
+    assert "импорт прерван" in capsys.readouterr().err
+    # В каталоге остались только файлы записанного пакета
+    assert len(document_paths(root)) == 2
+    assert copied_files(root) == document_paths(root)
+
+    monkeypatch.setattr(db, "add_documents", add_documents)
+    assert run_import(db, root) == 0
+    assert "Пропущено уже импортированных файлов: 2" in capsys.readouterr().out
+    assert len(document_paths(root)) == FILES
+    assert copied_files(root) == document_paths(root)
@@ -0,0 +1,338 @@
+"""Регрессии DatabaseManager на временной базе"""
+import contextlib
+import io
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC))
+
+import database  # noqa: E402
+from database import DatabaseManager  # noqa: E402
+from exporter import DocumentExporter  # noqa: E402
+
+
+def open_db(path: Path, **kwargs) -> DatabaseManager:
+    # Проверка структуры при открытии печатает таблицы
+    with contextlib.redirect_stdout(io.StringIO()):
+        return DatabaseManager(str(path), **kwargs)
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = open_db(tmp_path / "archive.db")
+    yield manager
+    manager.close()
+
+
+def add(db: DatabaseManager, title: str, folder=None, **kwargs) -> bool:
+    return db.add_document(title, "", f"document_files/{title}.txt", folder, "Активный", "admin", **kwargs)
+
+
+# --- iter_documents ---
+
+def failing_factory(fail_at: int):
+    """document_factory, который обрывает обход ошибкой БД на строке fail_at"""
+    seen = []
+
+    def factory(cursor, row):
+        seen.append(row)
+        if len(seen) == fail_at:
+            raise sqlite3.OperationalError("disk I/O error")
+        return original(cursor, row)
+
+    original = database.document_factory
+    return factory
+
+
+def test_iter_documents_raises_midway(db, monkeypatch):
+    for i in range(5):
+        assert add(db, f"doc{i}")
+    monkeypatch.setattr(database, "document_factory", failing_factory(3))
+    seen = []
+    with pytest.raises(sqlite3.OperationalError):
+        for doc in db.iter_documents(batch_size=1):
+            seen.append(doc["title"])
+    assert seen == ["doc0", "doc1"]
+
+
+def test_export_fails_without_target_on_db_error(db, tmp_path, monkeypatch):
+    for i in range(5):
+        assert add(db, f"doc{i}")
+    monkeypatch.setattr(database, "document_factory", failing_factory(3))
+    target = tmp_path / "out.jsonl"
+    with pytest.raises(sqlite3.OperationalError):
+        DocumentExporter(db, batch_size=1).export(target)
+    assert not target.exists()
+    assert not target.with_name(target.name + ".part").exists()
+
+
+# --- Миграция folder_path -> folder_id ---
+
+BASELINE_SCHEMA = """
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        role TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE folders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        path TEXT UNIQUE NOT NULL,
+        parent_path TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE documents (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        description TEXT,
+        file_path TEXT,
+        folder_path TEXT NOT NULL,
+        status TEXT NOT NULL,
+        created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        author TEXT NOT NULL,
+        tags TEXT,
+        cabinet TEXT,
+        shelf TEXT,
+        box TEXT,
+        FOREIGN KEY (folder_path) REFERENCES folders(path)
+    );
+    CREATE INDEX idx_folders_path ON folders(path);
+    CREATE INDEX idx_documents_folder ON documents(folder_path);
+    INSERT INTO users (username, password, role) VALUES ('admin', 'admin', 'admin');
+"""
+
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    """База в схеме до перехода на folder_id: документы ссылаются на путь папки"""
+    path = tmp_path / "archive.db"
+    with contextlib.closing(sqlite3.connect(path)) as conn, conn:
+        conn.executescript(BASELINE_SCHEMA)
+        conn.executemany(
+            "INSERT INTO folders (name, path, parent_path) VALUES (?, ?, ?)",
+            [("A", "/A", None), ("B", "/A/B", "/A")]
+        )
+        conn.executemany(
+            "INSERT INTO documents (title, folder_path, status, author, tags) VALUES (?, ?, ?, ?, ?)",
+            [
+                ("root", "/", "Активный", "admin", None),
+                ("nested", "/A/B", "Активный", "admin", "отчет,2023"),
+                ("orphan", "/X/Y", "Архив", "ivanov", None),
+            ]
+        )
+    return path
+
+
+def test_migration_maps_paths_to_folder_ids(baseline_db):
+    db = open_db(baseline_db)
+    try:
+        with contextlib.closing(sqlite3.connect(baseline_db)) as conn:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+            parents = dict(conn.execute("""
+                SELECT f.path, p.path FROM folders f LEFT JOIN folders p ON p.id = f.parent_id
+            """))
+            folder_ids = dict(conn.execute("SELECT title, folder_id FROM documents"))
+        assert "folder_path" not in columns
+        assert {"folder_id", "content_hash", "file_size", "deleted_at"} <= columns
+
+        # Отсутствовавшие папки созданы вместе с предками и связаны по parent_id
+        assert parents == {"/A": None, "/A/B": "/A", "/X": None, "/X/Y": "/X"}
+        assert folder_ids == {
+            "root": None,
+            "nested": db.get_folder_id("/A/B"),
+            "orphan": db.get_folder_id("/X/Y"),
+        }
+        assert [doc["title"] for doc in db.get_documents("/X/Y")] == ["orphan"]
+        nested = db.get_documents("/A/B")[0]["id"]
+        assert db.get_document(nested)["folder_path"] == "/A/B"
+
+        stats = db.get_archive_stats()
+        assert stats["documents"] == 3
+        assert stats["folders"] == 4
+        assert {path: counts["documents"] for path, counts in stats["by_folder"].items()} == {
+            "/": 1, "/A/B": 1, "/X/Y": 1,
+        }
+        assert stats["by_status"]["Архив"]["documents"] == 1
+        assert stats["by_author"]["ivanov"]["documents"] == 1
+        assert [doc["title"] for doc in db.get_documents_by_tags(["отчет"])] == ["nested"]
+    finally:
+        db.close()
+
+    # Повторное открытие не запускает миграцию снова
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        DatabaseManager(str(baseline_db)).close()
+    assert "переведены" not in output.getvalue()
+
+
+# --- Счетчики archive_stats ---
+
+def assert_stats_consistent(db: DatabaseManager) -> dict:
+    """Счетчики, поддерживаемые триггерами, совпадают с полным пересчетом"""
+    maintained = db.get_archive_stats()
+    assert db.rebuild_stats()
+    assert db.get_archive_stats() == maintained
+    return maintained
+
+
+def test_stats_follow_move_delete_and_restore(db):
+    assert db.add_folder("A", "/A")
+    assert db.add_folder("B", "/B")
+    assert add(db, "one", "/A", file_size=100)
+    assert add(db, "two", "/A", file_size=20)
+    ids = {doc["title"]: doc["id"] for doc in db.get_documents("/A")}
+    stats = assert_stats_consistent(db)
+    assert stats["by_folder"] == {"/A": {"documents": 2, "bytes": 120}}
+
+    assert db.move_documents([ids["one"]], "/B") == 1
+    stats = assert_stats_consistent(db)
+    assert stats["by_folder"] == {
+        "/A": {"documents": 1, "bytes": 20},
+        "/B": {"documents": 1, "bytes": 100},
+    }
+
+    # Документы в корзине не учитываются
+    assert db.delete_documents([ids["one"], ids["two"]]) == 2
+    stats = assert_stats_consistent(db)
+    assert stats["documents"] == 0
+    assert stats["bytes"] == 0
+    assert stats["by_folder"] == {}
+    assert stats["by_author"] == {}
+
+    assert db.restore_document(ids["one"])
+    stats = assert_stats_consistent(db)
+    assert stats["documents"] == 1
+    assert stats["by_folder"] == {"/B": {"documents": 1, "bytes": 100}}
+    assert stats["by_status"] == {"Активный": {"documents": 1, "bytes": 100}}
+
+    # Перенос папки не меняет счетчики: они привязаны к id
+    assert db.add_folder("C", "/C")
+    assert db.move_folder("/B", "/C")
+    stats = assert_stats_consistent(db)
+    assert stats["by_folder"] == {"/C/B": {"documents": 1, "bytes": 100}}
+    assert db.get_folder_tree_stats()["/C"]["total_bytes"] == 100
+
+
+# --- Перенос поддерева папок ---
+
+def folder_rows(db: DatabaseManager) -> dict:
+    with contextlib.closing(sqlite3.connect(db.db_path)) as conn:
+        return {
+            path: (parent_path, parent)
+            for path, parent_path, parent in conn.execute("""
+                SELECT f.path, f.parent_path, p.path
+                FROM folders f LEFT JOIN folders p ON p.id = f.parent_id
+            """)
+        }
+
+
+def test_move_folder_relocates_only_its_subtree(db):
+    for name, path, parent in [
+        ("A", "/A", None), ("B", "/A/B", "/A"), ("C", "/A/B/C", "/A/B"),
+        # Соседи с общим префиксом по обе стороны диапазона [/A/, /A0)
+        ("A.b", "/A.b", None), ("A0", "/A0", None), ("AB", "/AB", None),
+        ("Z", "/Z", None),
+    ]:
+        assert db.add_folder(name, path, parent)
+    assert add(db, "deep", "/A/B/C")
+    deep_folder = db.get_folder_id("/A/B/C")
+
+    assert db.move_folder("/A", "/Z")
+    assert folder_rows(db) == {
+        "/Z": (None, None),
+        "/Z/A": ("/Z", "/Z"),
+        "/Z/A/B": ("/Z/A", "/Z/A"),
+        "/Z/A/B/C": ("/Z/A/B", "/Z/A/B"),
+        "/A.b": (None, None),
+        "/A0": (None, None),
+        "/AB": (None, None),
+    }
+    # Документы остаются в той же папке, изменился только ее путь
+    assert db.get_folder_id("/Z/A/B/C") == deep_folder
+    assert [doc["title"] for doc in db.get_documents("/Z/A/B/C")] == ["deep"]
+
+    # Перенос в собственного потомка и на занятый путь отклоняется
+    assert not db.move_folder("/Z/A", "/Z/A/B")
+    assert db.add_folder("A", "/AB/A", "/AB")
+    assert not db.move_folder("/Z/A", "/AB")
+    assert "/Z/A/B/C" in folder_rows(db)
+
+    assert db.rename_folder("/Z/A", "Архив", "/Z/Архив")
+    assert folder_rows(db)["/Z/Архив/B/C"] == ("/Z/Архив/B", "/Z/Архив/B")
+    assert db.get_folder_id("/Z/Архив/B/C") == deep_folder
+
+
+# --- Пакеты ---
+
+def test_batch_rolls_back_after_failed_call(db):
+    assert db.add_folder("A", "/A")
+    assert add(db, "kept", "/A")
+    kept = db.get_documents("/A")[0]["id"]
+    before = db.get_archive_stats()
+
+    with pytest.raises(database.BatchRollback):
+        with db.batch():
+            assert add(db, "added", "/A")
+            assert db.update_document(kept, status="Архив")
+            assert db.delete_document(kept)
+            # Несуществующая колонка: ошибка БД внутри пакета
+            assert db.update_documents([kept], no_such_column="x") == 0
+            # После ошибки пакет не выполняет следующие вызовы
+            assert not add(db, "after", "/A")
+
+    docs = db.get_documents("/A")
+    assert [doc["title"] for doc in docs] == ["kept"]
+    assert db.get_document(kept)["status"] == "Активный"
+    assert db.get_archive_stats() == before
+
+    # Соединение пакета освобождено, следующие вызовы работают как обычно
+    assert add(db, "later", "/A")
+    assert len(db.get_documents("/A")) == 2
+
+
+# --- Теги при пакетном добавлении ---
+
+def test_add_documents_tags_each_row_after_deletions(db):
+    assert db.add_folder("A", "/A")
+    for i in range(4):
+        assert add(db, f"old{i}", "/A")
+    old = sorted(doc["id"] for doc in db.get_documents("/A"))
+    # Пропуски в id: удалены строки из середины и с конца таблицы
+    assert db.delete_documents(old[1:]) == 3
+    assert db.purge_documents(old[1:]) == 3
+
+    batch = [
+        {"title": "first", "folder_path": "/A", "status": "Активный", "author": "admin",
+         "tags": ["отчет", "2023"]},
+        {"title": "untagged", "folder_path": "/", "status": "Активный", "author": "admin"},
+        {"title": "last", "folder_id": db.get_folder_id("/A"), "status": "Активный",
+         "author": "admin", "tags": ["акт"]},
+    ]
+    with db.batch():
+        # Вставка перед пакетом в той же транзакции сдвигает last_insert_rowid
+        assert add(db, "single", "/A", tags=["черновик"])
+        assert db.add_documents(batch) == 3
+
+    with contextlib.closing(sqlite3.connect(db.db_path)) as conn:
+        ids = dict(conn.execute("SELECT title, id FROM documents"))
+        indexed = {}
+        for tag, doc_id in conn.execute("SELECT tag, document_id FROM document_tags"):
+            indexed.setdefault(doc_id, set()).add(tag)
+    assert ids["first"] > old[-1]
+    assert db.get_document(ids["first"])["tags"] == ["отчет", "2023"]
+    assert not db.get_document(ids["untagged"])["tags"]
+    assert db.get_document(ids["last"])["tags"] == ["акт"]
+    assert db.get_document(ids["single"])["tags"] == ["черновик"]
+    assert indexed == {
+        ids["first"]: {"отчет", "2023"},
+        ids["last"]: {"акт"},
+        ids["single"]: {"черновик"},
+    }
+    assert [doc["title"] for doc in db.get_documents_by_tags(["акт"])] == ["last"]
+    assert [doc["title"] for doc in db.get_documents_by_tags(["отчет", "2023"])] == ["first"]
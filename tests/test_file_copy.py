@@ -0,0 +1,60 @@
+"""Регрессии copy_file: существующий target и оборванное копирование ядром"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC))
+
+import file_copy  # noqa: E402
+from file_copy import copy_file, hash_file  # noqa: E402
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.bin"
+    path.write_bytes(os.urandom(3 * 1024 * 1024 + 17))
+    return path
+
+
+@pytest.mark.parametrize("mode", ["auto", "hardlink", "kernel", "copy"])
+def test_existing_target_is_not_overwritten(source, tmp_path, mode):
+    target = tmp_path / "target.bin"
+    target.write_bytes(b"archived")
+    with pytest.raises(FileExistsError):
+        copy_file(source, target, mode=mode)
+    assert target.read_bytes() == b"archived"
+
+
+@pytest.mark.skipif(not hasattr(os, "copy_file_range"), reason="нет copy_file_range")
+def test_short_kernel_copy_falls_back_to_buffer(source, tmp_path, monkeypatch):
+    real = os.copy_file_range
+    # Ядро отдает первый фрагмент и затем 0 раньше конца файла
+    calls = []
+
+    def short_copy(src, dst, count, offset_src=None, offset_dst=None):
+        calls.append(offset_src)
+        return real(src, dst, count, offset_src, offset_dst) if len(calls) == 1 else 0
+
+    monkeypatch.setattr(os, "copy_file_range", short_copy)
+    monkeypatch.delattr(os, "sendfile", raising=False)
+    target = tmp_path / "target.bin"
+    result = copy_file(source, target, mode="kernel", chunk_size=1024 * 1024)
+    assert result.method == "copy"
+    assert target.read_bytes() == source.read_bytes()
+    assert result.sha256 == hash_file(source)
+    assert result.size == source.stat().st_size
+
+
+def test_failed_copy_removes_target(source, tmp_path, monkeypatch):
+    def broken_copy(fsrc, fdst, digest, chunk_size):
+        fdst.write(b"partial")
+        raise OSError("диск отключен")
+
+    monkeypatch.setattr(file_copy, "_buffered_copy", broken_copy)
+    target = tmp_path / "target.bin"
+    with pytest.raises(OSError):
+        copy_file(source, target, mode="copy")
+    assert not target.exists()
@@ -0,0 +1,98 @@
+"""Регрессии IngestWorker: потеря аренды и уборка после окончательного сбоя"""
+import contextlib
+import io
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC))
+
+from database import DatabaseManager  # noqa: E402
+from ingest import IngestWorker  # noqa: E402
+
+PAYLOAD = {"title": "Документ", "folder_path": "/", "status": "Активный", "author": "admin", "tags": []}
+
+
+@pytest.fixture
+def archive(tmp_path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        db = DatabaseManager(str(tmp_path / "archive.db"))
+    source = tmp_path / "upload" / "doc.txt"
+    source.parent.mkdir()
+    source.write_text("содержимое", encoding="utf-8")
+    yield db, source, tmp_path / "document_files"
+    db.close()
+
+
+class FailingProcessor:
+    async def process_document(self, file_path):
+        raise RuntimeError("обработка не удалась")
+
+
+class RecordingProcessor:
+    def __init__(self):
+        self.processed = []
+
+    async def process_document(self, file_path):
+        self.processed.append(file_path)
+
+
+def documents_count(db: DatabaseManager) -> int:
+    with contextlib.closing(sqlite3.connect(db.db_path)) as conn:
+        return conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+
+def test_lost_lease_stops_the_worker(archive):
+    db, source, files_dir = archive
+    processor = RecordingProcessor()
+    worker = IngestWorker(db, processor=processor, files_dir=str(files_dir))
+    job_id = worker.enqueue(str(source), PAYLOAD)
+    copy = worker._copy
+
+    def stolen_copy(*args):
+        # Пока идет копирование, аренда истекла и задание взял другой обработчик
+        with contextlib.closing(sqlite3.connect(db.db_path)) as conn, conn:
+            conn.execute("UPDATE ingest_jobs SET lease_owner = 'other' WHERE id = ?", (job_id,))
+        return copy(*args)
+
+    worker._copy = stolen_copy
+    job = worker.run_once(job_id)
+    assert job["state"] == "copying"
+    assert job["lease_owner"] == "other"
+    assert job["attempts"] == 0
+    assert processor.processed == []
+    assert documents_count(db) == 0
+
+
+def test_terminal_failure_removes_copied_files(archive):
+    db, source, files_dir = archive
+    worker = IngestWorker(db, processor=FailingProcessor(), files_dir=str(files_dir))
+    job_id = worker.enqueue(str(source), PAYLOAD, max_attempts=1)
+    job = worker.run_once(job_id)
+    assert job["state"] == "failed"
+    assert list(files_dir.iterdir()) == []
+    assert source.exists()
+
+
+def test_retry_keeps_copied_file(archive):
+    db, source, files_dir = archive
+    worker = IngestWorker(db, processor=FailingProcessor(), files_dir=str(files_dir))
+    job_id = worker.enqueue(str(source), PAYLOAD, max_attempts=2)
+    job = worker.run_once(job_id)
+    assert job["state"] == "processing"
+    assert (files_dir / "doc.txt").exists()
+
+
+def test_terminal_failure_keeps_foreign_file(archive):
+    db, source, files_dir = archive
+    worker = IngestWorker(db, files_dir=str(files_dir))
+    job_id = worker.enqueue(str(source), PAYLOAD, max_attempts=1)
+    # Файл с тем же именем появился после постановки в очередь
+    foreign = Path(db.get_ingest_job(job_id)["target_path"])
+    foreign.write_text("чужой файл", encoding="utf-8")
+    job = worker.run_once(job_id)
+    assert job["state"] == "failed"
+    assert foreign.read_text(encoding="utf-8") == "чужой файл"
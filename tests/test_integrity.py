@@ -0,0 +1,108 @@
+"""Регрессия verify: результат не зависит от каталога запуска и написания путей"""
+import contextlib
+import io
+import os
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC))
+
+from database import DatabaseManager  # noqa: E402
+
+DOCUMENTS = 12  # не меньше MIN_MISSING_SAMPLE, чтобы сработала защита исправления
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """Архив t.db с document_files: пути в БД относительные, с "./" и абсолютные,
+    плюс один давний бесхозный файл"""
+    root = tmp_path / "archive"
+    files_dir = root / "document_files"
+    files_dir.mkdir(parents=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        db = DatabaseManager(str(root / "t.db"))
+    for i in range(DOCUMENTS):
+        name = f"doc_{i}.txt"
+        (files_dir / name).write_text(f"документ {i}", encoding="utf-8")
+        stored = [f"document_files/{name}", f"./document_files/{name}", str(files_dir / name)][i % 3]
+        assert db.add_document(f"Документ {i}", "", stored, None, "Активный", "admin")
+    orphan = files_dir / "orphan.txt"
+    orphan.write_text("без ссылки", encoding="utf-8")
+    os.utime(orphan, (0, 0))
+    db.close()
+    (tmp_path / "work").mkdir()
+    return root
+
+
+def verify(cwd: Path, *args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, str(SRC / "cli.py"), *args],
+        cwd=cwd, capture_output=True, text=True, timeout=60,
+    )
+
+
+def trashed(root: Path) -> int:
+    with contextlib.closing(sqlite3.connect(root / "t.db")) as conn:
+        return conn.execute("SELECT COUNT(*) FROM documents WHERE deleted_at IS NOT NULL").fetchone()[0]
+
+
+def assert_only_orphan_repaired(result: subprocess.CompletedProcess, root: Path):
+    assert "Нет файла: 0" in result.stdout, result.stdout + result.stderr
+    assert "бесхозных файлов: 1" in result.stdout
+    assert trashed(root) == 0
+    assert (root / "orphaned_files" / "orphan.txt").exists()
+    assert sorted(p.name for p in (root / "document_files").iterdir()) == \
+        sorted(f"doc_{i}.txt" for i in range(DOCUMENTS))
+
+
+def test_verify_absolute_files_dir(archive):
+    result = verify(archive, "--db", "t.db", "verify", "--jobs", "2", "--repair", "--grace", "0",
+                    "--files-dir", str(archive / "document_files"))
+    assert_only_orphan_repaired(result, archive)
+
+
+def test_verify_from_another_directory(archive):
+    result = verify(archive.parent / "work", "--db", "../archive/t.db", "verify",
+                    "--jobs", "2", "--repair", "--grace", "0")
+    assert_only_orphan_repaired(result, archive)
+    assert not (archive.parent / "work" / "orphaned_files").exists()
+
+
+def test_repair_refused_without_files_dir(archive):
+    result = verify(archive, "--db", "t.db", "verify", "--repair",
+                    "--files-dir", str(archive / "missing_dir"))
+    assert result.returncode == 2
+    assert "исправление отменено" in result.stderr
+    assert trashed(archive) == 0
+
+
+def test_repair_refused_when_almost_all_missing(archive):
+    (archive / "document_files").rename(archive / "moved")
+    (archive / "document_files").mkdir()
+    result = verify(archive, "--db", "t.db", "verify", "--repair")
+    assert result.returncode == 2
+    assert "исправление отменено" in result.stderr
+    assert trashed(archive) == 0
+
+
+def test_repair_batch_failure_reports_and_exits(archive):
+    # Триггер отменяет перенос в корзину: пакет исправлений откатывается
+    for i in range(3):
+        (archive / "document_files" / f"doc_{i}.txt").unlink()
+    with contextlib.closing(sqlite3.connect(archive / "t.db")) as conn, conn:
+        conn.execute("""
+            CREATE TRIGGER refuse_trash BEFORE UPDATE OF deleted_at ON documents
+            BEGIN SELECT RAISE(ABORT, 'корзина недоступна'); END
+        """)
+    result = verify(archive, "--db", "t.db", "verify", "--repair")
+    assert result.returncode == 2
+    assert "Traceback" not in result.stderr
+    assert "Ошибка при проверке" in result.stderr
+    assert "Нет файла: 3" in result.stdout
+    assert "Исправлено: 0" in result.stdout
+    assert trashed(archive) == 0
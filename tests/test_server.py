@@ -0,0 +1,154 @@
+"""Регрессии HTTP API архива"""
+import asyncio
+import io
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC))
+
+from server import ArchiveServer, RangeNotSatisfiable, Request  # noqa: E402
+from server import content_response, etag_matches, parse_range  # noqa: E402
+
+
+async def request(port: int, method: str, target: str, body: bytes = b""):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"{method} {target} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\n"
+                 f"Connection: close\r\n\r\n".encode("latin-1") + body)
+    data = await reader.read()
+    writer.close()
+    head, _, payload = data.partition(b"\r\n\r\n")
+    return int(head.split(b" ")[1]), json.loads(payload) if payload else None
+
+
+@pytest.fixture
+def server_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_folders_and_jobs_do_not_leak_internals(server_dir, capsys):
+    async def scenario():
+        server = ArchiveServer(db_path="archive.db", port=0, preview_workers=1)
+        await server.start()
+        try:
+            capsys.readouterr()
+            status, folders = await request(server.port, "GET", "/api/folders")
+            assert status == 200
+            # Отладочный вывод структуры папок на каждый запрос
+            assert capsys.readouterr().out == ""
+
+            status, created = await request(server.port, "POST", "/api/documents?filename=a.txt", b"abc")
+            assert status == 202
+            status, job = await request(server.port, "GET", f"/api/jobs/{created['job_id']}")
+            assert status == 200
+            assert set(job) == {"id", "state", "document_id", "last_error"}
+        finally:
+            await server.close()
+
+    asyncio.run(scenario())
+
+
+# --- Условные запросы и диапазоны ---
+
+@pytest.mark.parametrize("header, size, expected", [
+    ("bytes=0-499", 1000, (0, 499)),
+    ("bytes=500-", 1000, (500, 999)),
+    ("bytes=-300", 1000, (700, 999)),
+    ("bytes=-5000", 1000, (0, 999)),       # суффикс длиннее файла - весь файл
+    ("bytes=900-5000", 1000, (900, 999)),  # конец обрезается по размеру
+    ("bytes=999-999", 1000, (999, 999)),
+    (" Bytes = 10-20 ", 1000, (10, 20)),
+    ("bytes=0-1,5-9", 1000, None),         # несколько диапазонов не поддерживаются
+    ("bytes=500-100", 1000, None),
+    ("items=0-10", 1000, None),
+    ("bytes=abc-", 1000, None),
+    ("bytes=-", 1000, None),
+    ("bytes=5", 1000, None),
+    ("bytes=--5", 1000, None),
+    ("bytes=+5-10", 1000, None),
+])
+def test_parse_range(header, size, expected):
+    assert parse_range(header, size) == expected
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=1000-", 1000),
+    ("bytes=1000-2000", 1000),
+    ("bytes=-0", 1000),
+    ("bytes=0-", 0),
+    ("bytes=-10", 0),
+])
+def test_parse_range_not_satisfiable(header, size):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, size)
+
+
+@pytest.mark.parametrize("header, etag, expected", [
+    (None, '"v1"', False),
+    ("", '"v1"', False),
+    ('"v1"', '"v1"', True),
+    ('"v2"', '"v1"', False),
+    ('W/"v1"', '"v1"', True),           # слабое сравнение: W/ не учитывается
+    ('"v1"', 'W/"v1"', True),
+    ('W/"v1"', 'W/"v1"', True),
+    ('"v0", W/"v1"', '"v1"', True),
+    ('"v0",  "v2"', '"v1"', False),
+    ("*", '"v1"', True),
+    ('v1', '"v1"', False),               # без кавычек - другой тег
+])
+def test_etag_matches(header, etag, expected):
+    assert etag_matches(header, etag) is expected
+
+
+BODY = bytes(range(256)) * 4
+ETAG = '"v1"'
+
+
+def make_request(**headers) -> Request:
+    headers = {name.replace("_", "-"): value for name, value in headers.items()}
+    return Request("GET", "/api/documents/1/file", "HTTP/1.1", headers, reader=None)
+
+
+@pytest.mark.parametrize("headers, etag, status, span, content_range", [
+    ({}, ETAG, 200, (0, 1024), None),
+    ({"if_none_match": ETAG}, ETAG, 304, None, None),
+    ({"if_none_match": 'W/"v1"'}, ETAG, 304, None, None),
+    ({"if_none_match": '"v0"'}, ETAG, 200, (0, 1024), None),
+    ({"range": "bytes=10-19"}, ETAG, 206, (10, 10), "bytes 10-19/1024"),
+    ({"range": "bytes=-4"}, ETAG, 206, (1020, 4), "bytes 1020-1023/1024"),
+    ({"range": "bytes=1024-"}, ETAG, 416, None, "bytes */1024"),
+    ({"range": "bytes=0-1,4-5"}, ETAG, 200, (0, 1024), None),
+    # If-Range: диапазон только от той же версии, иначе весь файл
+    ({"range": "bytes=10-19", "if_range": ETAG}, ETAG, 206, (10, 10), "bytes 10-19/1024"),
+    ({"range": "bytes=10-19", "if_range": '"v0"'}, ETAG, 200, (0, 1024), None),
+    ({"range": "bytes=1024-", "if_range": '"v0"'}, ETAG, 200, (0, 1024), None),
+    # If-Range требует сильного сравнения
+    ({"range": "bytes=10-19", "if_range": 'W/"v1"'}, ETAG, 200, (0, 1024), None),
+    ({"range": "bytes=10-19", "if_range": 'W/"v1"'}, 'W/"v1"', 200, (0, 1024), None),
+    # If-None-Match проверяется раньше Range
+    ({"if_none_match": ETAG, "range": "bytes=10-19"}, ETAG, 304, None, None),
+])
+@pytest.mark.parametrize("source", ["body", "file"])
+def test_content_response(headers, etag, status, span, content_range, source):
+    file = io.BytesIO(BODY) if source == "file" else None
+    response = content_response(make_request(**headers), etag, len(BODY), "application/pdf",
+                                body=BODY if file is None else b"", file=file)
+    assert response.status == status
+    assert response.headers["ETag"] == etag
+    assert response.headers.get("Content-Range") == content_range
+    if span is None:
+        assert response.length == 0
+        assert "Content-Type" not in response.headers
+    if file is None:
+        assert response.body == (BODY[span[0]:sum(span)] if span else b"")
+    elif span:
+        assert response.file is file
+        assert (response.offset, response.count) == span
+    else:
+        # Без содержимого файл закрывается сразу
+        assert response.file is None
+        assert file.closed